@@ -2,18 +2,26 @@
 
 import os
 from docx import Document
-from PIL import Image
 import pytesseract
+from document_segments import make_segment, write_segments
+from OCR.ocr_cache import ocr_images, image_dimensions
 
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\tesseract.exe"  # Windows path
 
-def docx_to_text(docx_path, output_dir="Text_files", output_name=None):
+# Images smaller than this (in pixels, either side) are bullets/icons and skipped
+MIN_IMAGE_SIZE = 48
+
+def docx_to_text(docx_path, output_dir="Text_files", output_name=None,
+                 save_images=False, min_image_size=MIN_IMAGE_SIZE, ocr_workers=None):
     """
     Extract text from DOCX files including:
     - Paragraphs
     - Tables
     - Text inside images/diagrams/charts (via OCR)
     
+    Images are OCR'd in memory and in parallel. Set save_images=True to also
+    keep them in Text_files/<name>_images/ with their original format.
+    
     Saves output as a .txt file in Text_files/ with the same original filename.
     """
     os.makedirs(output_dir, exist_ok=True)
@@ -23,40 +31,59 @@ def docx_to_text(docx_path, output_dir="Text_files", output_name=None):
 
     doc = Document(docx_path)
     all_text = ""
+    segments = []
 
     # 1️⃣ Extract paragraphs
     for para_num, para in enumerate(doc.paragraphs, start=1):
         if para.text.strip():
             all_text += f"[Paragraph {para_num}]: {para.text.strip()}\n"
+            segments.append(make_segment("paragraph", para.text, paragraph=para_num))
 
     # 2️⃣ Extract tables
     for table_num, table in enumerate(doc.tables, start=1):
         all_text += f"\n[Table {table_num}]:\n"
+        table_rows = []
         for row in table.rows:
             row_text = [cell.text.strip() for cell in row.cells]
-            all_text += "\t".join(row_text) + "\n"
+            table_rows.append("\t".join(row_text))
+        all_text += "\n".join(table_rows) + "\n"
+        segments.append(make_segment("table", "\n".join(table_rows), table=table_num))
 
     # 3️⃣ Extract images (diagrams/charts)
-    images_dir = os.path.join(output_dir, f"{base_name}_images")
-    os.makedirs(images_dir, exist_ok=True)
+    image_numbers = []
+    images = []
 
     for i, rel in enumerate(doc.part._rels):
         rel = doc.part._rels[rel]
         if "image" in rel.target_ref:
             image_data = rel.target_part.blob
-            image_path = os.path.join(images_dir, f"{base_name}_image_{i+1}.png")
-            with open(image_path, "wb") as img_file:
-                img_file.write(image_data)
 
-            # OCR for text in images
-            img = Image.open(image_path)
-            text_in_image = pytesseract.image_to_string(img, lang="eng")
-            if text_in_image.strip():
-                all_text += f"\n[Text in Image {i+1}]:\n{text_in_image.strip()}\n"
+            if save_images:
+                images_dir = os.path.join(output_dir, f"{base_name}_images")
+                os.makedirs(images_dir, exist_ok=True)
+                image_ext = os.path.splitext(rel.target_part.partname)[1] or ".bin"
+                image_path = os.path.join(images_dir, f"{base_name}_image_{i+1}{image_ext}")
+                with open(image_path, "wb") as img_file:
+                    img_file.write(image_data)
+
+            # Skip bullets, icons and formats PIL cannot read
+            dimensions = image_dimensions(image_data)
+            if dimensions is None or min(dimensions) < min_image_size:
+                continue
+
+            image_numbers.append(i + 1)
+            images.append(image_data)
+
+    # OCR for text in images, straight from memory
+    for image_num, text_in_image in zip(image_numbers, ocr_images(images, max_workers=ocr_workers)):
+        if text_in_image.strip():
+            all_text += f"\n[Text in Image {image_num}]:\n{text_in_image.strip()}\n"
+            segments.append(make_segment("ocr", text_in_image, image=image_num))
 
     # Save all extracted text
     with open(output_txt_path, "w", encoding="utf-8") as f:
         f.write(all_text.strip())
+    write_segments(output_txt_path, segments)
 
     print(f"\n✅ DOCX text extraction complete! Saved to: {os.path.abspath(output_txt_path)}")
     return output_txt_path
@@ -1,31 +1,16 @@
 import os
 import json
+import asyncio
 from . import auto_chunk
 from .embedding_providers import get_embedding_provider  
-def text_to_embeddings(file_path, embeddings_dir="Embeddings", provider_type="dummy", **provider_kwargs):
-    """
-    Split a text file into chunks, create embeddings, and save them.
-    
-    Args:
-        file_path (str): Path to the text file.
-        embeddings_dir (str): Directory to save embeddings.
-        provider_type (str): Type of embedding provider ("dummy", "openai", "huggingface")
-        **provider_kwargs: Additional arguments for the embedding provider
-    
-    Returns:
-        Path to saved embeddings file.
-    """
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"Text file not found: {file_path}")
-    
-    os.makedirs(embeddings_dir, exist_ok=True)
-    base_name = os.path.splitext(os.path.basename(file_path))[0]
-    output_path = os.path.join(embeddings_dir, f"{base_name}.json")
+from document_segments import load_segments, parse_segments
 
-    print(f"🔄 Processing text file: {file_path}")
+# Chunks sent to the embedding provider per call
+EMBED_BATCH_SIZE = 32
+
+def create_provider(provider_type, provider_kwargs):
+    """The configured embedding provider and its dimension, or the dummy provider if it fails to load."""
     print(f"🤖 Using embedding provider: {provider_type}")
-    
-    # Initialize embedding provider
     try:
         embedding_provider = get_embedding_provider(provider_type, **provider_kwargs)
         embedding_dimension = embedding_provider.get_dimension()
@@ -35,35 +20,127 @@ def text_to_embeddings(file_path, embeddings_dir="Embeddings", provider_type="du
         print("🔄 Falling back to dummy provider...")
         embedding_provider = get_embedding_provider("dummy")
         embedding_dimension = embedding_provider.get_dimension()
+    return embedding_provider, embedding_dimension
+
+def _prepare(file_path, embeddings_dir, provider_type, doc_id, provider_kwargs):
+    """Create the provider and split the text file into chunks."""
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Text file not found: {file_path}")
     
-    # 1️⃣ Split text into chunks
-    chunks = auto_chunk.auto_chunk_text(file_path)
-    print(f"📝 Created {len(chunks)} text chunks")
+    os.makedirs(embeddings_dir, exist_ok=True)
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    output_path = os.path.join(embeddings_dir, f"{base_name}.json")
+    doc_id = doc_id or base_name
 
-    embeddings_data = []
+    print(f"🔄 Processing text file: {file_path}")
+    embedding_provider, embedding_dimension = create_provider(provider_type, provider_kwargs)
+    
+    # 1️⃣ Split text into chunks that fit the model's token limit, keeping
+    # page/slide boundaries from the extractor's segments
+    segments = load_segments(file_path)
+    if segments is None:
+        with open(file_path, "r", encoding="utf-8") as f:
+            segments = parse_segments(f.read())
+    chunks = auto_chunk.auto_chunk_for_provider(segments, embedding_provider)
+    print(f"📝 Created {len(chunks)} text chunks (max {embedding_provider.get_max_tokens()} tokens each)")
+    return embedding_provider, embedding_dimension, chunks, output_path, doc_id
 
-    # 2️⃣ Generate embeddings for each chunk
-    for idx, chunk in enumerate(chunks):
-        print(f"🔄 Processing chunk {idx + 1}/{len(chunks)}...")
-        
+def embed_chunks(embedding_provider, texts, embedding_dimension):
+    """Embed texts batch by batch, falling back to one call per chunk."""
+    embeddings = []
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        batch = texts[start:start + EMBED_BATCH_SIZE]
+        print(f"🔄 Processing chunks {start + 1}-{start + len(batch)}/{len(texts)}...")
         try:
-            embedding = embedding_provider.embed_text(chunk)
+            embeddings.extend(embedding_provider.embed_batch(batch))
         except Exception as e:
-            print(f"⚠️ Error generating embedding for chunk {idx}: {e}")
-            # Fallback to dummy embedding
-            embedding = [0.0] * embedding_dimension
+            print(f"⚠️ Batch embedding failed ({e}), embedding chunks one by one...")
+            for offset, chunk in enumerate(batch):
+                try:
+                    embeddings.append(embedding_provider.embed_text(chunk))
+                except Exception as e:
+                    print(f"⚠️ Error generating embedding for chunk {start + offset}: {e}")
+                    # Fallback to dummy embedding
+                    embeddings.append([0.0] * embedding_dimension)
+    return embeddings
+
+async def _aembed_chunks(embedding_provider, texts, embedding_dimension):
+    """Embed texts with the provider's concurrent requests, in chunk order."""
+    print(f"🔄 Embedding {len(texts)} chunks, up to {embedding_provider.max_in_flight} requests in flight...")
+    embeddings = await embedding_provider.aembed_batch(texts, return_exceptions=True)
+    failed = [index for index, embedding in enumerate(embeddings) if isinstance(embedding, BaseException)]
+    if failed:
+        # Only the chunks of failed requests are embedded again
+        print(f"⚠️ Concurrent embedding failed for {len(failed)}/{len(texts)} chunks ({embeddings[failed[0]]}), "
+              f"retrying them batch by batch...")
+        retried = await asyncio.to_thread(embed_chunks, embedding_provider, [texts[index] for index in failed],
+                                          embedding_dimension)
+        for index, embedding in zip(failed, retried):
+            embeddings[index] = embedding
+    return embeddings
 
+def save_embeddings(output_path, doc_id, chunks, embeddings, embedding_provider, metadata):
+    """Write one record per (chunk, metadata) pair and its embedding to output_path."""
+    embeddings_data = []
+    for idx, ((chunk, chunk_metadata), embedding) in enumerate(zip(chunks, embeddings)):
         embeddings_data.append({
+            "doc_id": doc_id,
             "chunk_index": idx,
             "text": chunk,
             "embedding": embedding,
             "chunk_length": len(chunk),
-            "embedding_dimension": len(embedding)
+            "token_count": embedding_provider.count_tokens(chunk),
+            "embedding_dimension": len(embedding),
+            "page": chunk_metadata["page"],
+            "slide": chunk_metadata["slide"],
+            "segment_types": chunk_metadata["segment_types"],
+            **(metadata or {})
         })
 
-    # 3️⃣ Save embeddings to JSON
-    with open(output_path, "w", encoding="utf-8") as f:
+    # 3️⃣ Save embeddings to JSON (via a temp file so a re-ingest never
+    # leaves a half-written file behind)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
         json.dump(embeddings_data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, output_path)
 
     print(f"✅ Embeddings saved to: {os.path.abspath(output_path)}")
     return output_path
+
+def _running_in_event_loop():
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+def text_to_embeddings(file_path, embeddings_dir="Embeddings", provider_type="dummy", doc_id=None, metadata=None,
+                       **provider_kwargs):
+    """
+    Split a text file into chunks, create embeddings, and save them.
+    
+    Args:
+        file_path (str): Path to the text file.
+        embeddings_dir (str): Directory to save embeddings.
+        provider_type (str): Type of embedding provider ("dummy", "openai", "huggingface")
+        doc_id (str): Document ID stored in every record (default: text file name)
+        metadata (dict): Document metadata stored in every record, e.g.
+            {"file_type": "pdf", "uploaded_at": 1718000000.0}
+        **provider_kwargs: Additional arguments for the embedding provider
+    
+    Returns:
+        Path to saved embeddings file.
+    """
+    embedding_provider, embedding_dimension, chunks, output_path, doc_id = _prepare(
+        file_path, embeddings_dir, provider_type, doc_id, provider_kwargs
+    )
+
+    # 2️⃣ Generate embeddings. Remote providers keep several requests in
+    # flight on a private event loop; local models embed batch by batch.
+    texts = [chunk for chunk, _ in chunks]
+    if embedding_provider.max_in_flight > 1 and not _running_in_event_loop():
+        embeddings = asyncio.run(_aembed_chunks(embedding_provider, texts, embedding_dimension))
+    else:
+        embeddings = embed_chunks(embedding_provider, texts, embedding_dimension)
+
+    return save_embeddings(output_path, doc_id, chunks, embeddings, embedding_provider, metadata)
@@ -1,6 +1,10 @@
 import os
 import re
 import math
+from document_segments import HARD_BOUNDARY_KEYS
+
+# Split by sentence endings
+SENTENCE_ENDINGS = re.compile(r'(?<=[.!?])\s+')
 
 def auto_chunk_text(file_path, min_chunk_size=500, max_chunk_size=1500, overlap_ratio=0.2):
     """
@@ -23,9 +27,7 @@ def auto_chunk_text(file_path, min_chunk_size=500, max_chunk_size=1500, overlap_
 
     overlap = int(chunk_size * overlap_ratio)
 
-    # Split by sentence endings
-    sentence_endings = re.compile(r'(?<=[.!?])\s+')
-    sentences = sentence_endings.split(text)
+    sentences = SENTENCE_ENDINGS.split(text)
 
     chunks = []
     current_chunk = ""
@@ -43,3 +45,202 @@ def auto_chunk_text(file_path, min_chunk_size=500, max_chunk_size=1500, overlap_
         chunks.append(current_chunk.strip())
 
     return chunks
+
+def split_long_sentence(sentence, count_tokens, max_tokens):
+    """
+    Split a sentence that does not fit in one chunk on word boundaries.
+
+    Every word is counted once and pieces are cut where the running sum
+    reaches max_tokens. Each piece is then counted as a whole; if joining
+    the words changed the count, the cut point is binary-searched, so long
+    unpunctuated runs (OCR output, tables) cost O(n) tokenizer calls, not O(n^2).
+    """
+    words = sentence.split()
+    word_tokens = [count_tokens(word) for word in words]
+    pieces = []
+    start = 0
+
+    while start < len(words):
+        # Longest run of whole words whose summed counts fit (at least one word)
+        end = start + 1
+        tokens = word_tokens[start]
+        while end < len(words) and tokens + word_tokens[end] <= max_tokens:
+            tokens += word_tokens[end]
+            end += 1
+
+        if end - start > 1 and count_tokens(" ".join(words[start:end])) > max_tokens:
+            # Largest end in (start, end) whose joined piece fits
+            low, high = start + 1, end - 1
+            while low < high:
+                middle = (low + high + 1) // 2
+                if count_tokens(" ".join(words[start:middle])) <= max_tokens:
+                    low = middle
+                else:
+                    high = middle - 1
+            end = low
+
+        pieces.append(" ".join(words[start:end]))
+        start = end
+
+    return pieces
+
+def token_chunk_text(text, count_tokens, max_tokens, overlap_ratio=0.2):
+    """
+    Pack whole sentences into chunks of at most max_tokens tokens.
+
+    Args:
+        text (str): Text to split.
+        count_tokens (callable): Returns the token count of a string, usually
+            the active embedding provider's count_tokens.
+        max_tokens (int): Token budget per chunk, usually the provider's
+            get_max_tokens().
+        overlap_ratio (float): Fraction of max_tokens repeated from the end of
+            the previous chunk. Overlap is made of whole sentences only.
+
+    Returns:
+        List of chunk strings.
+    """
+    text = text.strip()
+    if not text:
+        return []
+
+    overlap_budget = int(max_tokens * overlap_ratio)
+
+    # Count every sentence once; long sentences are split on word boundaries
+    sentences = []
+    for sentence in SENTENCE_ENDINGS.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        tokens = count_tokens(sentence)
+        if tokens <= max_tokens:
+            sentences.append((sentence, tokens))
+        else:
+            for piece in split_long_sentence(sentence, count_tokens, max_tokens):
+                sentences.append((piece, count_tokens(piece)))
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    new_since_emit = False
+
+    for sentence, tokens in sentences:
+        # +1 approximates the separator between joined sentences
+        if current and current_tokens + tokens + 1 > max_tokens:
+            chunks.append(" ".join(s for s, _ in current))
+
+            # Carry trailing whole sentences into the next chunk as overlap
+            overlap = []
+            overlap_tokens = 0
+            for prev_sentence, prev_tokens in reversed(current):
+                carried = overlap_tokens + prev_tokens + 1
+                if carried > overlap_budget or carried + tokens + 1 > max_tokens:
+                    break
+                overlap.insert(0, (prev_sentence, prev_tokens))
+                overlap_tokens += prev_tokens + 1
+            current = overlap
+            current_tokens = overlap_tokens
+            new_since_emit = False
+
+        current.append((sentence, tokens))
+        current_tokens += tokens + 1
+        new_since_emit = True
+
+    if current and new_since_emit:
+        chunks.append(" ".join(s for s, _ in current))
+
+    return chunks
+
+def _split_table(text, count_tokens, max_tokens):
+    """
+    Split an oversized table on row boundaries.
+    """
+    pieces = []
+    current_rows = []
+    current_tokens = 0
+
+    for row in text.split("\n"):
+        row_tokens = count_tokens(row)
+        if row_tokens > max_tokens:
+            pieces.extend(split_long_sentence(row, count_tokens, max_tokens))
+            continue
+        if current_rows and current_tokens + row_tokens + 1 > max_tokens:
+            pieces.append("\n".join(current_rows))
+            current_rows = []
+            current_tokens = 0
+        current_rows.append(row)
+        current_tokens += row_tokens + 1
+    if current_rows:
+        pieces.append("\n".join(current_rows))
+
+    return pieces
+
+def chunk_segments(segments, count_tokens, max_tokens, overlap_ratio=0.2):
+    """
+    Pack extractor segments into chunks without crossing page/slide boundaries.
+
+    Args:
+        segments (list): Segments from document_segments (dicts with type,
+            text, page and slide).
+        count_tokens (callable): Token counter of the embedding provider.
+        max_tokens (int): Token budget per chunk.
+        overlap_ratio (float): Sentence overlap used when a single segment
+            has to be split.
+
+    Returns:
+        List of (chunk_text, metadata) tuples. metadata holds the page,
+        slide and segment types the chunk was built from.
+    """
+    chunks = []
+
+    def emit(units, boundary):
+        chunks.append((
+            "\n".join(text for text, _, _ in units),
+            dict(zip(HARD_BOUNDARY_KEYS, boundary), segment_types=sorted({kind for _, _, kind in units}))
+        ))
+
+    current = []
+    current_tokens = 0
+    current_boundary = None
+
+    for segment in segments:
+        boundary = tuple(segment.get(key) for key in HARD_BOUNDARY_KEYS)
+        if current and boundary != current_boundary:
+            emit(current, current_boundary)
+            current = []
+            current_tokens = 0
+        current_boundary = boundary
+
+        text = segment["text"]
+        tokens = count_tokens(text)
+        if tokens <= max_tokens:
+            units = [(text, tokens)]
+        elif segment["type"] == "table":
+            units = [(piece, count_tokens(piece)) for piece in _split_table(text, count_tokens, max_tokens)]
+        else:
+            pieces = token_chunk_text(text, count_tokens, max_tokens, overlap_ratio=overlap_ratio)
+            units = [(piece, count_tokens(piece)) for piece in pieces]
+
+        for unit_text, unit_tokens in units:
+            if current and current_tokens + unit_tokens + 1 > max_tokens:
+                emit(current, current_boundary)
+                current = []
+                current_tokens = 0
+            current.append((unit_text, unit_tokens, segment["type"]))
+            current_tokens += unit_tokens + 1
+
+    if current:
+        emit(current, current_boundary)
+
+    return chunks
+
+def auto_chunk_for_provider(segments, embedding_provider, overlap_ratio=0.2):
+    """
+    Split document segments into chunks sized to the embedding provider's token limit.
+    """
+    return chunk_segments(
+        segments,
+        embedding_provider.count_tokens,
+        embedding_provider.get_max_tokens(),
+        overlap_ratio=overlap_ratio
+    )
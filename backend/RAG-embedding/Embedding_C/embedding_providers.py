@@ -2,20 +2,80 @@
 Embedding providers for different APIs
 """
 import os
-import requests
+import re
 import json
+import time
+import asyncio
+import inspect
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import List, Optional
 
+# Rough word-piece approximation used when no real tokenizer is available
+_APPROX_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Exported (and quantized) ONNX models, one folder per model
+ONNX_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "onnx_models")
+
 class EmbeddingProvider:
     """Base class for embedding providers"""
     
+    # Provider calls allowed in flight at once by aembed_batch. Local models
+    # gain nothing from concurrent calls; remote providers raise this to hide
+    # network latency.
+    max_in_flight = 1
+    
+    # Texts per provider call made by aembed_batch
+    request_batch_size = 32
+    
     def embed_text(self, text: str) -> List[float]:
         """Generate embedding for text"""
         raise NotImplementedError
     
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for several texts, in order"""
+        return [self.embed_text(text) for text in texts]
+    
+    async def aembed_batch(self, texts: List[str], max_in_flight: Optional[int] = None,
+                           return_exceptions: bool = False) -> List[List[float]]:
+        """
+        Generate embeddings for several texts without blocking the event loop.
+        
+        Texts are split into calls of request_batch_size; up to max_in_flight
+        calls run at once in worker threads. Results are returned in the order
+        of texts.
+        
+        Args:
+            texts (list): Texts to embed.
+            max_in_flight (int): Concurrent calls (default: the provider's max_in_flight).
+            return_exceptions (bool): Instead of raising the first error, put a
+                failed call's exception in place of each of its texts' embeddings.
+        """
+        semaphore = asyncio.Semaphore(max(1, max_in_flight or self.max_in_flight))
+        
+        async def embed(batch):
+            async with semaphore:
+                return await asyncio.to_thread(self.embed_batch, batch)
+        
+        batches = [texts[start:start + self.request_batch_size]
+                   for start in range(0, len(texts), self.request_batch_size)]
+        results = await asyncio.gather(*(embed(batch) for batch in batches), return_exceptions=return_exceptions)
+        return [embedding
+                for batch, result in zip(batches, results)
+                for embedding in ([result] * len(batch) if isinstance(result, BaseException) else result)]
+    
     def get_dimension(self) -> int:
         """Get embedding dimension"""
         raise NotImplementedError
+    
+    def count_tokens(self, text: str) -> int:
+        """Count tokens in text, excluding special tokens added by the model"""
+        return len(_APPROX_TOKEN_PATTERN.findall(text))
+    
+    def get_max_tokens(self) -> int:
+        """Get the number of content tokens the model embeds before truncating"""
+        return 512
 
 class DummyEmbeddingProvider(EmbeddingProvider):
     """Dummy provider for testing - generates random-like embeddings"""
@@ -48,33 +108,55 @@ class DummyEmbeddingProvider(EmbeddingProvider):
 class OpenAIEmbeddingProvider(EmbeddingProvider):
     """OpenAI embedding provider"""
     
-    def __init__(self, api_key: Optional[str] = None, model: str = "text-embedding-3-small"):
+    def __init__(self, api_key: Optional[str] = None, model: str = "text-embedding-3-small",
+                 dimensions: Optional[int] = None, max_in_flight: int = 4, request_batch_size: int = 16,
+                 timeout: float = 60.0, base_url: Optional[str] = None):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.model = model
-        self.base_url = "https://api.openai.com/v1/embeddings"
+        # text-embedding-3-* models can return shortened vectors (e.g. 256 or 512)
+        self.dimensions = dimensions
+        self.max_in_flight = max_in_flight
+        self.request_batch_size = request_batch_size
+        self.timeout = timeout
+        # Any OpenAI-compatible embeddings endpoint
+        self.base_url = base_url or "https://api.openai.com/v1/embeddings"
+        self._encoding = None
         
         if not self.api_key:
             raise ValueError("OpenAI API key not provided. Set OPENAI_API_KEY environment variable.")
+        if dimensions is not None and model == "text-embedding-ada-002":
+            raise ValueError("text-embedding-ada-002 does not support the dimensions parameter")
     
     def embed_text(self, text: str) -> List[float]:
         """Generate embedding using OpenAI API"""
+        return self.embed_batch([text])[0]
+    
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed several texts in one API request"""
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
         
         data = {
-            "input": text,
+            "input": texts,
             "model": self.model
         }
+        if self.dimensions:
+            data["dimensions"] = self.dimensions
         
-        response = requests.post(self.base_url, headers=headers, json=data)
+        # Imported here so processes that never call OpenAI skip loading requests
+        import requests
+        response = requests.post(self.base_url, headers=headers, json=data, timeout=self.timeout)
         response.raise_for_status()
         
         result = response.json()
-        return result["data"][0]["embedding"]
+        # Items carry their input position
+        return [item["embedding"] for item in sorted(result["data"], key=lambda item: item["index"])]
     
     def get_dimension(self) -> int:
+        if self.dimensions:
+            return self.dimensions
         # Model dimensions
         dimensions = {
             "text-embedding-3-small": 1536,
@@ -82,6 +164,22 @@ class OpenAIEmbeddingProvider(EmbeddingProvider):
             "text-embedding-ada-002": 1536
         }
         return dimensions.get(self.model, 1536)
+    
+    def count_tokens(self, text: str) -> int:
+        """Count tokens with tiktoken when installed, otherwise approximate"""
+        if self._encoding is None:
+            try:
+                import tiktoken
+                self._encoding = tiktoken.encoding_for_model(self.model)
+            except Exception:
+                self._encoding = False
+        if self._encoding:
+            return len(self._encoding.encode(text))
+        return super().count_tokens(text)
+    
+    def get_max_tokens(self) -> int:
+        # All current OpenAI embedding models accept 8191 input tokens
+        return 8191
 
 class HuggingFaceEmbeddingProvider(EmbeddingProvider):
     """HuggingFace embedding provider using sentence-transformers"""
@@ -99,6 +197,18 @@ class HuggingFaceEmbeddingProvider(EmbeddingProvider):
         embedding = self.model.encode(text)
         return embedding.tolist()
     
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in batched forward passes"""
+        return self.model.encode(texts, batch_size=32, show_progress_bar=False).tolist()
+    
+    def count_tokens(self, text: str) -> int:
+        """Count tokens with the model's own tokenizer"""
+        return len(self.model.tokenizer.tokenize(text))
+    
+    def get_max_tokens(self) -> int:
+        # max_seq_length includes the [CLS] and [SEP] special tokens
+        return self.model.max_seq_length - 2
+    
     def get_dimension(self) -> int:
         # Common model dimensions
         dimensions = {
@@ -109,13 +219,428 @@ class HuggingFaceEmbeddingProvider(EmbeddingProvider):
         }
         return dimensions.get(self.model_name, 384)
 
+def export_onnx_model(model_name: str, model_dir: str) -> str:
+    """
+    Export a sentence-transformers model to ONNX.
+    
+    The transformer is exported with dynamic batch and sequence axes and
+    returns token embeddings; pooling and normalization are replayed in
+    numpy from the settings saved next to it, so the ONNX path produces the
+    same vectors as SentenceTransformer.encode.
+    
+    Returns:
+        Path to model.onnx in model_dir.
+    """
+    try:
+        import torch
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        raise ImportError("Exporting to ONNX needs sentence-transformers. Run: pip install sentence-transformers")
+    
+    print(f"📦 Exporting {model_name} to ONNX...")
+    model = SentenceTransformer(model_name, device="cpu")
+    modules = [module.__class__.__name__ for module in model]
+    unsupported = [name for name in modules if name not in ("Transformer", "Pooling", "Normalize")]
+    if unsupported:
+        raise ValueError(f"Cannot export {model_name} to ONNX: unsupported modules {unsupported}")
+    
+    pooling_mode = "mean"
+    for module in model:
+        if module.__class__.__name__ == "Pooling":
+            # sentence-transformers < 5 exposes the mode through get_pooling_mode_str()
+            if hasattr(module, "get_pooling_mode_str"):
+                pooling_mode = module.get_pooling_mode_str()
+            else:
+                pooling_mode = module.pooling_mode
+    if pooling_mode not in ("mean", "cls", "max"):
+        raise ValueError(f"Cannot export {model_name} to ONNX: unsupported pooling {pooling_mode}")
+    
+    tokenizer = model.tokenizer
+    auto_model = model[0].auto_model.eval()
+    sample = tokenizer(["ONNX export"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    
+    class TokenEmbeddings(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.auto_model = auto_model
+        
+        def forward(self, *inputs):
+            return self.auto_model(**dict(zip(input_names, inputs)))[0]
+    
+    os.makedirs(model_dir, exist_ok=True)
+    model_path = os.path.join(model_dir, "model.onnx")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["token_embeddings"]}
+    export_options = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # The TorchScript exporter handles dynamic_axes without onnxscript
+        export_options["dynamo"] = False
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(), tuple(sample[name] for name in input_names), model_path + ".tmp",
+            input_names=input_names, output_names=["token_embeddings"],
+            dynamic_axes=dynamic_axes, opset_version=14, **export_options
+        )
+    os.replace(model_path + ".tmp", model_path)
+    tokenizer.save_pretrained(model_dir)
+    
+    # Written last: its presence marks a complete export
+    with open(os.path.join(model_dir, "settings.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "pooling_mode": pooling_mode,
+            "normalize": "Normalize" in modules,
+            "max_seq_length": model.max_seq_length,
+            # Mean/CLS/max pooling keep the transformer's hidden size
+            "dimension": auto_model.config.hidden_size
+        }, f, indent=2)
+    print(f"✅ ONNX model saved to: {model_dir}")
+    return model_path
+
+def quantize_onnx_model(model_dir: str) -> str:
+    """Dynamically quantize the weights of model.onnx to int8; returns the quantized model path."""
+    quantized_path = os.path.join(model_dir, "model.int8.onnx")
+    if not os.path.exists(quantized_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        print("🗜️ Quantizing ONNX model to int8...")
+        quantize_dynamic(os.path.join(model_dir, "model.onnx"), quantized_path + ".tmp", weight_type=QuantType.QInt8)
+        os.replace(quantized_path + ".tmp", quantized_path)
+    return quantized_path
+
+class ONNXEmbeddingProvider(EmbeddingProvider):
+    """sentence-transformers model exported to ONNX and run with onnxruntime on CPU"""
+    
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", quantize: bool = False,
+                 num_threads: Optional[int] = None, batch_size: int = 32, cache_dir: str = ONNX_CACHE_DIR):
+        """
+        Args:
+            model_name (str): sentence-transformers model; exported on first use.
+            quantize (bool): Run the dynamically int8-quantized model.
+            num_threads (int): onnxruntime intra-op threads (default: physical cores).
+                Lower it when several ingestion processes share the machine.
+            batch_size (int): Texts per forward pass in embed_batch.
+            cache_dir (str): Where exported models are kept.
+        """
+        try:
+            import numpy as np
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError:
+            raise ImportError("onnxruntime not installed. Run: pip install onnxruntime transformers")
+        
+        self._np = np
+        self.model_name = model_name
+        self.batch_size = batch_size
+        model_dir = os.path.join(cache_dir, model_name.replace("/", "__"))
+        if not os.path.exists(os.path.join(model_dir, "settings.json")):
+            export_onnx_model(model_name, model_dir)
+        with open(os.path.join(model_dir, "settings.json"), "r", encoding="utf-8") as f:
+            self.settings = json.load(f)
+        
+        model_path = quantize_onnx_model(model_dir) if quantize else os.path.join(model_dir, "model.onnx")
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = [model_input.name for model_input in self.session.get_inputs()]
+    
+    def _encode(self, texts: List[str]):
+        """One forward pass plus pooling; returns a (len(texts), dimension) array."""
+        np = self._np
+        inputs = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.settings["max_seq_length"], return_tensors="np"
+        )
+        feed = {name: inputs[name].astype(np.int64) for name in self._input_names}
+        token_embeddings = self.session.run(None, feed)[0]
+        
+        mask = inputs["attention_mask"][..., None].astype(token_embeddings.dtype)
+        pooling_mode = self.settings["pooling_mode"]
+        if pooling_mode == "cls":
+            embeddings = token_embeddings[:, 0]
+        elif pooling_mode == "max":
+            embeddings = np.where(mask > 0, token_embeddings, -1e9).max(axis=1)
+        else:
+            embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        
+        if self.settings["normalize"]:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.clip(norms, 1e-12, None)
+        return embeddings
+    
+    def embed_text(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
+    
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in batches of similar length (less padding), returned in input order"""
+        order = sorted(range(len(texts)), key=lambda index: len(texts[index]))
+        embeddings = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for index, embedding in zip(batch, self._encode([texts[index] for index in batch])):
+                embeddings[index] = embedding.tolist()
+        return embeddings
+    
+    def count_tokens(self, text: str) -> int:
+        """Count tokens with the model's own tokenizer"""
+        return len(self.tokenizer.tokenize(text))
+    
+    def get_max_tokens(self) -> int:
+        # max_seq_length includes the [CLS] and [SEP] special tokens
+        return self.settings["max_seq_length"] - 2
+    
+    def get_dimension(self) -> int:
+        return self.settings["dimension"]
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker over a rolling window of call outcomes.
+    
+    Opens when at least min_requests calls in the window failed at
+    error_rate or more. After cooldown seconds one trial call is let
+    through; a success closes the breaker again, a failure re-opens it.
+    """
+    
+    def __init__(self, window: int = 20, min_requests: int = 5, error_rate: float = 0.5, cooldown: float = 30.0):
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if self._trial else "open"
+    
+    def retry_at(self) -> float:
+        """Monotonic time at which the next trial call is allowed (0 when closed)"""
+        with self._lock:
+            return 0.0 if self._opened_at is None else self._opened_at + self.cooldown
+    
+    def _ready_locked(self) -> bool:
+        if self._opened_at is None:
+            return True
+        return not self._trial and time.monotonic() - self._opened_at >= self.cooldown
+    
+    def ready(self) -> bool:
+        """Whether a call could be sent now"""
+        with self._lock:
+            return self._ready_locked()
+    
+    def allow(self) -> bool:
+        """Whether a call may be sent now; claims the trial call of an open breaker."""
+        with self._lock:
+            if not self._ready_locked():
+                return False
+            if self._opened_at is not None:
+                self._trial = True
+            return True
+    
+    def record(self, success: bool):
+        with self._lock:
+            if self._opened_at is not None:
+                if success:
+                    self._opened_at = None
+                    self._outcomes.clear()
+                else:
+                    self._opened_at = time.monotonic()
+                self._trial = False
+                return
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_requests and failures >= self.error_rate * len(self._outcomes):
+                self._opened_at = time.monotonic()
+
+def _quantile(sorted_values: list, q: float) -> float:
+    """Value at quantile q (0-1) of an ascending, non-empty list."""
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+class _Route:
+    """One provider behind the router, with its latency window and breaker"""
+    
+    def __init__(self, name: str, provider: EmbeddingProvider, breaker: CircuitBreaker, latency_window: int):
+        self.name = name
+        self.provider = provider
+        self.breaker = breaker
+        self.latencies = deque(maxlen=latency_window)
+        self.counts = {"requests": 0, "errors": 0, "wins": 0}
+
+class RoutingEmbeddingProvider(EmbeddingProvider):
+    """
+    Routes embedding calls over several providers of the same model/dimension.
+    
+    A call goes to the first healthy provider. If it has not answered after
+    that provider's hedge_quantile latency (p95 by default), a duplicate is
+    sent to the next provider and the first response wins; a failed call is
+    retried on the next provider right away. Providers with elevated error
+    rates are skipped while their circuit breaker is open.
+    """
+    
+    def __init__(self, providers: list, hedge_quantile: float = 0.95, initial_hedge_delay: float = 1.0,
+                 min_hedge_delay: float = 0.05, min_latency_samples: int = 10, latency_window: int = 100,
+                 timeout: float = 60.0, error_rate: float = 0.5, min_requests: int = 5, window: int = 20,
+                 cooldown: float = 30.0, max_in_flight: int = 4, request_batch_size: int = 16):
+        """
+        Args:
+            providers (list): Provider configs in order of preference, e.g.
+                {"type": "openai", "model": "text-embedding-3-small", "base_url": ...},
+                or EmbeddingProvider instances.
+            hedge_quantile (float): Latency quantile after which a call is hedged.
+            initial_hedge_delay (float): Hedge delay until min_latency_samples calls are timed.
+            min_hedge_delay (float): Lower bound of the hedge delay, in seconds.
+            timeout (float): Seconds to wait for any provider before giving up.
+            error_rate, min_requests, window, cooldown: CircuitBreaker settings.
+        """
+        if not providers:
+            raise ValueError("RoutingEmbeddingProvider needs at least one provider")
+        self.routes = []
+        for index, entry in enumerate(providers):
+            if isinstance(entry, EmbeddingProvider):
+                name, provider = f"{index}:{type(entry).__name__}", entry
+            else:
+                entry = dict(entry)
+                provider_type = entry.pop("type")
+                if provider_type == "routing":
+                    raise ValueError("Routing providers cannot be nested")
+                name = f"{index}:{provider_type}:{entry.get('base_url') or entry.get('model') or entry.get('model_name', '')}"
+                provider = get_embedding_provider(provider_type, **entry)
+            breaker = CircuitBreaker(window, min_requests, error_rate, cooldown)
+            self.routes.append(_Route(name, provider, breaker, latency_window))
+        
+        dimensions = {route.provider.get_dimension() for route in self.routes}
+        if len(dimensions) > 1:
+            raise ValueError(f"Routed providers must share one embedding dimension, got {sorted(dimensions)}")
+        
+        self.hedge_quantile = hedge_quantile
+        self.initial_hedge_delay = initial_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_latency_samples = min_latency_samples
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.request_batch_size = request_batch_size
+        self.hedges = 0
+        self._lock = threading.Lock()
+        # Hedged calls that lost keep running until their provider answers
+        self._executor = ThreadPoolExecutor(max_workers=max(8, 2 * max_in_flight * len(self.routes)),
+                                            thread_name_prefix="embedding-route")
+    
+    def hedge_delay(self, route: _Route) -> float:
+        """Seconds to wait for route before hedging: its latency quantile."""
+        with self._lock:
+            latencies = sorted(route.latencies)
+        if len(latencies) < self.min_latency_samples:
+            return self.initial_hedge_delay
+        return max(self.min_hedge_delay, _quantile(latencies, self.hedge_quantile))
+    
+    def _candidates(self):
+        """Routes whose breaker lets a call through, in order of preference, and whether that is forced"""
+        candidates = [route for route in self.routes if route.breaker.ready()]
+        if not candidates:
+            # Every breaker is open: try the one that recovers first rather than fail outright
+            return [min(self.routes, key=lambda route: route.breaker.retry_at())], True
+        return candidates, False
+    
+    def _call(self, route: _Route, texts: List[str]) -> List[List[float]]:
+        start = time.monotonic()
+        with self._lock:
+            route.counts["requests"] += 1
+        try:
+            embeddings = route.provider.embed_batch(texts)
+            if len(embeddings) != len(texts):
+                raise ValueError(f"expected {len(texts)} embeddings, got {len(embeddings)}")
+        except Exception:
+            with self._lock:
+                route.counts["errors"] += 1
+            route.breaker.record(False)
+            raise
+        with self._lock:
+            route.latencies.append(time.monotonic() - start)
+        route.breaker.record(True)
+        return embeddings
+    
+    def embed_text(self, text: str) -> List[float]:
+        return self.embed_batch([text])[0]
+    
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with the first provider to answer"""
+        candidates, forced = self._candidates()
+        deadline = time.monotonic() + self.timeout
+        pending = {}
+        errors = []
+        launched = 0
+        hedge_at = None
+        
+        while True:
+            now = time.monotonic()
+            # Launch the next provider when the current ones are slow (hedge) or all failed (failover)
+            if launched < len(candidates) and (not pending or now >= hedge_at):
+                route = candidates[launched]
+                launched += 1
+                if not route.breaker.allow() and not forced:
+                    # Another call took this breaker's trial slot
+                    continue
+                if pending:
+                    with self._lock:
+                        self.hedges += 1
+                pending[self._executor.submit(self._call, route, texts)] = route
+                hedge_at = now + self.hedge_delay(route)
+            if not pending:
+                raise RuntimeError(f"All embedding providers failed: {'; '.join(errors)}")
+            if now >= deadline:
+                raise TimeoutError(f"No embedding provider answered within {self.timeout}s")
+            
+            wait_until = deadline if launched == len(candidates) else min(deadline, hedge_at)
+            done, _ = wait(pending, timeout=max(0.0, wait_until - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                route = pending.pop(future)
+                try:
+                    embeddings = future.result()
+                except Exception as e:
+                    errors.append(f"{route.name}: {e}")
+                    continue
+                with self._lock:
+                    route.counts["wins"] += 1
+                return embeddings
+    
+    def stats(self) -> dict:
+        """Per-provider counters, latency quantiles and breaker state."""
+        routes = {}
+        for route in self.routes:
+            with self._lock:
+                latencies = sorted(route.latencies)
+                counts = dict(route.counts)
+            p50, p95 = (round(_quantile(latencies, q), 4) if latencies else None for q in (0.5, 0.95))
+            routes[route.name] = dict(counts, p50=p50, p95=p95, breaker=route.breaker.state)
+        return {"hedges": self.hedges, "providers": routes}
+    
+    def get_dimension(self) -> int:
+        return self.routes[0].provider.get_dimension()
+    
+    def count_tokens(self, text: str) -> int:
+        return self.routes[0].provider.count_tokens(text)
+    
+    def get_max_tokens(self) -> int:
+        # Chunks must fit every provider a call may be routed to
+        return min(route.provider.get_max_tokens() for route in self.routes)
+
 def get_embedding_provider(provider_type: str = "dummy", **kwargs) -> EmbeddingProvider:
     """Factory function to get embedding provider"""
     
     providers = {
         "dummy": DummyEmbeddingProvider,
         "openai": OpenAIEmbeddingProvider,
-        "huggingface": HuggingFaceEmbeddingProvider
+        "huggingface": HuggingFaceEmbeddingProvider,
+        "onnx": ONNXEmbeddingProvider,
+        "routing": RoutingEmbeddingProvider
     }
     
     if provider_type not in providers:
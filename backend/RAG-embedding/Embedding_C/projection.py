@@ -0,0 +1,134 @@
+"""
+Corpus-level PCA projection for the vector index
+
+Storage, RAM and search cost grow linearly with the embedding dimension.
+For providers that cannot return shorter vectors themselves (unlike OpenAI's
+"dimensions" parameter), a PCA projection fitted on the stored vectors
+reduces them to e.g. 256 dimensions. The Embeddings/*.json files keep the
+full vectors; the index holds projected ones, and the vector store projects
+new documents and queries with the same projection.
+
+Fit a projection and rebuild the index (searches keep working meanwhile;
+stop ingestion while it runs):
+    python -m Embedding_C.projection --dimensions 256
+Go back to full vectors:
+    python -m Embedding_C.projection --remove
+"""
+
+import os
+import json
+import numpy as np
+
+# Vectors sampled from the corpus to fit the projection
+DEFAULT_SAMPLE_SIZE = 20000
+
+class PCAProjection:
+    """Mean-centered linear projection onto the top principal components"""
+
+    def __init__(self, mean, components, explained_variance_ratio=None):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+        self.explained_variance_ratio = explained_variance_ratio
+
+    @property
+    def input_dimension(self):
+        return self.components.shape[1]
+
+    @property
+    def output_dimension(self):
+        return self.components.shape[0]
+
+    @classmethod
+    def fit(cls, vectors, dimensions):
+        """
+        Fit on a sample of corpus vectors.
+
+        Args:
+            vectors (np.ndarray): (n, d) sample of stored vectors.
+            dimensions (int): Output dimension, at most min(n, d).
+        """
+        vectors = np.asarray(vectors, dtype=np.float64)
+        if dimensions > min(vectors.shape):
+            raise ValueError(f"Cannot fit {dimensions} components on a {vectors.shape[0]}x{vectors.shape[1]} sample")
+        mean = vectors.mean(axis=0)
+        _, singular_values, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+        variance = singular_values ** 2
+        ratio = float(variance[:dimensions].sum() / variance.sum()) if variance.sum() else 1.0
+        return cls(mean, vt[:dimensions], ratio)
+
+    def transform(self, vectors):
+        """Project (n, input_dimension) vectors; callers normalize the result."""
+        return (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components.T
+
+    def save(self, path):
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, mean=self.mean, components=self.components,
+                 explained_variance_ratio=np.float64(self.explained_variance_ratio or 0.0))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["mean"], data["components"], float(data["explained_variance_ratio"]))
+
+def iter_embeddings_files(embeddings_dir):
+    """(doc_id, records, vectors) for every Embeddings/<doc_id>.json file."""
+    for name in sorted(os.listdir(embeddings_dir)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(embeddings_dir, name), "r", encoding="utf-8") as f:
+            records = json.load(f)
+        if records:
+            doc_id = records[0].get("doc_id") or os.path.splitext(name)[0]
+            yield doc_id, records, [record["embedding"] for record in records]
+
+def sample_vectors(documents, sample_size=DEFAULT_SAMPLE_SIZE, seed=0):
+    """Uniform reservoir sample of vectors across documents."""
+    rng = np.random.default_rng(seed)
+    sample = []
+    seen = 0
+    for _, _, vectors in documents:
+        for vector in vectors:
+            if len(sample) < sample_size:
+                sample.append(vector)
+            else:
+                slot = rng.integers(0, seen + 1)
+                if slot < sample_size:
+                    sample[slot] = vector
+            seen += 1
+    return np.asarray(sample, dtype=np.float32)
+
+if __name__ == "__main__":
+    import argparse
+    from .vector_store import get_vector_store
+
+    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Fit a PCA projection and rebuild the vector index")
+    parser.add_argument("--embeddings-dir", default=os.path.join(script_dir, "Embeddings"))
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--dimensions", type=int, help="Projected dimension, e.g. 256")
+    group.add_argument("--remove", action="store_true", help="Rebuild the index with full vectors")
+    parser.add_argument("--sample", type=int, default=DEFAULT_SAMPLE_SIZE, help="Vectors used for fitting")
+    args = parser.parse_args()
+
+    store = get_vector_store(args.embeddings_dir)
+    snapshot = store.snapshot()
+
+    # Only documents that are live in the index are re-indexed
+    def live_documents():
+        for doc_id, records, vectors in iter_embeddings_files(args.embeddings_dir):
+            if snapshot.contains(doc_id):
+                yield doc_id, records, vectors
+
+    projection = None
+    if args.dimensions:
+        sample = sample_vectors(live_documents(), args.sample)
+        if not len(sample):
+            print("❌ No indexed embeddings to fit on")
+            raise SystemExit(1)
+        projection = PCAProjection.fit(sample, args.dimensions)
+        print(f"📐 PCA {projection.input_dimension} → {projection.output_dimension} dimensions keeps "
+              f"{projection.explained_variance_ratio:.1%} of the variance ({len(sample)} sampled vectors)")
+
+    store.rebuild(live_documents(), projection)
+    print(f"✅ Index rebuilt: {store.stats()}")
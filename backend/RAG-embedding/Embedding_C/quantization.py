@@ -0,0 +1,168 @@
+"""
+Compressed vector codes for the vector store
+
+Segments can keep a compact code per vector in RAM and leave the float32
+vectors on disk (memory-mapped). Searches score the codes, then rescore the
+best candidates with the exact vectors, which only touches a few rows of
+the mapped file.
+
+Modes:
+    float32 - no compression, vectors are searched directly (4 bytes/dim)
+    float16 - half precision copy (2 bytes/dim)
+    int8    - per-dimension scaled int8 (1 byte/dim)
+    binary  - sign bits, scored by Hamming distance (1 bit/dim)
+
+Run this module to see memory use and recall per mode on the current index:
+    python -m Embedding_C.quantization
+"""
+
+import numpy as np
+
+QUANTIZATION_MODES = ("float32", "float16", "int8", "binary")
+
+# Candidates rescored with the exact vectors, as a multiple of k
+RESCORE_FACTOR = 4
+
+# Rows converted to float32 at a time when scoring codes
+SCORE_BLOCK_ROWS = 65536
+
+# Set bits of every byte value; np.bitwise_count needs numpy 2
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+def check_mode(mode):
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode: {mode}. Available: {list(QUANTIZATION_MODES)}")
+    return mode
+
+def bytes_per_vector(dimension, mode):
+    """Size of one stored code in bytes."""
+    check_mode(mode)
+    if mode == "binary":
+        return (dimension + 7) // 8
+    return dimension * {"float32": 4, "float16": 2, "int8": 1}[mode]
+
+def encode(vectors, mode):
+    """
+    Compress L2-normalized float32 vectors.
+
+    Returns:
+        (codes, scales) - scales is the per-dimension int8 step, None for other modes.
+    """
+    check_mode(mode)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if mode == "float32":
+        return vectors, None
+    if mode == "float16":
+        return vectors.astype(np.float16), None
+    if mode == "int8":
+        scales = np.abs(vectors).max(axis=0) / 127.0 if len(vectors) else np.ones(vectors.shape[1], np.float32)
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    return np.packbits(vectors > 0, axis=1), None
+
+def score(codes, query, mode, scales=None):
+    """
+    Approximate similarity of a normalized query to every code (higher is better).
+
+    float16/int8 codes are widened block by block, so scoring never holds a
+    full float32 copy of the segment in memory. Binary codes are scored by
+    negative Hamming distance, counted with a per-byte lookup table.
+    """
+    if mode == "float32":
+        return codes @ query
+
+    scores = np.empty(len(codes), dtype=np.float32)
+    if mode == "binary":
+        query_bits = np.packbits(query > 0)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = codes[start:start + SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = -_POPCOUNT[block ^ query_bits].sum(axis=1, dtype=np.int32)
+        return scores
+
+    weights = query * scales if mode == "int8" else query
+    for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+        block = codes[start:start + SCORE_BLOCK_ROWS]
+        scores[start:start + len(block)] = block.astype(np.float32) @ weights
+    return scores
+
+def _top_rows(scores, count):
+    count = min(count, len(scores))
+    rows = np.argpartition(-scores, count - 1)[:count]
+    return rows[np.argsort(-scores[rows])]
+
+def quantization_report(vectors, queries, k=10, rescore_factor=RESCORE_FACTOR):
+    """
+    Memory and recall@k of every mode against exact float32 search.
+
+    Args:
+        vectors (np.ndarray): Normalized corpus vectors.
+        queries (np.ndarray): Normalized query vectors.
+        k (int): Results per query.
+        rescore_factor (int): Candidates rescored exactly, as a multiple of k.
+
+    Returns:
+        List of dicts with mode, bytes_per_vector, memory_mb (codes held in
+        RAM), recall (codes only) and recall_rescored.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    dimension = vectors.shape[1]
+    exact = [set(_top_rows(vectors @ query, k)) for query in queries]
+
+    report = []
+    for mode in QUANTIZATION_MODES:
+        codes, scales = encode(vectors, mode)
+        hits = 0
+        hits_rescored = 0
+        for query, truth in zip(queries, exact):
+            approximate = score(codes, query, mode, scales)
+            hits += len(truth & set(_top_rows(approximate, k)))
+
+            candidates = _top_rows(approximate, k * rescore_factor)
+            rescored = vectors[candidates] @ query
+            hits_rescored += len(truth & set(candidates[_top_rows(rescored, k)]))
+
+        total = max(1, len(queries) * min(k, len(vectors)))
+        report.append({
+            "mode": mode,
+            "bytes_per_vector": bytes_per_vector(dimension, mode),
+            "memory_mb": round(len(vectors) * bytes_per_vector(dimension, mode) / 1024 / 1024, 2),
+            "recall": round(hits / total, 4),
+            "recall_rescored": round(hits_rescored / total, 4)
+        })
+    return report
+
+def print_report(report, vector_count):
+    print(f"📊 Quantization report over {vector_count} vectors")
+    print(f"{'mode':<9} {'bytes/vec':>10} {'RAM (MB)':>10} {'recall':>8} {'rescored':>9}")
+    for row in report:
+        print(f"{row['mode']:<9} {row['bytes_per_vector']:>10} {row['memory_mb']:>10} "
+              f"{row['recall']:>8.3f} {row['recall_rescored']:>9.3f}")
+
+if __name__ == "__main__":
+    import os
+    import argparse
+    from .vector_store import get_vector_store
+
+    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Memory and recall per quantization mode")
+    parser.add_argument("--embeddings-dir", default=os.path.join(script_dir, "Embeddings"))
+    parser.add_argument("--queries", type=int, default=100, help="Sample queries drawn from the corpus")
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    snapshot = get_vector_store(args.embeddings_dir).snapshot()
+    corpus = [np.asarray(segment.vectors) for segment in snapshot.segments if len(segment)]
+    if not corpus:
+        print("❌ The index is empty")
+        raise SystemExit(1)
+    corpus = np.vstack(corpus)
+
+    # Perturbed corpus vectors stand in for real queries
+    rng = np.random.default_rng(0)
+    sample = corpus[rng.choice(len(corpus), size=min(args.queries, len(corpus)), replace=False)]
+    sample = sample + rng.normal(scale=0.5 / np.sqrt(corpus.shape[1]), size=sample.shape).astype(np.float32)
+    sample /= np.linalg.norm(sample, axis=1, keepdims=True)
+
+    print_report(quantization_report(corpus, sample, k=args.k), len(corpus))
@@ -0,0 +1,139 @@
+"""
+Cross-encoder reranking for search results
+
+Vector search returns candidates ranked by bi-encoder similarity, which is
+fast but noisy. The reranker scores (query, chunk) pairs jointly with a small
+cross-encoder on CPU, in batched forward passes, so a few well-ranked chunks
+can replace a long list in the LLM prompt.
+
+Scores are cached per (query hash, chunk hash), so repeated or refined
+queries over the same chunks skip the model. A time budget bounds the added
+latency: candidates not scored in time keep their vector-search order after
+the reranked ones.
+"""
+
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+DEFAULT_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+# Candidates taken from vector search for reranking
+DEFAULT_CANDIDATES = 20
+
+# Pairs per forward pass
+DEFAULT_BATCH_SIZE = 32
+
+# Maximum seconds spent scoring per query
+DEFAULT_TIME_BUDGET = 0.5
+
+# Maximum number of cached pair scores
+MAX_CACHE_ENTRIES = 50000
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+class CrossEncoderReranker:
+    """Reranks search results with a sentence-transformers CrossEncoder on CPU"""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, candidates: int = DEFAULT_CANDIDATES,
+                 batch_size: int = DEFAULT_BATCH_SIZE, time_budget: float = DEFAULT_TIME_BUDGET,
+                 max_length: int = 512):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError:
+            raise ImportError("sentence-transformers not installed. Run: pip install sentence-transformers")
+        self.model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+        self.model_name = model_name
+        self.candidates = candidates
+        self.batch_size = batch_size
+        self.time_budget = time_budget
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "over_budget": 0}
+
+    def _score_pairs(self, pairs: List[List[str]]) -> List[float]:
+        """One batched forward pass over (query, text) pairs."""
+        return [float(score) for score in self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)]
+
+    def _cache_get(self, key):
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self._stats["hits"] += 1
+                return self._cache[key]
+            self._stats["misses"] += 1
+            return None
+
+    def _cache_put(self, key, score):
+        with self._cache_lock:
+            self._cache[key] = score
+            self._cache.move_to_end(key)
+            while len(self._cache) > MAX_CACHE_ENTRIES:
+                self._cache.popitem(last=False)
+
+    def rerank(self, query: str, results: List[dict], k: Optional[int] = None) -> List[dict]:
+        """
+        Reorder search results by cross-encoder relevance.
+
+        Args:
+            query (str): The search query.
+            results (list): Records from VectorStore.search, best first.
+                The first max(k, candidates) are reranked.
+            k (int): Number of results to return (default: all).
+
+        Returns:
+            The top k records with an added "rerank_score" (None for
+            candidates that were not scored within the time budget).
+        """
+        start = time.perf_counter()
+        # Never rerank fewer records than were asked for
+        candidates = results[:max(k or 0, self.candidates)]
+        query_hash = _text_hash(query)
+
+        scores = {}
+        pending = []
+        for index, record in enumerate(candidates):
+            key = (query_hash, _text_hash(record["text"]))
+            score = self._cache_get(key)
+            if score is None:
+                pending.append((index, key))
+            else:
+                scores[index] = score
+
+        # Score uncached pairs batch by batch while the next batch fits the budget
+        last_batch_seconds = 0.0
+        for batch_start in range(0, len(pending), self.batch_size):
+            elapsed = time.perf_counter() - start
+            if batch_start and elapsed + last_batch_seconds > self.time_budget:
+                self._stats["over_budget"] += 1
+                break
+            batch = pending[batch_start:batch_start + self.batch_size]
+            batch_begin = time.perf_counter()
+            batch_scores = self._score_pairs([[query, candidates[index]["text"]] for index, _ in batch])
+            last_batch_seconds = time.perf_counter() - batch_begin
+            for (index, key), score in zip(batch, batch_scores):
+                scores[index] = score
+                self._cache_put(key, score)
+
+        scored = sorted(scores, key=lambda index: scores[index], reverse=True)
+        unscored = [index for index in range(len(candidates)) if index not in scores]
+        reranked = [dict(candidates[index], rerank_score=scores.get(index)) for index in scored + unscored]
+        return reranked[:k] if k else reranked
+
+    def stats(self) -> dict:
+        """Cache hit/miss counters, queries cut short by the time budget and cache size."""
+        with self._cache_lock:
+            return dict(self._stats, entries=len(self._cache))
+
+_rerankers = {}
+_rerankers_lock = threading.Lock()
+
+def get_reranker(model_name: str = DEFAULT_MODEL, **kwargs) -> CrossEncoderReranker:
+    """Shared reranker per model in this process; the model is loaded once."""
+    with _rerankers_lock:
+        if model_name not in _rerankers:
+            _rerankers[model_name] = CrossEncoderReranker(model_name, **kwargs)
+        return _rerankers[model_name]
@@ -0,0 +1,199 @@
+"""
+Vector search over an index partitioned into shards
+
+When one process cannot hold the whole index, documents are split across
+shards by a hash of their doc ID, and every shard is a regular VectorStore
+served by its own process (shard_server.py), on this host or others. The
+ShardedVectorStore here is the coordinator: it has the same search/add/
+delete interface as VectorStore, so the API and the ingestion workers use
+it unchanged.
+
+A search is sent to all shards in parallel (or only to the shards that own
+the documents of a doc_ids filter). Each shard returns its exact top k,
+best first, and the lists are merged with a heap. Shards that have not
+answered when the deadline passes - slow, down or unreachable - are left
+out: the results are then the best k of the shards that answered, and
+scatter_gather() reports which shards were missing.
+
+Each shard applies its own projection (see projection.py) and rescoring,
+and returns exact cosine scores, so scores from different shards compare.
+"""
+
+import json
+import heapq
+import hashlib
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from .vector_store import normalize_filters
+
+# Seconds a search waits for the shards
+DEFAULT_DEADLINE = 0.5
+
+# Seconds allowed for writes and other non-search shard requests
+WRITE_TIMEOUT = 60.0
+
+def shard_for(doc_id, num_shards):
+    """Shard of a document: a stable hash of its doc ID (the same in every process)."""
+    digest = hashlib.blake2b(doc_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % num_shards
+
+class ShardClient:
+    """HTTP client of one shard server"""
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self._local = threading.local()
+
+    def _session(self):
+        # Imported here so processes without shards skip loading requests
+        import requests
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _request(self, method, path, timeout, **kwargs):
+        response = self._session().request(method, self.url + path, timeout=timeout, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def search(self, query_vector, k, filters, timeout):
+        body = {"vector": [float(value) for value in query_vector], "k": k, "filters": filters}
+        return self._request("POST", "/search", timeout, json=body)["results"]
+
+    def add_document(self, doc_id, records):
+        return self._request("PUT", f"/documents/{doc_id}", WRITE_TIMEOUT, json={"records": records})
+
+    def delete_document(self, doc_id):
+        return self._request("DELETE", f"/documents/{doc_id}", WRITE_TIMEOUT)
+
+    def contains(self, doc_id):
+        return self._request("GET", f"/documents/{doc_id}", WRITE_TIMEOUT)["contains"]
+
+    def stats(self, timeout):
+        return self._request("GET", "/stats", timeout)
+
+class ShardedVectorStore:
+    """
+    Coordinator over shard servers, with the interface of VectorStore.
+
+    Args:
+        shards (list): Shard server URLs; shard i serves the documents with
+            shard_for(doc_id, len(shards)) == i.
+        deadline (float): Seconds a search waits for the shards.
+    """
+
+    def __init__(self, shards, deadline=DEFAULT_DEADLINE):
+        if not shards:
+            raise ValueError("At least one shard URL is required")
+        self.shards = [ShardClient(url) for url in shards]
+        self.deadline = deadline
+        # Shard requests outlive the deadline until their own timeout
+        self._executor = ThreadPoolExecutor(max_workers=max(8, 4 * len(self.shards)), thread_name_prefix="shard")
+
+    def shard_of(self, doc_id):
+        """Client of the shard that owns doc_id."""
+        return self.shards[shard_for(doc_id, len(self.shards))]
+
+    # Writes
+
+    def add_document(self, doc_id, records, vectors):
+        """Index one document's chunks on its shard."""
+        records = [dict(record, embedding=[float(value) for value in vector])
+                   for record, vector in zip(records, vectors)]
+        self.shard_of(doc_id).add_document(doc_id, records)
+
+    def add_embeddings_file(self, doc_id, embeddings_path):
+        """Index the chunks of an Embeddings/<doc_id>.json file on its shard."""
+        with open(embeddings_path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        self.shard_of(doc_id).add_document(doc_id, records)
+
+    def delete_document(self, doc_id):
+        """Tombstone a document on its shard."""
+        self.shard_of(doc_id).delete_document(doc_id)
+
+    def contains(self, doc_id):
+        return self.shard_of(doc_id).contains(doc_id)
+
+    # Reads
+
+    def scatter_gather(self, query_vector, k=5, filters=None, deadline=None):
+        """
+        Search the shards in parallel and merge their top k.
+
+        Returns:
+            dict with "results" (best first), "shards" (number queried),
+            "answered" and "missing" (shard numbers that failed or missed
+            the deadline, with the reason).
+        """
+        filters = normalize_filters(filters)
+        deadline = self.deadline if deadline is None else deadline
+        targets = range(len(self.shards))
+        if filters and "doc_ids" in filters:
+            # Only the owners of the requested documents can have matches
+            targets = sorted({shard_for(doc_id, len(self.shards)) for doc_id in filters["doc_ids"]})
+
+        futures = {self._executor.submit(self.shards[shard].search, query_vector, k, filters, deadline): shard
+                   for shard in targets}
+        done, not_done = wait(futures, timeout=deadline)
+
+        per_shard, missing = [], {}
+        for future in done:
+            try:
+                per_shard.append(future.result())
+            except Exception as e:
+                missing[futures[future]] = f"error: {type(e).__name__}"
+        for future in not_done:
+            future.cancel()
+            missing[futures[future]] = f"no answer within {deadline}s"
+        if futures and not per_shard:
+            raise RuntimeError(f"No shard answered: {missing}")
+        if missing:
+            print(f"⚠️ Partial search results, missing shard(s): {missing}")
+
+        # Every shard's list is sorted best first, so a heap merge yields the global order
+        merged = heapq.merge(*per_shard, key=lambda result: -result["score"])
+        return {
+            "results": list(itertools.islice(merged, k)),
+            "shards": len(futures),
+            "answered": len(per_shard),
+            "missing": missing
+        }
+
+    def search(self, query_vector, k=5, filters=None):
+        """Top-k search over all shards that answer within the deadline, like VectorStore.search()."""
+        return self.scatter_gather(query_vector, k, filters)["results"]
+
+    def start_background_maintenance(self, interval=60):
+        """Shard servers maintain their own indexes."""
+        return None
+
+    def stop_background_maintenance(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        futures = [self._executor.submit(shard.stats, self.deadline) for shard in self.shards]
+        wait(futures, timeout=self.deadline)
+        shards = []
+        for shard, future in zip(self.shards, futures):
+            try:
+                shards.append(dict(future.result(timeout=0), url=shard.url))
+            except Exception as e:
+                shards.append({"url": shard.url, "error": str(e) or "no answer"})
+        return {
+            "shards": shards,
+            "vectors": sum(shard.get("vectors", 0) for shard in shards),
+            "available": sum("error" not in shard for shard in shards)
+        }
+
+def get_index_store(embeddings_dir, vector_store_config=None, sharding_config=None):
+    """
+    The index of this process: a ShardedVectorStore when shard URLs are
+    configured, else the local VectorStore of embeddings_dir.
+    """
+    sharding_config = sharding_config or {}
+    if sharding_config.get("shards"):
+        return ShardedVectorStore(sharding_config["shards"], sharding_config.get("deadline", DEFAULT_DEADLINE))
+    from .vector_store import get_vector_store
+    return get_vector_store(embeddings_dir, **(vector_store_config or {}))
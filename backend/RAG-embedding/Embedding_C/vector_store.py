@@ -0,0 +1,995 @@
+"""
+Vector store over the chunk embeddings
+
+Vectors live in immutable segments under Embeddings/index/. Every ingested
+batch is appended as a new segment holding its chunks as an L2-normalized
+float32 matrix (vectors.npy), the sequence number each row was written at
+(seqs.npy) and the chunk records (records.json). manifest.json lists the
+live segments and tombstones; writers build new segments first and then
+atomically replace the manifest, so readers always see a complete version.
+
+Readers work on a Snapshot (segments + tombstones of one manifest version)
+taken with a single attribute read - no locks on the query path. Snapshots
+are refreshed when another process (batch ingestion, another API worker)
+publishes a new manifest. Segment arrays are memory-mapped, so several
+processes serving the same index share one copy in the OS page cache.
+
+Segments can also keep compressed codes (float16, int8 or binary, see
+quantization.py) in RAM with the float32 vectors memory-mapped from disk:
+searches score the codes and rescore the best candidates exactly.
+
+An optional PCA projection (see projection.py) maps full vectors to fewer
+dimensions; it is part of the manifest, and documents and queries are
+projected with it on the way in.
+
+Every chunk record carries metadata (doc ID, file type, upload time, page
+or slide). Segments keep it as column arrays plus per-document and
+per-file-type row sets, so filtered searches select their rows first and
+only score those.
+
+Deleting a document only records a tombstone (doc ID -> sequence number);
+rows of that document written before it are filtered out at query time, so
+deletes are instant and never block searches. Background maintenance
+rewrites segments once their share of dead vectors passes
+COMPACTION_THRESHOLD, merges small segments into larger ones, and drops
+tombstones nothing refers to anymore.
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import threading
+import numpy as np
+from .quantization import RESCORE_FACTOR, check_mode, encode, score
+from .projection import PCAProjection
+
+INDEX_DIR_NAME = "index"
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = "manifest.lock"
+MAINTENANCE_LOCK_NAME = "maintenance.lock"
+
+# Rewrite a segment once this fraction of its vectors is deleted
+COMPACTION_THRESHOLD = 0.3
+
+# Segments with fewer rows than this are merged in the background
+SMALL_SEGMENT_ROWS = 2048
+
+# Rows per segment written by rebuild()
+REBUILD_SEGMENT_ROWS = 65536
+
+# Readers check for a newer manifest at most this often (seconds)
+REFRESH_INTERVAL = 1.0
+
+# A manifest lock older than this (seconds) was left by a crashed writer
+STALE_LOCK_SECONDS = 30
+
+# Same for the lock that lets one process at a time run maintenance
+STALE_MAINTENANCE_LOCK_SECONDS = 600
+
+# Segment directories not in the manifest are removed after this (seconds)
+ORPHAN_SEGMENT_SECONDS = 3600
+
+# Chunk record fields kept next to the vectors
+RECORD_FIELDS = ("doc_id", "chunk_index", "text", "page", "slide", "file_type", "uploaded_at")
+
+# Filters matching more than this fraction of a segment are applied as a
+# mask over a full scan; gathering that many rows would cost more
+DENSE_FILTER_FRACTION = 0.25
+
+# Filters accepted by VectorStore.search
+FILTER_KEYS = ("doc_ids", "file_types", "uploaded_after", "uploaded_before", "page_from", "page_to")
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def normalize_filters(filters):
+    """
+    Validate search filters and bring them into canonical form.
+
+    Args:
+        filters (dict): Any of
+            doc_ids (str or list): Only these documents.
+            file_types (str or list): Only these extensions, e.g. "pdf".
+            uploaded_after / uploaded_before (float): Upload time range (epoch seconds).
+            page_from / page_to (int): Page (or slide) range, inclusive.
+
+    Returns:
+        Filters dict without empty entries, or None if nothing is filtered.
+    """
+    if not filters:
+        return None
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown search filter(s): {sorted(unknown)}. Available: {list(FILTER_KEYS)}")
+
+    normalized = {}
+    for key, value in filters.items():
+        if value is None or value == [] or value == "":
+            continue
+        if key in ("doc_ids", "file_types"):
+            values = [value] if isinstance(value, str) else list(value)
+            if key == "file_types":
+                values = [file_type.lower().lstrip(".") for file_type in values]
+            normalized[key] = values
+        else:
+            normalized[key] = float(value)
+    return normalized or None
+
+def _group_rows(values):
+    """Distinct values, the code of every row, and the sorted rows of each value."""
+    if not values:
+        return np.array([], dtype=object), np.array([], dtype=np.int64), {}
+    names, codes = np.unique(np.array(values, dtype=object), return_inverse=True)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+    rows = {name: order[bounds[i]:bounds[i + 1]] for i, name in enumerate(names)}
+    return names, codes, rows
+
+def _float_column(values):
+    return np.array([np.nan if value is None else float(value) for value in values], dtype=np.float64)
+
+def normalize_rows(vectors):
+    """L2-normalize rows so dot products are cosine similarities."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+class Segment:
+    """An immutable batch of vectors, their row sequence numbers and chunk records"""
+
+    def __init__(self, path, vectors, seqs, records, quantization="float32", codes=None, scales=None):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.vectors = vectors
+        self.seqs = seqs
+        self.records = records
+        self.quantization = quantization
+        if codes is None:
+            codes, scales = encode(vectors, quantization)
+        self.codes = codes
+        self.scales = scales
+
+        # Metadata columns and row sets used for filtering
+        self.doc_names, self.doc_codes, self._doc_rows = _group_rows([record["doc_id"] for record in records])
+        _, _, self._type_rows = _group_rows([record.get("file_type") or "" for record in records])
+        self.uploaded_at = _float_column([record.get("uploaded_at") for record in records])
+        self.pages = _float_column([
+            record.get("page") if record.get("page") is not None else record.get("slide")
+            for record in records
+        ])
+
+    def __len__(self):
+        return len(self.records)
+
+    def has_document(self, doc_id):
+        return doc_id in self._doc_rows
+
+    def document_rows(self, doc_id):
+        """Sorted indices of the rows belonging to doc_id."""
+        return self._doc_rows.get(doc_id, np.array([], dtype=np.int64))
+
+    def filter_rows(self, filters):
+        """
+        Rows matching normalized filters as a sorted index array, or None
+        when every row matches.
+        """
+        rows = None
+        for key, row_sets in (("doc_ids", self._doc_rows), ("file_types", self._type_rows)):
+            if key in filters:
+                parts = [row_sets[value] for value in filters[key] if value in row_sets]
+                if len(parts) == 1:
+                    selected = parts[0]
+                else:
+                    selected = np.unique(np.concatenate(parts)) if parts else np.array([], dtype=np.int64)
+                rows = selected if rows is None else np.intersect1d(rows, selected, assume_unique=True)
+                if not len(rows):
+                    return rows
+
+        ranges = [
+            (self.uploaded_at, filters.get("uploaded_after"), filters.get("uploaded_before")),
+            (self.pages, filters.get("page_from"), filters.get("page_to"))
+        ]
+        if any(low is not None or high is not None for _, low, high in ranges):
+            candidates = np.arange(len(self)) if rows is None else rows
+            keep = np.ones(len(candidates), dtype=bool)
+            for column, low, high in ranges:
+                # Rows without the value (NaN) never match a range
+                if low is not None:
+                    keep &= column[candidates] >= low
+                if high is not None:
+                    keep &= column[candidates] <= high
+            rows = candidates[keep]
+        return rows
+
+    def score(self, query, rows=None):
+        """Similarity of a normalized query to every row (or the given rows), computed on the codes."""
+        codes = self.codes if rows is None else self.codes[rows]
+        return score(codes, query, self.quantization, self.scales)
+
+    @property
+    def resident_bytes(self):
+        """Bytes of vector data scanned by searches (full vectors are only read for rescoring)."""
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    @staticmethod
+    def _save_codes(path, quantization, codes, scales):
+        if quantization == "float32":
+            return
+        np.save(os.path.join(path, f"codes_{quantization}.npy"), codes)
+        if scales is not None:
+            np.save(os.path.join(path, f"scales_{quantization}.npy"), scales)
+
+    @classmethod
+    def write(cls, path, vectors, seqs, records, quantization="float32"):
+        """Write a segment directory and return the loaded segment."""
+        return cls.publish(cls.stage(path, vectors, records, quantization), path, seqs, quantization)
+
+    @classmethod
+    def stage(cls, path, vectors, records, quantization="float32"):
+        """Write everything but the row sequence numbers to path + ".tmp" and return that directory."""
+        tmp_path = path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        np.save(os.path.join(tmp_path, "vectors.npy"), vectors)
+        cls._save_codes(tmp_path, quantization, *encode(vectors, quantization))
+        with open(os.path.join(tmp_path, "records.json"), "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False)
+        return tmp_path
+
+    @classmethod
+    def publish(cls, tmp_path, path, seqs, quantization="float32"):
+        """Add the sequence numbers to a staged segment, move it into place and load it."""
+        np.save(os.path.join(tmp_path, "seqs.npy"), seqs)
+        os.replace(tmp_path, path)
+        return cls.load(path, quantization)
+
+    @classmethod
+    def load(cls, path, quantization="float32"):
+        with open(os.path.join(path, "records.json"), "r", encoding="utf-8") as f:
+            records = json.load(f)
+        # Mapped read-only: pages are shared by every process using the index,
+        # and with compressed codes the full vectors are only read for rescoring
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        seqs_path = os.path.join(path, "seqs.npy")
+        if os.path.exists(seqs_path):
+            seqs = np.load(seqs_path)
+        else:
+            # Segments written before per-row sequence numbers share one seq
+            with open(os.path.join(path, "segment.json"), "r", encoding="utf-8") as f:
+                seqs = np.full(len(records), json.load(f)["seq"], dtype=np.int64)
+
+        codes = scales = None
+        codes_path = os.path.join(path, f"codes_{quantization}.npy")
+        if quantization != "float32" and os.path.exists(codes_path):
+            codes = np.load(codes_path, mmap_mode="r")
+            scales_path = os.path.join(path, f"scales_{quantization}.npy")
+            scales = np.load(scales_path) if os.path.exists(scales_path) else None
+        segment = cls(path, vectors, seqs, records, quantization, codes, scales)
+        if codes is None and quantization != "float32":
+            # Segment written under another mode; keep its codes for next time
+            try:
+                segment._save_codes(path, quantization, segment.codes, segment.scales)
+            except OSError as e:
+                print(f"⚠️ Could not save {quantization} codes for {segment.name}: {e}")
+        return segment
+
+    def dead_mask(self, tombstones):
+        """Boolean mask of rows deleted by a tombstone written after them, or None."""
+        if not tombstones or not len(self):
+            return None
+        tombstone_seqs = np.array([tombstones.get(name, -1) for name in self.doc_names], dtype=np.int64)
+        dead = tombstone_seqs[self.doc_codes] > self.seqs
+        return dead if dead.any() else None
+
+    def select(self, mask):
+        """Vectors, seqs and records of the rows where mask is True."""
+        rows = np.flatnonzero(mask)
+        return np.asarray(self.vectors[rows]), self.seqs[rows], [self.records[row] for row in rows]
+
+class Snapshot:
+    """A consistent, immutable view of one manifest version"""
+
+    def __init__(self, version, segments, tombstones, projection=None):
+        self.version = version
+        self.segments = tuple(segments)
+        self.tombstones = dict(tombstones)
+        self.projection = projection
+        self._dead_masks = {}
+
+    def project(self, vectors):
+        """Bring full-dimension vectors into the index space, L2-normalized."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.projection is not None and vectors.shape[1] == self.projection.input_dimension:
+            vectors = self.projection.transform(vectors)
+        return normalize_rows(vectors)
+
+    def dead_mask(self, segment):
+        if segment.name not in self._dead_masks:
+            self._dead_masks[segment.name] = segment.dead_mask(self.tombstones)
+        return self._dead_masks[segment.name]
+
+    def contains(self, doc_id):
+        """True if live rows of doc_id are in this snapshot."""
+        for segment in self.segments:
+            if segment.has_document(doc_id):
+                dead = self.dead_mask(segment)
+                if dead is None or not dead[segment.document_rows(doc_id)].all():
+                    return True
+        return False
+
+class _ManifestLock:
+    """
+    Cross-process lock based on an exclusively created lock file.
+
+    The file holds the holder's token (pid and a random suffix), and the
+    holder touches it every stale_after / 3 seconds, so only a lock whose
+    holder died goes stale, however long the work takes. The file is only
+    removed by the holder of its token.
+    """
+
+    def __init__(self, path, stale_after=STALE_LOCK_SECONDS):
+        self.path = path
+        self.stale_after = stale_after
+        self._token = None
+        self._stop_refresh = None
+
+    def _read_token(self, path=None):
+        try:
+            with open(path or self.path, "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _remove_if_token(self, token):
+        """Remove the lock file if it still holds token; True if it did."""
+        # Moved aside first, so a lock taken by someone else in the meantime
+        # is never deleted by mistake - it is put back instead
+        claimed = f"{self.path}.{uuid.uuid4().hex[:8]}.release"
+        try:
+            os.rename(self.path, claimed)
+        except OSError:
+            # Gone already, or (on Windows) open elsewhere; stale locks are retried
+            return False
+        if self._read_token(claimed) == token:
+            os.remove(claimed)
+            return True
+        try:
+            os.link(claimed, self.path)
+        except OSError:
+            pass
+        os.remove(claimed)
+        return False
+
+    def _refresh(self, token, stop):
+        while not stop.wait(self.stale_after / 3):
+            if self._read_token() != token:
+                return
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                return
+
+    def try_acquire(self):
+        """Take the lock if it is free (or stale); True on success."""
+        token = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                stale_token = self._read_token()
+                if stale_token is not None and time.time() - os.path.getmtime(self.path) > self.stale_after:
+                    print(f"⚠️ Breaking stale index lock {os.path.basename(self.path)} ({stale_token})")
+                    self._remove_if_token(stale_token)
+            except FileNotFoundError:
+                pass
+            return False
+        os.write(fd, token.encode())
+        os.close(fd)
+
+        self._token = token
+        self._stop_refresh = threading.Event()
+        threading.Thread(target=self._refresh, args=(token, self._stop_refresh),
+                         name="index-lock-refresh", daemon=True).start()
+        return True
+
+    def acquire(self):
+        while not self.try_acquire():
+            time.sleep(0.01)
+
+    def release(self):
+        if self._token is None:
+            return
+        self._stop_refresh.set()
+        if not self._remove_if_token(self._token):
+            print(f"⚠️ Index lock {os.path.basename(self.path)} was taken over while held")
+        self._token = None
+
+class _ManifestWriter:
+    """Context for one manifest update: thread lock, file lock and latest manifest"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __enter__(self):
+        store = self.store
+        store._thread_lock.acquire()
+        try:
+            store._file_lock.acquire()
+            try:
+                store._refresh_locked()
+            except BaseException:
+                store._file_lock.release()
+                raise
+        except BaseException:
+            store._thread_lock.release()
+            raise
+        manifest = store._manifest
+        return dict(manifest, segments=list(manifest["segments"]), tombstones=dict(manifest["tombstones"]))
+
+    def __exit__(self, *exc):
+        try:
+            self.store._file_lock.release()
+        finally:
+            self.store._thread_lock.release()
+
+class VectorStore:
+    """
+    Append-only segmented vector store with tombstone deletes.
+
+    Writers (add/delete/compact/merge) are serialized across threads and
+    processes and publish a new manifest atomically; searches run on the
+    current Snapshot without locking.
+
+    Args:
+        index_dir (str): Directory holding the manifest and segments.
+        quantization (str): Code format kept in RAM ("float32", "float16",
+            "int8" or "binary"); None keeps the mode the index was built with.
+        rescore_factor (int): Candidates rescored with the exact vectors, as
+            a multiple of k, when codes are compressed.
+    """
+
+    def __init__(self, index_dir, quantization=None, rescore_factor=RESCORE_FACTOR):
+        self.index_dir = index_dir
+        self.rescore_factor = rescore_factor
+        os.makedirs(index_dir, exist_ok=True)
+        self._manifest_path = os.path.join(index_dir, MANIFEST_NAME)
+        self._thread_lock = threading.Lock()
+        self._file_lock = _ManifestLock(os.path.join(index_dir, LOCK_NAME))
+        self._maintenance_file_lock = _ManifestLock(
+            os.path.join(index_dir, MAINTENANCE_LOCK_NAME), STALE_MAINTENANCE_LOCK_SECONDS
+        )
+        self._maintenance_lock = threading.Lock()
+        self._loaded = {}
+        self._projection_name = None
+        self._projection = None
+        self._retired = []
+        self._manifest_mtime = None
+        self._last_refresh = 0.0
+        self._maintenance_thread = None
+        self._stop_maintenance = threading.Event()
+        self._manifest = self._read_manifest()
+        self.quantization = self._manifest.get("quantization", "float32")
+        self._snapshot = self._build_snapshot(self._manifest)
+
+        if quantization and check_mode(quantization) != self.quantization:
+            print(f"🗜️ Switching vector codes from {self.quantization} to {quantization}...")
+            with _ManifestWriter(self) as manifest:
+                manifest["quantization"] = quantization
+                self._publish_locked(manifest)
+
+    # Manifest and snapshots
+
+    def _read_manifest(self):
+        if os.path.exists(self._manifest_path):
+            self._manifest_mtime = os.path.getmtime(self._manifest_path)
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return self._legacy_manifest()
+
+    def _legacy_manifest(self):
+        """Manifest for an index written before manifests existed (or a new one)."""
+        names = sorted(
+            name for name in os.listdir(self.index_dir)
+            if name.startswith("seg_") and not name.endswith(".tmp")
+            and os.path.isdir(os.path.join(self.index_dir, name))
+        )
+        tombstones = {}
+        tombstones_path = os.path.join(self.index_dir, "tombstones.json")
+        if os.path.exists(tombstones_path):
+            with open(tombstones_path, "r", encoding="utf-8") as f:
+                tombstones = json.load(f)
+        next_seq = 0
+        for name in names:
+            with open(os.path.join(self.index_dir, name, "segment.json"), "r", encoding="utf-8") as f:
+                next_seq = max(next_seq, json.load(f)["seq"] + 1)
+        next_seq = max([next_seq] + list(tombstones.values()))
+        return {"version": 0, "next_seq": next_seq, "quantization": "float32", "projection": None,
+                "segments": names, "tombstones": tombstones}
+
+    def _build_snapshot(self, manifest):
+        quantization = manifest.get("quantization", "float32")
+        if quantization != self.quantization:
+            # Loaded segments hold codes of the previous mode
+            self._loaded = {}
+            self.quantization = quantization
+
+        segments = []
+        for name in manifest["segments"]:
+            if name not in self._loaded:
+                self._loaded[name] = Segment.load(os.path.join(self.index_dir, name), quantization)
+            segments.append(self._loaded[name])
+        # Forget segments that are no longer referenced
+        live = set(manifest["segments"])
+        self._loaded = {name: segment for name, segment in self._loaded.items() if name in live}
+
+        projection_name = manifest.get("projection")
+        if projection_name != self._projection_name:
+            self._projection = None
+            if projection_name:
+                self._projection = PCAProjection.load(os.path.join(self.index_dir, projection_name))
+            self._projection_name = projection_name
+        return Snapshot(manifest["version"], segments, manifest["tombstones"], self._projection)
+
+    def snapshot(self):
+        """Current consistent view; picks up manifests published by other processes."""
+        now = time.time()
+        if now - self._last_refresh >= REFRESH_INTERVAL:
+            self._last_refresh = now
+            try:
+                mtime = os.path.getmtime(self._manifest_path)
+            except FileNotFoundError:
+                mtime = None
+            if mtime is not None and mtime != self._manifest_mtime and self._thread_lock.acquire(blocking=False):
+                try:
+                    self._refresh_locked()
+                except (OSError, ValueError) as e:
+                    # A segment vanished between manifest read and load; retry later
+                    print(f"⚠️ Index refresh deferred: {e}")
+                finally:
+                    self._thread_lock.release()
+        return self._snapshot
+
+    def _refresh_locked(self):
+        manifest = self._read_manifest()
+        if manifest["version"] != self._manifest["version"]:
+            self._snapshot = self._build_snapshot(manifest)
+            self._manifest = manifest
+
+    def _publish_locked(self, manifest):
+        """Atomically swap in a new manifest and snapshot."""
+        manifest["version"] = self._manifest["version"] + 1
+        _write_json_atomic(self._manifest_path, manifest)
+        self._manifest_mtime = os.path.getmtime(self._manifest_path)
+        self._snapshot = self._build_snapshot(manifest)
+        self._manifest = manifest
+
+    def _new_segment_path(self):
+        return os.path.join(self.index_dir, f"seg_{uuid.uuid4().hex[:16]}")
+
+    @property
+    def dimension(self):
+        """Dimension of the vectors in the index (after projection)."""
+        segments = self.snapshot().segments
+        return segments[0].vectors.shape[1] if segments else None
+
+    # Writes
+
+    def add_documents(self, documents):
+        """
+        Append a batch of documents as one new segment.
+
+        Args:
+            documents (list): (doc_id, records, vectors) tuples.
+
+        Earlier versions of the same documents are tombstoned, so a re-ingest
+        never leaves stale vectors searchable.
+        """
+        batch_records = []
+        batch_vectors = []
+        for doc_id, records, vectors in documents:
+            if not records:
+                continue
+            vectors = np.asarray(vectors, dtype=np.float32)
+            if len(records) != len(vectors):
+                raise ValueError("records and vectors must have the same length")
+            batch_vectors.append(vectors)
+            batch_records.extend({field: record.get(field) for field in RECORD_FIELDS} | {"doc_id": doc_id}
+                                 for record in records)
+
+        vectors = np.vstack(batch_vectors) if batch_vectors else None
+
+        # The segment is written before taking the manifest lock, so other
+        # writers only wait for the manifest swap
+        staged = None
+        if vectors is not None:
+            snapshot = self.snapshot()
+            staged = self._stage_segment(snapshot, vectors, batch_records, self.quantization)
+
+        try:
+            with _ManifestWriter(self) as manifest:
+                quantization = manifest.get("quantization", "float32")
+                if staged is not None and (self._snapshot.projection is not snapshot.projection
+                                           or quantization != staged[2]):
+                    # The projection or code format changed meanwhile; stage again under the lock
+                    shutil.rmtree(staged[0], ignore_errors=True)
+                    staged = self._stage_segment(self._snapshot, vectors, batch_records, quantization)
+                if staged is not None:
+                    segments = self._snapshot.segments
+                    dimension = segments[0].vectors.shape[1] if segments else None
+                    if dimension is not None and staged[3] != dimension:
+                        raise ValueError(f"Embedding dimension {staged[3]} does not match index dimension {dimension}")
+                seq = manifest["next_seq"]
+                manifest["next_seq"] = seq + 1
+                for doc_id, _, _ in documents:
+                    if self._snapshot.contains(doc_id) or doc_id in manifest["tombstones"]:
+                        manifest["tombstones"][doc_id] = seq
+                if staged is not None:
+                    segment = Segment.publish(staged[0], staged[1], np.full(len(batch_records), seq, dtype=np.int64),
+                                              quantization)
+                    staged = None
+                    self._loaded[segment.name] = segment
+                    manifest["segments"].append(segment.name)
+                self._publish_locked(manifest)
+        finally:
+            if staged is not None:
+                shutil.rmtree(staged[0], ignore_errors=True)
+
+    def _stage_segment(self, snapshot, vectors, records, quantization):
+        """
+        Project vectors with snapshot's projection and write them as a staged segment.
+
+        Returns:
+            (staged_path, final_path, quantization, dimension)
+        """
+        vectors = snapshot.project(vectors)
+        path = self._new_segment_path()
+        return Segment.stage(path, vectors, records, quantization), path, quantization, vectors.shape[1]
+
+    def add_document(self, doc_id, records, vectors):
+        """Append one document's chunks as a new segment."""
+        self.add_documents([(doc_id, records, vectors)])
+
+    def add_embeddings_file(self, doc_id, embeddings_path):
+        """Index the chunks of an Embeddings/<doc_id>.json file."""
+        with open(embeddings_path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        vectors = [record["embedding"] for record in records]
+        self.add_document(doc_id, records, vectors)
+
+    def contains(self, doc_id):
+        """True if live vectors of doc_id are in the store."""
+        return self.snapshot().contains(doc_id)
+
+    def delete_document(self, doc_id):
+        """Tombstone a document; its vectors disappear from searches immediately."""
+        with _ManifestWriter(self) as manifest:
+            manifest["tombstones"][doc_id] = manifest["next_seq"]
+            manifest["next_seq"] += 1
+            self._publish_locked(manifest)
+
+    # Reads
+
+    def search(self, query_vector, k=5, filters=None):
+        """
+        Cosine-similarity top-k search over all live vectors.
+
+        With compressed codes, the best k * rescore_factor candidates by code
+        score are rescored with the exact (memory-mapped) vectors.
+
+        Args:
+            query_vector (list): Query embedding.
+            k (int): Number of results.
+            filters (dict): Metadata filters, see normalize_filters(). Only
+                matching rows are scored, so results are the true top k
+                among them.
+
+        Returns:
+            List of chunk records with an added "score", best first.
+        """
+        filters = normalize_filters(filters)
+        snapshot = self.snapshot()
+        query = snapshot.project(np.asarray(query_vector, dtype=np.float32).reshape(1, -1))[0]
+        exact = all(segment.quantization == "float32" for segment in snapshot.segments)
+        candidate_count = k if exact else k * self.rescore_factor
+
+        candidates = []
+        for segment in snapshot.segments:
+            if not len(segment):
+                continue
+            rows = segment.filter_rows(filters) if filters else None
+            if rows is not None and not len(rows):
+                continue
+            if rows is not None and len(rows) > len(segment) * DENSE_FILTER_FRACTION:
+                scores = segment.score(query)
+                excluded = np.ones(len(segment), dtype=bool)
+                excluded[rows] = False
+                scores[excluded] = -np.inf
+                rows = None
+            else:
+                scores = segment.score(query, rows)
+            dead = snapshot.dead_mask(segment)
+            if dead is not None:
+                scores = np.where(dead if rows is None else dead[rows], -np.inf, scores)
+            top = min(candidate_count, len(scores))
+            for position in np.argpartition(-scores, top - 1)[:top]:
+                if np.isfinite(scores[position]):
+                    row = position if rows is None else rows[position]
+                    candidates.append((float(scores[position]), segment, int(row)))
+
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        candidates = candidates[:candidate_count]
+        if not exact:
+            candidates = self._rescore(candidates, query)
+        return [dict(segment.records[row], score=score) for score, segment, row in candidates[:k]]
+
+    @staticmethod
+    def _rescore(candidates, query):
+        """Exact scores for candidates, reading only their rows of each mapped segment."""
+        by_segment = {}
+        for _, segment, row in candidates:
+            by_segment.setdefault(segment.name, (segment, []))[1].append(row)
+
+        rescored = []
+        for segment, rows in by_segment.values():
+            rows.sort()
+            scores = np.asarray(segment.vectors[rows]) @ query
+            rescored.extend((float(value), segment, row) for value, row in zip(scores, rows))
+        rescored.sort(key=lambda candidate: candidate[0], reverse=True)
+        return rescored
+
+    def rebuild(self, documents, projection=None):
+        """
+        Re-index documents from scratch, optionally under a new projection.
+
+        Args:
+            documents (iterable): (doc_id, records, vectors) tuples with full
+                vectors, e.g. from projection.iter_embeddings_files().
+            projection (PCAProjection): New projection, or None for full vectors.
+
+        The new segments are built next to the live ones and swapped in with
+        one manifest update, so searches keep working throughout. Writes made
+        while rebuilding would be lost, so the swap is refused if the index
+        changed in the meantime.
+        """
+        start = self.snapshot()
+        projection_name = None
+        if projection is not None:
+            projection_name = f"projection_{uuid.uuid4().hex[:16]}.npz"
+            projection.save(os.path.join(self.index_dir, projection_name))
+        target = Snapshot(start.version, [], {}, projection)
+
+        new_segments = []
+        pending_vectors, pending_records = [], []
+
+        def flush():
+            vectors = target.project(np.vstack(pending_vectors))
+            new_segments.append(Segment.write(
+                self._new_segment_path(), vectors, np.zeros(len(pending_records), dtype=np.int64),
+                list(pending_records), quantization=self.quantization
+            ))
+            pending_vectors.clear()
+            pending_records.clear()
+
+        for doc_id, records, vectors in documents:
+            if not records:
+                continue
+            pending_vectors.append(np.asarray(vectors, dtype=np.float32))
+            pending_records.extend({field: record.get(field) for field in RECORD_FIELDS} | {"doc_id": doc_id}
+                                   for record in records)
+            if len(pending_records) >= REBUILD_SEGMENT_ROWS:
+                flush()
+        if pending_records:
+            flush()
+
+        with _ManifestWriter(self) as manifest:
+            if manifest["version"] != start.version:
+                for segment in new_segments:
+                    shutil.rmtree(segment.path, ignore_errors=True)
+                raise RuntimeError("The index changed during the rebuild; run it again while ingestion is stopped")
+            old_names = manifest["segments"]
+            for segment in new_segments:
+                self._loaded[segment.name] = segment
+            # Rows restart at seq 0 with no tombstones; next_seq keeps growing
+            manifest["segments"] = [segment.name for segment in new_segments]
+            manifest["tombstones"] = {}
+            manifest["projection"] = projection_name
+            self._publish_locked(manifest)
+        self._retired.extend(os.path.join(self.index_dir, name) for name in old_names)
+
+    # Maintenance
+
+    def _replace_segments(self, old_names, new_segment):
+        """Swap old segments for new_segment (or drop them) if they are all still live."""
+        with _ManifestWriter(self) as manifest:
+            if not all(name in manifest["segments"] for name in old_names):
+                return False
+            position = manifest["segments"].index(old_names[0])
+            segments = [name for name in manifest["segments"] if name not in old_names]
+            if new_segment is not None:
+                quantization = manifest.get("quantization", "float32")
+                if new_segment.quantization != quantization:
+                    # The mode changed while the segment was being built
+                    new_segment = Segment.load(new_segment.path, quantization)
+                self._loaded[new_segment.name] = new_segment
+                segments.insert(position, new_segment.name)
+            manifest["segments"] = segments
+            self._publish_locked(manifest)
+        self._retired.extend(os.path.join(self.index_dir, name) for name in old_names)
+        return True
+
+    def compact(self, threshold=COMPACTION_THRESHOLD):
+        """
+        Rewrite segments whose dead-vector fraction exceeds threshold.
+
+        Returns:
+            Number of segments rewritten or removed.
+        """
+        with self._maintenance_lock:
+            snapshot = self.snapshot()
+            rewritten = 0
+
+            for segment in snapshot.segments:
+                dead = snapshot.dead_mask(segment)
+                if dead is None or dead.mean() <= threshold:
+                    continue
+
+                # Build the replacement outside the lock; searches keep using the old one
+                replacement = None
+                if not dead.all():
+                    replacement = Segment.write(self._new_segment_path(), *segment.select(~dead),
+                                                quantization=self.quantization)
+                if self._replace_segments([segment.name], replacement):
+                    rewritten += 1
+                elif replacement is not None:
+                    shutil.rmtree(replacement.path, ignore_errors=True)
+
+            self._drop_obsolete_tombstones()
+            return rewritten
+
+    def merge_small_segments(self, min_rows=SMALL_SEGMENT_ROWS):
+        """
+        Merge segments smaller than min_rows into one, dropping dead rows.
+
+        Returns:
+            Number of segments merged away.
+        """
+        with self._maintenance_lock:
+            snapshot = self.snapshot()
+            small = [segment for segment in snapshot.segments if len(segment) < min_rows]
+            if len(small) < 2:
+                return 0
+
+            vectors, seqs, records = [], [], []
+            for segment in small:
+                dead = snapshot.dead_mask(segment)
+                alive = np.ones(len(segment), dtype=bool) if dead is None else ~dead
+                segment_vectors, segment_seqs, segment_records = segment.select(alive)
+                vectors.append(segment_vectors)
+                seqs.append(segment_seqs)
+                records.extend(segment_records)
+
+            merged = None
+            if records:
+                merged = Segment.write(self._new_segment_path(), np.vstack(vectors), np.concatenate(seqs), records,
+                                       quantization=self.quantization)
+            if not self._replace_segments([segment.name for segment in small], merged):
+                if merged is not None:
+                    shutil.rmtree(merged.path, ignore_errors=True)
+                return 0
+            return len(small)
+
+    def _drop_obsolete_tombstones(self):
+        """A tombstone is obsolete once no row written before it holds its document."""
+        with _ManifestWriter(self) as manifest:
+            needed = {}
+            for doc_id, seq in manifest["tombstones"].items():
+                for segment in self._snapshot.segments:
+                    if segment.has_document(doc_id) and (segment.seqs[segment.document_rows(doc_id)] < seq).any():
+                        needed[doc_id] = seq
+                        break
+            if needed != manifest["tombstones"]:
+                manifest["tombstones"] = needed
+                self._publish_locked(manifest)
+
+    def _remove_garbage(self):
+        """Delete retired and orphaned segment directories."""
+        still_retired = []
+        for path in self._retired:
+            shutil.rmtree(path, ignore_errors=True)
+            if os.path.exists(path):
+                # Still open somewhere (e.g. mapped on Windows); retry next time
+                still_retired.append(path)
+        self._retired = still_retired
+
+        live = set(self._manifest["segments"])
+        live.add(self._manifest.get("projection"))
+        for name in os.listdir(self.index_dir):
+            path = os.path.join(self.index_dir, name)
+            if name in live or time.time() - os.path.getmtime(path) <= ORPHAN_SEGMENT_SECONDS:
+                continue
+            if name.startswith("seg_") and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif name.startswith("projection_"):
+                os.remove(path)
+
+    def run_maintenance(self, threshold=COMPACTION_THRESHOLD, min_rows=SMALL_SEGMENT_ROWS):
+        """One round of compaction, small-segment merging and cleanup."""
+        compacted = self.compact(threshold)
+        merged = self.merge_small_segments(min_rows)
+        self._remove_garbage()
+        return {"compacted": compacted, "merged": merged}
+
+    def start_background_maintenance(self, interval=60):
+        """
+        Start a daemon thread that keeps the snapshot current and runs
+        run_maintenance() every interval seconds.
+
+        New segments published by other processes are loaded by this thread
+        instead of by the next search. When several processes serve the same
+        index, only one of them runs maintenance at a time.
+        """
+        if self._maintenance_thread is not None:
+            return self._maintenance_thread
+
+        def loop():
+            next_maintenance = time.time() + interval
+            while not self._stop_maintenance.wait(REFRESH_INTERVAL):
+                try:
+                    self.snapshot()
+                    if time.time() < next_maintenance:
+                        continue
+                    next_maintenance = time.time() + interval
+                    if not self._maintenance_file_lock.try_acquire():
+                        continue
+                    try:
+                        result = self.run_maintenance()
+                    finally:
+                        self._maintenance_file_lock.release()
+                    if result["compacted"] or result["merged"]:
+                        print(f"🧹 Index maintenance: {result['compacted']} segment(s) compacted, "
+                              f"{result['merged']} merged")
+                except Exception as e:
+                    print(f"⚠️ Index maintenance failed: {e}")
+
+        self._maintenance_thread = threading.Thread(target=loop, name="vector-store-maintenance", daemon=True)
+        self._maintenance_thread.start()
+        return self._maintenance_thread
+
+    def stop_background_maintenance(self):
+        self._stop_maintenance.set()
+
+    def stats(self):
+        snapshot = self.snapshot()
+        dead = 0
+        for segment in snapshot.segments:
+            mask = snapshot.dead_mask(segment)
+            dead += int(mask.sum()) if mask is not None else 0
+        return {
+            "version": snapshot.version,
+            "quantization": self.quantization,
+            "segments": len(snapshot.segments),
+            "vectors": sum(len(segment) for segment in snapshot.segments),
+            "dead_vectors": dead,
+            "tombstones": len(snapshot.tombstones),
+            "dimension": snapshot.segments[0].vectors.shape[1] if snapshot.segments else None,
+            "projection": (f"{snapshot.projection.input_dimension}->{snapshot.projection.output_dimension}"
+                           if snapshot.projection is not None else None),
+            "resident_mb": round(sum(segment.resident_bytes for segment in snapshot.segments) / 1024 / 1024, 2)
+        }
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_vector_store(embeddings_dir, quantization=None, rescore_factor=RESCORE_FACTOR):
+    """Shared store for an Embeddings/ directory in this process."""
+    index_dir = os.path.join(os.path.abspath(embeddings_dir), INDEX_DIR_NAME)
+    with _stores_lock:
+        if index_dir not in _stores:
+            _stores[index_dir] = VectorStore(index_dir, quantization, rescore_factor)
+        return _stores[index_dir]
@@ -1,29 +1,35 @@
 import os
-import fitz
-import PDF.PDF_To_Text as PDF_To_Text
-import PDF.Scanned_PDF_To_Text as Scanned_PDF_To_Text
-import PPT.PPT_To_Text as PPT_To_Text  
-import DOCX.DOCX_To_Text as DOCX_To_Text
-import Embedding_C.Text_To_Embeddings as Text_To_Embeddings
 from embedding_config import get_embedding_config
 
-def is_scanned_pdf(pdf_path):
-    """Check if a PDF is scanned (mostly images) or contains real text."""
-    doc = fitz.open(pdf_path)
-    text_pages = 0
+# Extractors and the embedding pipeline are imported on first use: they pull
+# in PyMuPDF, pytesseract, PIL, python-docx and python-pptx, which processes
+# that only serve queries or listings never need.
 
-    for page in doc:
-        text = page.get_text("text").strip()
-        if text:
-            text_pages += 1
+def document_metadata(file_path, uploaded_at=None):
+    """
+    Metadata stored with every chunk of a document, used for search filters.
 
-    total_pages = len(doc)
-    doc.close()
+    Args:
+        uploaded_at (float): Upload time from the document's registry row.
+            The file's mtime is only a fallback: it changes whenever the
+            file is copied, touched or re-synced.
+    """
+    return {
+        "file_type": os.path.splitext(file_path)[1].lower().lstrip("."),
+        "uploaded_at": uploaded_at if uploaded_at is not None else os.path.getmtime(file_path)
+    }
 
-    return (text_pages / total_pages) < 0.3  # True if scanned
-
-def process_file(file_path, generate_embeddings=True, output_base_name=None):
-    """Detect file type and process accordingly."""
+def process_file(file_path, generate_embeddings=True, output_base_name=None, ocr_workers=None, uploaded_at=None):
+    """
+    Detect file type and process accordingly.
+    
+    All outputs are named after output_base_name (default: the file name
+    without extension), which is also the document ID in the embeddings.
+    ocr_workers caps the Tesseract threads used for DOCX/PPTX images
+    (default: one per CPU); callers that already run one process per CPU
+    pass 1. uploaded_at is the registry's upload time stored with every
+    chunk (default: the file's mtime).
+    """
     if not os.path.exists(file_path):
         print(f"❌ Error: File not found: {file_path}")
         return False
@@ -48,16 +54,19 @@ def process_file(file_path, generate_embeddings=True, output_base_name=None):
         print(f"📄 Extracting text from {os.path.basename(file_path)}...")
         
         if ext == ".pdf":
-            if is_scanned_pdf(file_path):
-                Scanned_PDF_To_Text.scanned_pdf_to_text(file_path, output_dir=text_output_dir, output_name=base_filename)
-            else:
-                PDF_To_Text.pdf_to_text(file_path, output_dir=text_output_dir, output_name=base_filename)
+            import PDF.Unified_PDF_To_Text as Unified_PDF_To_Text
+            # Opens the PDF once and routes each page to the text or OCR path
+            Unified_PDF_To_Text.unified_pdf_to_text(file_path, output_dir=text_output_dir, output_name=base_filename)
 
         elif ext in [".ppt", ".pptx"]:
-            PPT_To_Text.ppt_to_text(file_path, output_dir=text_output_dir, output_name=base_filename)
+            import PPT.PPT_To_Text as PPT_To_Text
+            PPT_To_Text.ppt_to_text(file_path, output_dir=text_output_dir, output_name=base_filename,
+                                    ocr_workers=ocr_workers)
 
         elif ext in [".doc", ".docx"]:
-            DOCX_To_Text.docx_to_text(file_path, output_dir=text_output_dir, output_name=base_filename)
+            import DOCX.DOCX_To_Text as DOCX_To_Text
+            DOCX_To_Text.docx_to_text(file_path, output_dir=text_output_dir, output_name=base_filename,
+                                      ocr_workers=ocr_workers)
 
         else:
             print(f"❌ Unsupported file type: {ext}")
@@ -77,6 +86,8 @@ def process_file(file_path, generate_embeddings=True, output_base_name=None):
             print(f"🔄 Generating embeddings for {base_filename}...")
             
             try:
+                import Embedding_C.Text_To_Embeddings as Text_To_Embeddings
+                
                 # Get embedding configuration
                 config = get_embedding_config()
                 provider_type = config["provider"]
@@ -91,6 +102,8 @@ def process_file(file_path, generate_embeddings=True, output_base_name=None):
                     text_file_path, 
                     embeddings_dir=embeddings_output_dir,
                     provider_type=provider_type,
+                    doc_id=base_filename,
+                    metadata=document_metadata(file_path, uploaded_at),
                     **provider_config
                 )
                 print(f"✅ Embeddings generated: {os.path.basename(embeddings_path)}")
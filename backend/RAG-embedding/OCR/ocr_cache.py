@@ -0,0 +1,123 @@
+"""
+Shared OCR helpers for all extractors
+
+OCR results are cached by the SHA-256 of the image bytes, so an image that
+repeats across slides, pages or documents (logos, backgrounds, template art)
+is sent to Tesseract only once per process. ocr_images() OCRs the unique,
+uncached images of a batch in a thread pool; pytesseract runs Tesseract as a
+subprocess, so threads give real parallelism here.
+"""
+
+import io
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+import pytesseract
+
+# Maximum number of cached OCR results kept in memory
+MAX_CACHE_ENTRIES = 4096
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+def image_hash(image_bytes):
+    """Content hash used as the OCR cache key."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+def image_dimensions(image_bytes):
+    """(width, height) of encoded image bytes, or None if PIL cannot read them."""
+    try:
+        # Image.open only parses the header; pixel data is not decoded
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            return img.size
+    except Exception:
+        return None
+
+def _cache_get(key):
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return _cache[key]
+        _stats["misses"] += 1
+        return None
+
+def _cache_put(key, text):
+    with _cache_lock:
+        _cache[key] = text
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_CACHE_ENTRIES:
+            _cache.popitem(last=False)
+
+def _run_ocr(image_bytes, lang):
+    """OCR raw image bytes; unreadable formats (e.g. WMF/EMF) yield empty text."""
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+        return pytesseract.image_to_string(img, lang=lang)
+    except Exception as e:
+        print(f"⚠️ Skipping image OCR: {e}")
+        return ""
+
+def ocr_image_bytes(image_bytes, lang="eng"):
+    """
+    OCR a single image given as encoded bytes, using the shared cache.
+    """
+    key = (image_hash(image_bytes), lang)
+    text = _cache_get(key)
+    if text is None:
+        text = _run_ocr(image_bytes, lang)
+        _cache_put(key, text)
+    return text
+
+def ocr_images(images, lang="eng", max_workers=None):
+    """
+    OCR a batch of images, running each distinct image at most once.
+
+    Args:
+        images (list): Encoded image bytes (PNG, JPEG, ...).
+        lang (str): Tesseract language.
+        max_workers (int): OCR worker threads, defaults to the CPU count.
+
+    Returns:
+        List of OCR texts in the same order as images.
+    """
+    keys = [(image_hash(image_bytes), lang) for image_bytes in images]
+
+    # Collect the distinct images that are not cached yet
+    results = {}
+    pending = {}
+    for key, image_bytes in zip(keys, images):
+        if key in results or key in pending:
+            continue
+        text = _cache_get(key)
+        if text is None:
+            pending[key] = image_bytes
+        else:
+            results[key] = text
+
+    if pending:
+        workers = max_workers or os.cpu_count() or 1
+        workers = min(workers, len(pending))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            texts = executor.map(lambda image_bytes: _run_ocr(image_bytes, lang), pending.values())
+            for key, text in zip(pending.keys(), texts):
+                _cache_put(key, text)
+                results[key] = text
+
+    return [results[key] for key in keys]
+
+def cache_stats():
+    """Cache hit/miss counters and current size."""
+    with _cache_lock:
+        return {"hits": _stats["hits"], "misses": _stats["misses"], "entries": len(_cache)}
+
+def clear_cache():
+    """Drop all cached OCR results."""
+    with _cache_lock:
+        _cache.clear()
+        _stats["hits"] = 0
+        _stats["misses"] = 0
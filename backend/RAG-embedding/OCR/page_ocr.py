@@ -0,0 +1,193 @@
+"""
+Adaptive page OCR for PDF pages
+
+Pages are rendered straight into a grayscale PIL image from the pixmap
+samples (no PNG encode/decode round trip), binarized, and OCR'd at 150 DPI
+first. Only pages whose OCR confidence is low are rendered again, at a DPI
+chosen from the measured glyph height so small print reaches the size
+Tesseract reads best.
+
+Pages that have a text layer only need their images read: ocr_image_regions()
+renders and OCRs just the image areas, and pages without images are not
+rendered at all.
+"""
+
+from contextlib import nullcontext
+import fitz  # PyMuPDF
+from PIL import Image
+import pytesseract
+
+# Resolution of the first OCR pass
+BASE_DPI = 150
+
+# Upper bound for re-rendering low-confidence pages
+MAX_DPI = 400
+
+# Mean word confidence (0-100) above which a pass is accepted
+MIN_CONFIDENCE = 70
+
+# Word box height in pixels Tesseract handles best
+TARGET_GLYPH_HEIGHT = 32
+
+# Images smaller than this (in points, either side) are icons or rules, not text
+MIN_IMAGE_POINTS = 36
+
+def render_page_gray(page, dpi, clip=None):
+    """
+    Render a PDF page (or the clip rectangle of it) as an 8-bit grayscale PIL image.
+
+    The image is built from a copy of the pixmap's samples instead of
+    encoding to PNG and decoding it again. A copy, not a view: the pixmap is
+    freed when this returns, which must not invalidate the image.
+    """
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False, clip=clip)
+    return Image.frombuffer("L", (pix.width, pix.height), pix.samples, "raw", "L", pix.stride, 1)
+
+def binarize(img):
+    """Black/white version of a grayscale image using Otsu's threshold."""
+    histogram = img.histogram()[:256]
+    total = sum(histogram)
+    sum_all = sum(i * count for i, count in enumerate(histogram))
+
+    sum_background = 0
+    weight_background = 0
+    best_threshold = 127
+    best_variance = 0.0
+
+    for threshold, count in enumerate(histogram):
+        weight_background += count
+        if weight_background == 0:
+            continue
+        weight_foreground = total - weight_background
+        if weight_foreground == 0:
+            break
+        sum_background += threshold * count
+        mean_background = sum_background / weight_background
+        mean_foreground = (sum_all - sum_background) / weight_foreground
+        variance = weight_background * weight_foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_variance = variance
+            best_threshold = threshold
+
+    return img.point(lambda value: 255 if value > best_threshold else 0)
+
+def data_to_text(data):
+    """Rebuild plain text (lines and paragraphs) from image_to_data output."""
+    lines = []
+    current_key = None
+    current_par = None
+    words = []
+
+    for i, word in enumerate(data["text"]):
+        if not word.strip():
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        if key != current_key:
+            if words:
+                lines.append(" ".join(words))
+            if current_par is not None and key[:2] != current_par:
+                lines.append("")
+            current_key = key
+            current_par = key[:2]
+            words = []
+        words.append(word)
+    if words:
+        lines.append(" ".join(words))
+
+    return "\n".join(lines)
+
+def _page_statistics(data):
+    """Mean word confidence and median word height of an OCR pass."""
+    confidences = []
+    heights = []
+    for i, word in enumerate(data["text"]):
+        conf = float(data["conf"][i])
+        if word.strip() and conf >= 0:
+            confidences.append(conf)
+            heights.append(data["height"][i])
+
+    if not confidences:
+        return 0.0, None
+    heights.sort()
+    return sum(confidences) / len(confidences), heights[len(heights) // 2]
+
+def ocr_page(page, lang="eng", render_lock=None, clip=None):
+    """
+    OCR a PDF page at the lowest resolution that reads it reliably.
+
+    Args:
+        render_lock: Lock held while PyMuPDF renders the page, for callers
+            that share a document between threads.
+        clip: Only OCR this rectangle of the page.
+
+    Returns:
+        dict with "text", "data" (pytesseract image_to_data dict), "dpi" and
+        "confidence" of the accepted pass.
+    """
+    dpi = BASE_DPI
+
+    while True:
+        with render_lock or nullcontext():
+            img = render_page_gray(page, dpi, clip)
+        img = binarize(img)
+        data = pytesseract.image_to_data(img, lang=lang, output_type=pytesseract.Output.DICT)
+        confidence, glyph_height = _page_statistics(data)
+
+        if confidence >= MIN_CONFIDENCE or dpi >= MAX_DPI or not glyph_height:
+            break
+
+        # Scale so the median glyph reaches the target height
+        next_dpi = min(MAX_DPI, int(dpi * TARGET_GLYPH_HEIGHT / glyph_height))
+        if next_dpi <= dpi:
+            # Glyphs are already large; more pixels will not help
+            break
+        print(f"🔍 Low OCR confidence ({confidence:.0f}) at {dpi} DPI, retrying at {next_dpi} DPI...")
+        dpi = next_dpi
+
+    return {
+        "text": data_to_text(data),
+        "data": data,
+        "dpi": dpi,
+        "confidence": confidence
+    }
+
+def image_regions(page, min_size=MIN_IMAGE_POINTS):
+    """
+    Rectangles of the raster images drawn on a page, clipped to the page.
+
+    Duplicates and images contained in a larger one are dropped, so no area
+    is read twice.
+    """
+    rects = []
+    for info in page.get_image_info():
+        rect = fitz.Rect(info["bbox"]) & page.rect
+        if rect.is_empty or rect.width < min_size or rect.height < min_size:
+            continue
+        rects.append(rect)
+    # Largest first, so contained images meet their container
+    rects.sort(key=lambda rect: rect.width * rect.height, reverse=True)
+    regions = []
+    for rect in rects:
+        if not any(region.contains(rect) for region in regions):
+            regions.append(rect)
+    # Reading order
+    regions.sort(key=lambda rect: (rect.y0, rect.x0))
+    return regions
+
+def ocr_image_regions(page, lang="eng", render_lock=None):
+    """
+    OCR only the images of a page that has a text layer.
+
+    Returns:
+        dict with the "text" of all regions (blank-line separated) and the
+        number of "regions" read. A region that reads exactly like an earlier
+        one (a repeated logo or stamp) is kept once.
+    """
+    with render_lock or nullcontext():
+        regions = image_regions(page)
+    texts = []
+    for region in regions:
+        text = ocr_page(page, lang, render_lock, clip=region)["text"].strip()
+        if text and text not in texts:
+            texts.append(text)
+    return {"text": "\n\n".join(texts), "regions": len(regions)}
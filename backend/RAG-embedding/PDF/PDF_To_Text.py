@@ -1,17 +1,131 @@
 import fitz  # PyMuPDF
-from PIL import Image
 import pytesseract
-import io
 import os
+import re
+from document_segments import make_segment, write_segments
+from OCR.page_ocr import ocr_image_regions
 
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\tesseract.exe"  
 
+# Share of a text block's area inside a table for the block to count as table content
+TABLE_OVERLAP = 0.5
+
+_WORD = re.compile(r"\w+")
+
+def extract_text_page(page, page_num, page_text=None):
+    """
+    Extract one page of a normal PDF.
+
+    Args:
+        page: PyMuPDF page.
+        page_num (int): 1-based page number.
+        page_text (str): Already extracted page.get_text("text"), if any.
+
+    Returns:
+        (page_output, segments) - the page's text with markers and its segments.
+    """
+    page_output, segments = extract_text_layer(page, page_num, page_text)
+    image_output, image_segments = format_image_text(ocr_image_regions(page)["text"], page_num, segments)
+    return page_output + image_output, segments + image_segments
+
+def find_page_tables(page):
+    """
+    Tables of a page found by PyMuPDF's ruling/alignment detector.
+
+    Returns:
+        List of (bbox, rows) with rows as lists of cell strings; empty rows dropped.
+    """
+    tables = []
+    for table in page.find_tables().tables:
+        rows = []
+        for row in table.extract():
+            cells = [" ".join((cell or "").split()) for cell in row]
+            if any(cells):
+                rows.append(cells)
+        if rows:
+            tables.append((fitz.Rect(table.bbox), rows))
+    return tables
+
+def _text_outside(page, table_rects):
+    """Page text without the blocks that lie inside a table."""
+    kept = []
+    for block in page.get_text("blocks"):
+        rect = fitz.Rect(block[:4])
+        block_text, block_type = block[4], block[6]
+        if block_type != 0 or not block_text.strip():
+            continue
+        area = rect.width * rect.height
+        inside = max(((rect & table_rect).get_area() for table_rect in table_rects), default=0.0)
+        if area and inside / area >= TABLE_OVERLAP:
+            continue
+        kept.append(block_text.strip())
+    return "\n".join(kept)
+
+def extract_text_layer(page, page_num, page_text=None):
+    """
+    The selectable text and tables of a page, without OCR.
+
+    Table cells are emitted once, as rows under [Table N]; the [Text]
+    section holds only the text outside the tables.
+
+    Returns:
+        (page_output, segments) like extract_text_page().
+    """
+    page_output = f"\n\n--- Page {page_num} ---\n"
+    segments = []
+
+    tables = find_page_tables(page)
+
+    # 1️⃣ Extract selectable text
+    if tables:
+        page_text = _text_outside(page, [rect for rect, _ in tables])
+    elif page_text is None:
+        page_text = page.get_text("text")
+    if page_text.strip():
+        page_output += "[Text]:\n" + page_text.strip() + "\n"
+        segments.append(make_segment("text", page_text, page=page_num))
+
+    # 2️⃣ Tables as rows of tab-separated cells
+    for table_num, (_, rows) in enumerate(tables, start=1):
+        table_text = "\n".join("\t".join(cells) for cells in rows)
+        page_output += f"[Table {table_num}]:\n" + table_text + "\n"
+        segments.append(make_segment("table", table_text, page=page_num, table=table_num))
+
+    return page_output, segments
+
+def _normalized_words(text):
+    return " ".join(_WORD.findall(text.lower()))
+
+def _is_known(line, known):
+    """True if the words of line occur, in order and adjacent, in the normalized known text."""
+    words = _normalized_words(line)
+    return bool(words) and f" {words} " in known
+
+def format_image_text(ocr_text, page_num, known_segments=()):
+    """
+    Output and segments for the OCR text of a page's images (charts/diagrams).
+
+    OCR lines whose words already appear, in order, in known_segments (the
+    page's text and tables) are dropped, so text that is both selectable
+    and inside an image is kept once.
+
+    Returns:
+        (page_output, segments) to append to the text layer's.
+    """
+    known = f" {_normalized_words(' '.join(segment['text'] for segment in known_segments if segment))} "
+    lines = [line for line in ocr_text.strip().split("\n") if not _is_known(line, known)]
+    ocr_text = re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+    if not ocr_text:
+        return "", []
+    page_output = "[Text in Images (Charts/Diagrams)]:\n" + ocr_text + "\n"
+    return page_output, [make_segment("ocr", ocr_text, page=page_num)]
+
 def pdf_to_text(pdf_path, output_dir="Text_files", output_name=None):
     """
     Extract text from normal PDFs including:
     - Direct text
-    - Tables (roughly via text block positions)
-    - Charts/diagrams (via OCR)
+    - Tables (PyMuPDF table detection, one row per line)
+    - Charts/diagrams (via OCR of the page's images)
     """
     os.makedirs(output_dir, exist_ok=True)
     base_name = output_name if output_name else os.path.splitext(os.path.basename(pdf_path))[0]
@@ -19,39 +133,19 @@ def pdf_to_text(pdf_path, output_dir="Text_files", output_name=None):
 
     doc = fitz.open(pdf_path)
     all_text = ""
+    segments = []
 
     for page_num, page in enumerate(doc, start=1):
-        all_text += f"\n\n--- Page {page_num} ---\n"
-
-        # 1️⃣ Extract selectable text
-        page_text = page.get_text("text")
-        if page_text.strip():
-            all_text += "[Text]:\n" + page_text.strip() + "\n"
-
-        # 2️⃣ Roughly detect tables using text blocks (position-based)
-        blocks = page.get_text("blocks")
-        table_text = ""
-        for block in blocks:
-            x0, y0, x1, y1, block_text, block_type = block[:6]
-            # Simple heuristic: multiple lines close together horizontally → table
-            lines = block_text.strip().split("\n")
-            if len(lines) > 1 and "\t" in lines[0] or len(lines[0].split()) > 1:
-                table_text += "\n".join(lines) + "\n"
-        if table_text.strip():
-            all_text += "[Table Detected]:\n" + table_text.strip() + "\n"
-
-        # 3️⃣ Extract text from images (charts/diagrams) via OCR
-        pix = page.get_pixmap(dpi=300)
-        img = Image.open(io.BytesIO(pix.tobytes("png")))
-        ocr_text = pytesseract.image_to_string(img, lang="eng")
-        if ocr_text.strip():
-            all_text += "[Text in Images (Charts/Diagrams)]:\n" + ocr_text.strip() + "\n"
+        page_output, page_segments = extract_text_page(page, page_num)
+        all_text += page_output
+        segments.extend(page_segments)
 
     doc.close()
 
     # Save output
     with open(output_txt_path, "w", encoding="utf-8") as f:
         f.write(all_text.strip())
+    write_segments(output_txt_path, segments)
 
     print(f"\n✅ Extraction complete! Text saved to: {os.path.abspath(output_txt_path)}")
     return output_txt_path
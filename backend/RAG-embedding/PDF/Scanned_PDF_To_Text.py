@@ -1,11 +1,38 @@
 import fitz  # PyMuPDF
 import pytesseract
-from PIL import Image
-import io
 import os
+from document_segments import make_segment, write_segments
+from OCR.page_ocr import ocr_page
 
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\tesseract.exe"
 
+def extract_scanned_page(page, page_num):
+    """
+    OCR one page of a scanned PDF.
+
+    Returns:
+        (page_output, segments) - the page's text with markers and its segments.
+    """
+    print(f"🖼️ Converting page {page_num} to image...")
+    # 1️⃣ OCR full page (one Tesseract pass gives both text and layout data)
+    return format_scanned_page(ocr_page(page), page_num)
+
+def format_scanned_page(result, page_num):
+    """
+    Output and segments of a scanned page from its ocr_page() result.
+
+    The OCR text (rebuilt from the same Tesseract layout data, lines and
+    paragraphs kept) is the page's only content: every word of a table on
+    the page is already in it.
+
+    Returns:
+        (page_output, segments) like extract_scanned_page().
+    """
+    text = result["text"]
+    page_output = f"\n\n--- Page {page_num} ---\n{text.strip()}"
+    segment = make_segment("ocr", text, page=page_num)
+    return page_output, [segment] if segment else []
+
 def scanned_pdf_to_text(pdf_path, output_dir="Text_files", output_name=None):
     """
     Extract text from scanned PDFs including:
@@ -20,34 +47,16 @@ def scanned_pdf_to_text(pdf_path, output_dir="Text_files", output_name=None):
 
     doc = fitz.open(pdf_path)
     all_text = ""
+    segments = []
 
     for i, page in enumerate(doc, start=1):
-        print(f"🖼️ Converting page {i} to image...")
-        pix = page.get_pixmap(dpi=300)
-        img = Image.open(io.BytesIO(pix.tobytes("png")))
-
-        # 1️⃣ OCR full page
-        text = pytesseract.image_to_string(img, lang="eng")
-        all_text += f"\n\n--- Page {i} ---\n{text.strip()}"
-
-        # 2️⃣ Extract tables and structured text using pytesseract data
-        data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT)
-        n_boxes = len(data['level'])
-        table_text = ""
-        for j in range(n_boxes):
-            conf = int(data['conf'][j])
-            if conf > 40:  # filter low-confidence OCR
-                table_text += data['text'][j] + "\t"
-            if data['text'][j] == "":
-                table_text += "\n"
-        if table_text.strip():
-            all_text += "\n[Table/Text Layout Detected via OCR]:\n" + table_text.strip()
-
-        # 3️⃣ Optionally, you can save diagrams/charts as separate images
-        # img.save(f"{output_dir}/{base_name}_page_{i}.png")
+        page_output, page_segments = extract_scanned_page(page, i)
+        all_text += page_output
+        segments.extend(page_segments)
 
     with open(output_txt_path, "w", encoding="utf-8") as f:
         f.write(all_text.strip())
+    write_segments(output_txt_path, segments)
 
     print(f"\n✅ OCR completed! Text saved to: {os.path.abspath(output_txt_path)}")
     return output_txt_path
@@ -0,0 +1,61 @@
+import fitz  # PyMuPDF
+import os
+from document_segments import write_segments
+from PDF.PDF_To_Text import extract_text_page
+from PDF.Scanned_PDF_To_Text import extract_scanned_page
+
+# Pages with less selectable text than this are treated as scanned
+MIN_TEXT_CHARS = 20
+
+def classify_page(page_text):
+    """Return "text" for pages with real selectable text, "scanned" otherwise."""
+    return "text" if len(page_text.strip()) >= MIN_TEXT_CHARS else "scanned"
+
+def unified_pdf_to_text(pdf_path, output_dir="Text_files", output_name=None, page_range=None):
+    """
+    Extract text from any PDF, opening it only once.
+
+    Every page is classified on its own: pages with selectable text go
+    through the normal PDF path (reusing the text already extracted for the
+    classification), pages without go through the scanned/OCR path. Mixed
+    documents get the right treatment per page.
+
+    page_range=(first, last) limits extraction to those pages (1-based,
+    inclusive) so a large document can be processed in parts; page numbers
+    in the output stay those of the whole document.
+
+    Saves a text file with the same base name in the output_dir.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    base_name = output_name if output_name else os.path.splitext(os.path.basename(pdf_path))[0]
+    output_txt_path = os.path.join(output_dir, f"{base_name}.txt")
+
+    doc = fitz.open(pdf_path)
+    all_text = ""
+    segments = []
+    page_kinds = {"text": 0, "scanned": 0}
+
+    first_page, last_page = page_range or (1, len(doc))
+    for page_num in range(max(1, first_page), min(last_page, len(doc)) + 1):
+        page = doc.load_page(page_num - 1)
+        page_text = page.get_text("text")
+        kind = classify_page(page_text)
+        page_kinds[kind] += 1
+
+        if kind == "text":
+            page_output, page_segments = extract_text_page(page, page_num, page_text=page_text)
+        else:
+            page_output, page_segments = extract_scanned_page(page, page_num)
+
+        all_text += page_output
+        segments.extend(page_segments)
+
+    doc.close()
+
+    with open(output_txt_path, "w", encoding="utf-8") as f:
+        f.write(all_text.strip())
+    write_segments(output_txt_path, segments)
+
+    print(f"📑 {page_kinds['text']} text page(s), {page_kinds['scanned']} scanned page(s)")
+    print(f"\n✅ Extraction complete! Text saved to: {os.path.abspath(output_txt_path)}")
+    return output_txt_path
@@ -2,14 +2,14 @@
 
 from pptx import Presentation
 from pptx.enum.shapes import MSO_SHAPE_TYPE
-from PIL import Image
 import pytesseract
-import io
 import os
+from document_segments import make_segment, write_segments
+from OCR.ocr_cache import ocr_images, image_hash
 
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\tesseract.exe"  
 
-def ppt_to_text(ppt_file, output_dir="Text_files", output_name=None):
+def ppt_to_text(ppt_file, output_dir="Text_files", output_name=None, ocr_workers=None):
     """
     Extract all text from a PPT/PPTX file including:
     - Normal text boxes
@@ -17,48 +17,74 @@ def ppt_to_text(ppt_file, output_dir="Text_files", output_name=None):
     - Charts
     - Text inside images (OCR)
     
+    Pictures are collected while walking the slides and OCR'd afterwards in
+    parallel; an image repeated on many slides (logos, backgrounds) is OCR'd
+    only once.
+    
     Saves output as a .txt file with the same base name as the PPT file.
     """
     presentation = Presentation(ppt_file)
-    ppt_text = ""
+
+    # Walk the slides once, keeping picture positions as placeholders
+    # ("text", text, segment) or ("image", image_index, slide_num)
+    parts = []
+    images = []
 
     for slide_num, slide in enumerate(presentation.slides, start=1):
-        ppt_text += f"--- Slide {slide_num} ---\n"
+        parts.append(("text", f"--- Slide {slide_num} ---\n", None))
 
         for shape in slide.shapes:
             # 1. Normal text
             if hasattr(shape, "text") and shape.text.strip():
-                ppt_text += "[Text Box]:\n" + shape.text + "\n"
+                parts.append(("text", "[Text Box]:\n" + shape.text + "\n",
+                              make_segment("text", shape.text, slide=slide_num)))
 
             # 2. Tables
             if shape.shape_type == MSO_SHAPE_TYPE.TABLE:
-                ppt_text += "[Table]:\n"
                 table = shape.table
+                table_rows = []
                 for row in table.rows:
                     row_text = [cell.text.strip() for cell in row.cells]
-                    ppt_text += "\t".join(row_text) + "\n"
+                    table_rows.append("\t".join(row_text))
+                parts.append(("text", "[Table]:\n" + "\n".join(table_rows) + "\n",
+                              make_segment("table", "\n".join(table_rows), slide=slide_num)))
 
             # 3. Charts (extract text from chart series and categories)
             if shape.shape_type == MSO_SHAPE_TYPE.CHART:
-                ppt_text += "[Chart]:\n"
+                chart_text = ""
                 chart = shape.chart
                 for series in chart.series:
-                    ppt_text += f"Series: {series.name}\n"
-                    ppt_text += "Values: " + ", ".join([str(v) for v in series.values]) + "\n"
+                    chart_text += f"Series: {series.name}\n"
+                    chart_text += "Values: " + ", ".join([str(v) for v in series.values]) + "\n"
                 categories = [str(c) for c in chart.chart_data.categories]
-                ppt_text += "Categories: " + ", ".join(categories) + "\n"
+                chart_text += "Categories: " + ", ".join(categories) + "\n"
+                parts.append(("text", "[Chart]:\n" + chart_text,
+                              make_segment("chart", chart_text, slide=slide_num)))
 
-            # 4. Images (OCR)
+            # 4. Images (OCR later)
             if shape.shape_type == MSO_SHAPE_TYPE.PICTURE:
-                image = shape.image
-                image_bytes = image.blob
-                image_stream = io.BytesIO(image_bytes)
-                img = Image.open(image_stream)
-                text_in_image = pytesseract.image_to_string(img)
-                if text_in_image.strip():
-                    ppt_text += "[Text in Image]:\n" + text_in_image + "\n"
+                parts.append(("image", len(images), slide_num))
+                images.append(shape.image.blob)
 
-        ppt_text += "\n"
+        parts.append(("text", "\n", None))
+
+    # OCR every distinct image once, in parallel
+    if images:
+        print(f"🖼️ OCR of {len(images)} image(s) ({len(set(map(image_hash, images)))} unique)...")
+    image_texts = ocr_images(images, max_workers=ocr_workers)
+
+    ppt_text = ""
+    segments = []
+    for kind, payload, extra in parts:
+        if kind == "text":
+            ppt_text += payload
+            if extra:
+                segments.append(extra)
+        else:
+            text_in_image = image_texts[payload]
+            if text_in_image.strip():
+                ppt_text += "[Text in Image]:\n" + text_in_image + "\n"
+                segments.append(make_segment("ocr", text_in_image, slide=extra))
 
     # Save output with specified name or original base name
     os.makedirs(output_dir, exist_ok=True)
@@ -66,6 +92,7 @@ def ppt_to_text(ppt_file, output_dir="Text_files", output_name=None):
     output_file = os.path.join(output_dir, f"{base_name}.txt")
     with open(output_file, "w", encoding="utf-8") as f:
         f.write(ppt_text)
+    write_segments(output_file, segments)
 
     print(f"Extraction complete! Saved to {output_file}")
     return output_file
@@ -1,86 +1,245 @@
 import os
-import glob
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from File_entry import process_file
-import Embedding_C.Text_To_Embeddings as Text_To_Embeddings
+from embedding_config import get_embedding_config
+from document_registry import get_document_registry, artifact_paths
+from Embedding_C.sharded_store import get_index_store
 
-def process_all_documents(documents_dir="Documents"):
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TEXT_DIR = os.path.join(SCRIPT_DIR, "Text_files")
+EMBEDDINGS_DIR = os.path.join(SCRIPT_DIR, "Embeddings")
+
+# Supported file extensions
+SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".doc", ".pptx", ".ppt"}
+
+# Name of the resume manifest written in the documents directory
+MANIFEST_NAME = ".ingest_manifest.json"
+
+def discover_documents(documents_dir):
+    """
+    Recursively find all supported documents below documents_dir.
+    """
+    all_files = []
+    for root, dirs, files in os.walk(documents_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                all_files.append(os.path.join(root, name))
+    return all_files
+
+def output_name_for(file_path, documents_dir):
+    """
+    Output base name (and document ID) for a document; files in subfolders
+    get the folder path as a prefix so equally named files do not overwrite
+    each other.
+    """
+    relative = os.path.relpath(file_path, documents_dir)
+    return os.path.splitext(relative)[0].replace(os.sep, "__")
+
+def load_manifest(manifest_path):
+    """Load the resume manifest, or an empty one."""
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            print(f"⚠️ Ignoring unreadable manifest: {manifest_path}")
+    return {"files": {}}
+
+def save_manifest(manifest, manifest_path):
+    """Write the manifest atomically so an interrupted run never corrupts it."""
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def is_up_to_date(file_path, entry, output_base_name):
+    """
+    True if the manifest says this exact file version was processed and its
+    text and embeddings still exist and are newer than the source.
+    """
+    if not entry or entry.get("status") != "done":
+        return False
+
+    stat = os.stat(file_path)
+    if entry.get("size") != stat.st_size or entry.get("mtime") != stat.st_mtime:
+        return False
+
+    for output_path in (
+        os.path.join(TEXT_DIR, f"{output_base_name}.txt"),
+        os.path.join(EMBEDDINGS_DIR, f"{output_base_name}.json")
+    ):
+        if not os.path.exists(output_path) or os.path.getmtime(output_path) < stat.st_mtime:
+            return False
+    return True
+
+def _process_one(file_path, output_base_name, ocr_workers=None, uploaded_at=None):
+    """Worker: extract text and generate embeddings for one document."""
+    start = time.time()
+    success = process_file(file_path, generate_embeddings=True, output_base_name=output_base_name,
+                           ocr_workers=ocr_workers, uploaded_at=uploaded_at)
+    artifacts = artifact_paths(output_base_name, TEXT_DIR, EMBEDDINGS_DIR)
+    return {
+        "success": success,
+        "seconds": time.time() - start,
+        "text": artifacts["text_path"],
+        "embeddings": artifacts["embeddings_path"],
+        "artifacts": {key: path for key, path in artifacts.items() if os.path.exists(path)}
+    }
+
+def _register(registry, key, file_path, output_base_name):
+    """Catalog a document before it is processed, so its upload time is fixed from the first ingest on."""
+    return registry.ensure(output_base_name, os.path.basename(file_path), key,
+                           os.path.abspath(file_path), size=os.path.getsize(file_path))
+
+def _record_in_registry(registry, key, file_path, output_base_name, result):
+    """Keep the document catalog in sync with batch ingestion results."""
+    _register(registry, key, file_path, output_base_name)
+    if result["success"]:
+        registry.update(output_base_name, status="completed", **result["artifacts"])
+    else:
+        registry.update(output_base_name, status="error")
+
+def _run_processes(pending, max_workers, registry):
+    """Yield (key, file_path, output_base_name, result) with one worker process per document."""
+    workers = min(max_workers or os.cpu_count() or 1, len(pending))
+    # Split the CPUs between the processes so they do not each start one
+    # Tesseract per CPU
+    ocr_workers = max(1, (os.cpu_count() or 1) // workers)
+    print(f"⚙️ Using {workers} worker process(es), {ocr_workers} OCR thread(s) each")
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_process_one, file_path, output_base_name, ocr_workers,
+                            registry.upload_time(output_base_name)): (key, file_path, output_base_name)
+            for key, file_path, output_base_name in pending
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+            yield futures[future] + (result,)
+
+def _run_pipeline(pending, stage_workers, registry):
+    """Yield (key, file_path, output_base_name, result) from the staged ingestion pipeline."""
+    from ingest_pipeline import IngestPipeline
+    
+    pipeline = IngestPipeline(workers=stage_workers, text_dir=TEXT_DIR, embeddings_dir=EMBEDDINGS_DIR,
+                              registry=registry)
+    print("⚙️ Staged pipeline: " + ", ".join(f"{name} {count}" for name, count in pipeline.workers.items()))
+    by_output = {output_base_name: (key, file_path, output_base_name) for key, file_path, output_base_name in pending}
+    for result in pipeline.run((file_path, output_base_name) for _, file_path, output_base_name in pending):
+        artifacts = artifact_paths(result["output_name"], TEXT_DIR, EMBEDDINGS_DIR)
+        result["artifacts"] = {key: path for key, path in artifacts.items() if os.path.exists(path)}
+        yield by_output[result["output_name"]] + (result,)
+    pipeline.print_report()
+
+def process_all_documents(documents_dir="Documents", max_workers=None, force=False, pipeline=False,
+                          stage_workers=None):
     """
-    Process all supported documents in the Documents directory.
+    Process all supported documents below the Documents directory in parallel.
+    
+    Progress is recorded in a manifest inside documents_dir, so an interrupted
+    run resumes where it stopped; documents whose outputs are up to date are
+    skipped unless force is set.
     
     Args:
         documents_dir (str): Directory containing documents to process
+        max_workers (int): Number of worker processes (default: CPU count)
+        force (bool): Reprocess documents even if their outputs are up to date
+        pipeline (bool): Use the staged ingestion pipeline (ingest_pipeline.py)
+            instead of one process per document
+        stage_workers (dict): Threads per pipeline stage, e.g. {"ocr": 8}
     """
     if not os.path.exists(documents_dir):
         print(f"❌ Documents directory not found: {documents_dir}")
         return
     
-    # Supported file extensions
-    supported_extensions = ["*.pdf", "*.docx", "*.doc", "*.pptx", "*.ppt"]
-    
-    processed_files = []
-    failed_files = []
-    
     print(f"🔍 Scanning {documents_dir} for supported documents...")
-    
-    # Find all supported files
-    all_files = []
-    for ext in supported_extensions:
-        pattern = os.path.join(documents_dir, ext)
-        all_files.extend(glob.glob(pattern))
+    all_files = discover_documents(documents_dir)
     
     if not all_files:
         print(f"❌ No supported documents found in {documents_dir}")
         return
     
-    print(f"📁 Found {len(all_files)} document(s) to process")
+    manifest_path = os.path.join(documents_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
     
+    # Skip documents that are already done
+    pending = []
+    skipped_files = []
     for file_path in all_files:
-        print(f"\n{'='*60}")
-        print(f"🔄 Processing: {os.path.basename(file_path)}")
-        print(f"{'='*60}")
+        key = os.path.relpath(file_path, documents_dir)
+        output_base_name = output_name_for(file_path, documents_dir)
+        if not force and is_up_to_date(file_path, manifest["files"].get(key), output_base_name):
+            skipped_files.append(file_path)
+        else:
+            pending.append((key, file_path, output_base_name))
+    
+    print(f"📁 Found {len(all_files)} document(s): {len(pending)} to process, {len(skipped_files)} up to date")
+    
+    registry = get_document_registry()
+    config = get_embedding_config()
+    vector_store = get_index_store(EMBEDDINGS_DIR, config.get("vector_store"), config.get("sharding"))
+    processed_files = []
+    failed_files = []
+    total_bytes = 0
+    start = time.time()
+    
+    if pending:
+        for key, file_path, output_base_name in pending:
+            _register(registry, key, file_path, output_base_name)
+        if pipeline:
+            completed = _run_pipeline(pending, stage_workers, registry)
+        else:
+            completed = _run_processes(pending, max_workers, registry)
         
-        try:
-            # Process file to extract text
-            if process_file(file_path):
-                # Create embeddings
-                base_filename = os.path.splitext(os.path.basename(file_path))[0]
-                text_file_path = f"Text_files/{base_filename}.txt"
-                
-                if os.path.exists(text_file_path):
-                    embeddings_path = Text_To_Embeddings.text_to_embeddings(text_file_path)
-                    processed_files.append({
-                        'original': file_path,
-                        'text': text_file_path,
-                        'embeddings': embeddings_path
-                    })
-                    print(f"✅ Successfully processed: {os.path.basename(file_path)}")
-                else:
-                    failed_files.append(file_path)
-                    print(f"❌ Text file not created for: {os.path.basename(file_path)}")
+        for key, file_path, output_base_name, result in completed:
+            stat = os.stat(file_path)
+            entry = {"size": stat.st_size, "mtime": stat.st_mtime}
+            
+            if result["success"]:
+                entry.update(status="done", text=result["text"],
+                             embeddings=result["embeddings"], seconds=round(result["seconds"], 2))
+                processed_files.append(file_path)
+                total_bytes += stat.st_size
+                print(f"✅ Successfully processed: {key} ({result['seconds']:.1f}s)")
             else:
+                entry.update(status="failed", error=result.get("error", "processing failed"))
                 failed_files.append(file_path)
-                print(f"❌ Failed to process: {os.path.basename(file_path)}")
-                
-        except Exception as e:
-            failed_files.append(file_path)
-            print(f"❌ Error processing {os.path.basename(file_path)}: {e}")
+                print(f"❌ Failed to process: {key}")
+            
+            manifest["files"][key] = entry
+            save_manifest(manifest, manifest_path)
+            _record_in_registry(registry, key, file_path, output_base_name, result)
+            if result["success"]:
+                try:
+                    vector_store.add_embeddings_file(output_base_name, result["embeddings"])
+                except Exception as e:
+                    print(f"⚠️ Could not index {key}: {e}")
+    
+    elapsed = time.time() - start
     
     # Summary
     print(f"\n{'='*60}")
     print(f"📊 PROCESSING SUMMARY")
     print(f"{'='*60}")
     print(f"✅ Successfully processed: {len(processed_files)} files")
+    print(f"⏭️ Skipped (up to date): {len(skipped_files)} files")
     print(f"❌ Failed to process: {len(failed_files)} files")
-    
-    if processed_files:
-        print(f"\n📁 Successfully processed files:")
-        for file_info in processed_files:
-            print(f"  • {os.path.basename(file_info['original'])}")
+    print(f"⏱️ Elapsed: {elapsed:.1f}s")
+    if processed_files and elapsed > 0:
+        print(f"🚀 Throughput: {len(processed_files) / elapsed:.2f} files/s, "
+              f"{total_bytes / elapsed / (1024 * 1024):.2f} MB/s")
     
     if failed_files:
         print(f"\n❌ Failed files:")
         for file_path in failed_files:
-            print(f"  • {os.path.basename(file_path)}")
+            print(f"  • {os.path.relpath(file_path, documents_dir)}")
 
 def process_single_file(file_path):
     """
@@ -96,21 +255,13 @@ def process_single_file(file_path):
     print(f"🔄 Processing: {os.path.basename(file_path)}")
     
     try:
-        # Process file to extract text
-        if process_file(file_path):
-            # Create embeddings
+        # Extract text and generate embeddings with the configured provider
+        if process_file(file_path, generate_embeddings=True):
             base_filename = os.path.splitext(os.path.basename(file_path))[0]
-            text_file_path = f"Text_files/{base_filename}.txt"
-            
-            if os.path.exists(text_file_path):
-                embeddings_path = Text_To_Embeddings.text_to_embeddings(text_file_path)
-                print(f"🎉 Process completed successfully!")
-                print(f"📁 Text file: {os.path.abspath(text_file_path)}")
-                print(f"🔗 Embeddings: {os.path.abspath(embeddings_path)}")
-                return True
-            else:
-                print(f"❌ Text file not created: {text_file_path}")
-                return False
+            print(f"🎉 Process completed successfully!")
+            print(f"📁 Text file: {os.path.join(TEXT_DIR, base_filename + '.txt')}")
+            print(f"🔗 Embeddings: {os.path.join(EMBEDDINGS_DIR, base_filename + '.json')}")
+            return True
         else:
             print(f"❌ Failed to process file")
             return False
@@ -120,12 +271,22 @@ def process_single_file(file_path):
         return False
 
 if __name__ == "__main__":
-    import sys
+    parser = argparse.ArgumentParser(description="Extract text and generate embeddings for documents")
+    parser.add_argument("path", nargs="?", default="Documents", help="Document file or directory (default: Documents)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for directory ingestion")
+    parser.add_argument("--force", action="store_true", help="Reprocess documents even if up to date")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Overlap extraction, OCR, embedding and writes in a staged pipeline")
+    parser.add_argument("--stage-workers", default="",
+                        help="Threads per pipeline stage, e.g. ocr=8,embed=4 (stages: extract, ocr, chunk, embed, persist)")
+    args = parser.parse_args()
     
-    if len(sys.argv) > 1:
+    if os.path.isfile(args.path):
         # Process specific file
-        file_path = sys.argv[1]
-        process_single_file(file_path)
+        process_single_file(args.path)
     else:
-        # Process all files in Documents directory
-        process_all_documents()
\ No newline at end of file
+        # Process all files in the directory
+        stage_workers = {name: int(count) for name, count in
+                         (item.split("=") for item in args.stage_workers.split(",") if item)}
+        process_all_documents(args.path, max_workers=args.workers, force=args.force,
+                              pipeline=args.pipeline, stage_workers=stage_workers)
@@ -0,0 +1,231 @@
+"""
+Document registry (catalog) backed by SQLite
+
+One row per uploaded document with its artifacts and processing state. The
+API lists, filters and deletes documents from here instead of scanning the
+Documents/, Text_files/ and Embeddings/ folders on every request; the
+ingestion pipeline keeps the rows up to date.
+
+Every document has a stable doc ID: the stem of its file in Documents/
+(uploads are stored as <stem>_<uuid8>.<ext>, so IDs never collide). All
+artifacts are named after it - Text_files/<doc_id>.txt,
+Text_files/<doc_id>.segments.json, Embeddings/<doc_id>.json - and every
+embedding record carries it, so deletes and re-ingests are single lookups.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import threading
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_PATH = os.path.join(SCRIPT_DIR, "documents.db")
+
+# Upload names look like <original stem>_<8 hex chars>.<ext>
+_UPLOAD_SUFFIX = re.compile(r"_[0-9a-f]{8}$")
+
+# Columns the listing may be sorted by
+SORTABLE_COLUMNS = {"uploaded_at", "filename", "size", "file_type", "status", "updated_at"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id          TEXT PRIMARY KEY,
+    filename        TEXT NOT NULL,
+    stored_name     TEXT NOT NULL UNIQUE,
+    file_type       TEXT NOT NULL,
+    size            INTEGER NOT NULL DEFAULT 0,
+    uploaded_at     REAL NOT NULL,
+    updated_at      REAL NOT NULL,
+    status          TEXT NOT NULL DEFAULT 'uploaded',
+    source_path     TEXT,
+    text_path       TEXT,
+    segments_path   TEXT,
+    embeddings_path TEXT,
+    chunk_count     INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_documents_uploaded_at ON documents (uploaded_at);
+CREATE INDEX IF NOT EXISTS idx_documents_filename ON documents (filename);
+CREATE INDEX IF NOT EXISTS idx_documents_file_type ON documents (file_type, uploaded_at);
+CREATE INDEX IF NOT EXISTS idx_documents_status ON documents (status, uploaded_at);
+"""
+
+# Columns added after the first release of the schema
+_ADDED_COLUMNS = {
+    "segments_path": "TEXT",
+    "chunk_count": "INTEGER"
+}
+
+def doc_id_for(stored_path):
+    """Stable document ID for a file in Documents/: its file name without extension."""
+    return os.path.splitext(os.path.basename(stored_path))[0]
+
+def artifact_paths(doc_id, text_dir, embeddings_dir):
+    """Paths of all derived artifacts of a document."""
+    return {
+        "text_path": os.path.join(text_dir, f"{doc_id}.txt"),
+        "segments_path": os.path.join(text_dir, f"{doc_id}.segments.json"),
+        "embeddings_path": os.path.join(embeddings_dir, f"{doc_id}.json")
+    }
+
+class DocumentRegistry:
+    """Thread-safe SQLite catalog of documents and their artifacts"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(documents)")}
+            for column, column_type in _ADDED_COLUMNS.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE documents ADD COLUMN {column} {column_type}")
+
+    def register(self, doc_id, filename, stored_name, source_path, size=0, uploaded_at=None, status="uploaded"):
+        """Add a document (or replace the row with the same doc_id)."""
+        now = time.time()
+        file_type = os.path.splitext(filename)[1].lower().lstrip(".")
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO documents
+                   (doc_id, filename, stored_name, file_type, size, uploaded_at, updated_at, status, source_path)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (doc_id, filename, stored_name, file_type, size, uploaded_at or now, now, status, source_path)
+            )
+
+    def update(self, doc_id, **fields):
+        """Update columns of a document, e.g. status or artifact paths."""
+        if not fields:
+            return
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE documents SET {assignments} WHERE doc_id = ?",
+                (*fields.values(), doc_id)
+            )
+
+    def get(self, doc_id):
+        """Document row as a dict, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        return dict(row) if row else None
+
+    def upload_time(self, doc_id):
+        """When the document was uploaded (registered), or None if it is not in the catalog."""
+        doc = self.get(doc_id)
+        return doc["uploaded_at"] if doc else None
+
+    def ensure(self, doc_id, filename, stored_name, source_path, size=0):
+        """Register a document unless it is already in the catalog; returns its row."""
+        doc = self.get(doc_id)
+        if doc is None:
+            self.register(doc_id, filename, stored_name, source_path, size=size)
+            doc = self.get(doc_id)
+        return doc
+
+    def resolve(self, identifier):
+        """Find a document by doc ID or by its file name in Documents/."""
+        return self.get(identifier) or self.get_by_stored_name(identifier)
+
+    def get_by_stored_name(self, stored_name):
+        """Look a document up by its file name in Documents/."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM documents WHERE stored_name = ?", (stored_name,)).fetchone()
+        return dict(row) if row else None
+
+    def delete(self, doc_id):
+        """Remove a document row."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+
+    def list_documents(self, offset=0, limit=100, file_type=None, status=None, search=None,
+                       sort_by="uploaded_at", descending=True):
+        """
+        Page through the catalog.
+
+        Args:
+            offset (int): Rows to skip.
+            limit (int): Maximum rows to return.
+            file_type (str): Only this extension (e.g. "pdf").
+            status (str): Only this processing status.
+            search (str): Substring of the original filename.
+            sort_by (str): One of SORTABLE_COLUMNS.
+            descending (bool): Sort direction.
+
+        Returns:
+            (rows, total) - the page as dicts and the total number of matches.
+        """
+        if sort_by not in SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot sort by {sort_by}. Available: {sorted(SORTABLE_COLUMNS)}")
+
+        conditions = []
+        params = []
+        if file_type:
+            conditions.append("file_type = ?")
+            params.append(file_type.lower().lstrip("."))
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if search:
+            conditions.append("filename LIKE ?")
+            params.append(f"%{search}%")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        direction = "DESC" if descending else "ASC"
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM documents {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT * FROM documents {where} ORDER BY {sort_by} {direction}, doc_id LIMIT ? OFFSET ?",
+                (*params, limit, offset)
+            ).fetchall()
+        return [dict(row) for row in rows], total
+
+    def sync_directory(self, upload_dir, supported_extensions, text_dir=None, embeddings_dir=None):
+        """
+        Register files in upload_dir that are not in the catalog yet, e.g.
+        documents copied in by hand or uploaded before the registry existed.
+
+        Returns:
+            Number of documents added.
+        """
+        with self._lock:
+            known = {row[0] for row in self._conn.execute("SELECT stored_name FROM documents")}
+
+        added = 0
+        for entry in os.scandir(upload_dir):
+            name = entry.name
+            if not entry.is_file() or name in known:
+                continue
+            if os.path.splitext(name)[1].lower() not in supported_extensions:
+                continue
+            stat = entry.stat()
+            stem, ext = os.path.splitext(name)
+            original_stem = _UPLOAD_SUFFIX.sub("", stem)
+            self.register(stem, original_stem + ext, name, entry.path, size=stat.st_size,
+                          uploaded_at=stat.st_mtime, status="unknown")
+
+            artifacts = {}
+            if text_dir and embeddings_dir:
+                # Outputs are named after the doc ID; older uploads used the original name
+                for base_name in (stem, original_stem):
+                    candidates = artifact_paths(base_name, text_dir, embeddings_dir)
+                    if os.path.exists(candidates["embeddings_path"]):
+                        artifacts = {key: path for key, path in candidates.items() if os.path.exists(path)}
+                        artifacts["status"] = "completed"
+                        break
+            self.update(stem, **artifacts)
+            added += 1
+        return added
+
+_registry = None
+
+def get_document_registry(db_path=DEFAULT_DB_PATH):
+    """Shared registry instance for this process."""
+    global _registry
+    if _registry is None:
+        _registry = DocumentRegistry(db_path)
+    return _registry
@@ -0,0 +1,114 @@
+"""
+Structured segments emitted by the extractors
+
+A segment is one logical unit of a document (a page's text, a table, a slide
+text box, the OCR output of an image, ...) together with where it came from:
+
+    {"type": "table", "text": "...", "page": 3, "slide": None}
+
+Extractors write the segments next to the text file as <name>.segments.json so
+the chunker can pack them without crossing page/slide boundaries and every
+chunk can carry its page/slide in the embedding record.
+"""
+
+import os
+import re
+import json
+
+# Segment types
+TEXT = "text"
+PARAGRAPH = "paragraph"
+TABLE = "table"
+CHART = "chart"
+OCR = "ocr"
+
+# Chunks never span two different values of these keys
+HARD_BOUNDARY_KEYS = ("page", "slide")
+
+def make_segment(segment_type, text, page=None, slide=None, **extra):
+    """Build a segment dict; empty text yields None so callers can skip it."""
+    text = text.strip() if text else ""
+    if not text:
+        return None
+    segment = {"type": segment_type, "text": text, "page": page, "slide": slide}
+    segment.update(extra)
+    return segment
+
+def segments_path_for(text_file_path):
+    """Path of the segments sidecar belonging to a text file."""
+    return os.path.splitext(text_file_path)[0] + ".segments.json"
+
+def write_segments(text_file_path, segments):
+    """Save segments next to the extracted text file."""
+    segments = [s for s in segments if s]
+    path = segments_path_for(text_file_path)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(segments, f, ensure_ascii=False)
+    return path
+
+def load_segments(text_file_path):
+    """Load the segments sidecar for a text file, or None if there is none."""
+    path = segments_path_for(text_file_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+_PAGE_MARKER = re.compile(r"^--- Page (\d+) ---$")
+_SLIDE_MARKER = re.compile(r"^--- Slide (\d+) ---$")
+_LABEL_MARKER = re.compile(r"^\[([^\]]+)\]:\s?(.*)$")
+
+def _segment_type_for_label(label):
+    """Map an extractor label such as 'Table 2' or 'Text in Image' to a type."""
+    if "Image" in label or "OCR" in label:
+        return OCR
+    if label.startswith("Table"):
+        return TABLE
+    if label.startswith("Chart"):
+        return CHART
+    if label.startswith("Paragraph"):
+        return PARAGRAPH
+    return TEXT
+
+def parse_segments(text):
+    """
+    Recover segments from the markers in an extracted text file.
+
+    Used for text files written before extractors emitted segments
+    (--- Page N ---, --- Slide N ---, [Table Detected]:, [Paragraph N]: ...).
+    """
+    segments = []
+    page = None
+    slide = None
+    current_type = TEXT
+    current_lines = []
+
+    def flush():
+        segment = make_segment(current_type, "\n".join(current_lines), page=page, slide=slide)
+        if segment:
+            segments.append(segment)
+
+    for line in text.splitlines():
+        stripped = line.strip()
+
+        page_match = _PAGE_MARKER.match(stripped)
+        slide_match = _SLIDE_MARKER.match(stripped)
+        label_match = _LABEL_MARKER.match(stripped)
+
+        if page_match or slide_match:
+            flush()
+            current_lines = []
+            current_type = TEXT
+            if page_match:
+                page = int(page_match.group(1))
+            else:
+                slide = int(slide_match.group(1))
+        elif label_match:
+            flush()
+            current_type = _segment_type_for_label(label_match.group(1))
+            current_lines = [label_match.group(2)] if label_match.group(2) else []
+        else:
+            current_lines.append(line)
+
+    flush()
+    return segments
@@ -4,7 +4,7 @@ Configuration for embedding providers
 
 # Default embedding configuration
 EMBEDDING_CONFIG = {
-    # Provider type: "dummy", "openai", "huggingface"
+    # Provider type: "dummy", "openai", "huggingface", "onnx", "routing"
     "provider": "dummy",
     
     # Provider-specific configurations
@@ -14,12 +14,69 @@ EMBEDDING_CONFIG = {
         },
         "openai": {
             "model": "text-embedding-3-small",  # or "text-embedding-3-large", "text-embedding-ada-002"
+            "dimensions": None,  # e.g. 256 or 512 for shorter text-embedding-3-* vectors
+            "max_in_flight": 4,  # concurrent API requests while embedding a document
+            "request_batch_size": 16  # chunks per API request
             # api_key will be read from environment variable OPENAI_API_KEY
         },
         "huggingface": {
             "model_name": "all-MiniLM-L6-v2"  # Fast and good quality
             # Other options: "all-mpnet-base-v2" (better quality, slower)
+        },
+        "onnx": {
+            # Same models as "huggingface", exported to ONNX on first use and
+            # run with onnxruntime (faster on CPU, no torch needed afterwards)
+            "model_name": "all-MiniLM-L6-v2",
+            "quantize": True,      # int8 dynamic quantization of the weights
+            "num_threads": None    # None = onnxruntime default (physical cores)
+        },
+        "routing": {
+            # Several endpoints of the same model (same dimension), in order of
+            # preference. A call still unanswered after the provider's p95
+            # latency is duplicated to the next one and the first answer wins;
+            # providers with elevated error rates are skipped for a cooldown.
+            "providers": [
+                {"type": "openai", "model": "text-embedding-3-small"},
+                {"type": "openai", "model": "text-embedding-3-small",
+                 "base_url": "https://your-fallback-endpoint/v1/embeddings"}
+            ],
+            "hedge_quantile": 0.95,
+            "timeout": 60.0,       # Seconds to wait for any provider
+            "error_rate": 0.5,     # Failure fraction that opens a provider's circuit breaker
+            "cooldown": 30.0       # Seconds before a tripped provider is tried again
         }
+    },
+    
+    # Vector index settings
+    "vector_store": {
+        # Vector codes kept in RAM: "float32", "float16", "int8" or "binary".
+        # Compressed modes keep the float32 vectors on disk (memory-mapped)
+        # and rescore the best candidates with them.
+        "quantization": "float32",
+        
+        # Candidates rescored exactly, as a multiple of the requested results
+        "rescore_factor": 4
+    },
+    
+    # Vector index shards (see shard_server.py)
+    "sharding": {
+        "shards": [],          # Shard server URLs in shard order, e.g. ["http://10.0.0.5:8101"]; empty = local index
+        "deadline": 0.5        # Seconds a search waits for the shards before answering without the slow ones
+    },
+    
+    # Ingestion work queue; "sqlite" serves the API and workers of one host
+    "work_queue": {
+        "backend": "sqlite",   # See work_queue.QUEUE_BACKENDS
+        "lease_seconds": 60.0  # A unit is handed to another worker after this long without a heartbeat
+    },
+    
+    # Optional cross-encoder reranking of search results (needs sentence-transformers)
+    "reranker": {
+        "enabled": False,
+        "model_name": "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        "candidates": 20,     # Vector search results scored by the cross-encoder
+        "batch_size": 32,     # Pairs per forward pass
+        "time_budget": 0.5    # Seconds of scoring per query at most
     }
 }
 
@@ -53,12 +110,19 @@ LOCAL_CONFIG = {
     "providers": {"huggingface": {"model_name": "all-MiniLM-L6-v2"}}
 }
 
+# Local processing on CPU-only machines via onnxruntime
+ONNX_CONFIG = {
+    "provider": "onnx",
+    "providers": {"onnx": {"model_name": "all-MiniLM-L6-v2", "quantize": True}}
+}
+
 def use_config(config_name: str):
     """Switch to a predefined configuration"""
     configs = {
         "development": DEVELOPMENT_CONFIG,
         "openai": OPENAI_CONFIG,
-        "local": LOCAL_CONFIG
+        "local": LOCAL_CONFIG,
+        "onnx": ONNX_CONFIG
     }
     
     if config_name in configs:
@@ -0,0 +1,437 @@
+"""
+Staged ingestion pipeline
+
+process_file() handles one document at a time: extract, OCR, chunk, embed and
+write strictly in sequence, so OCR (CPU), embedding (network or model) and
+disk writes never overlap. IngestPipeline runs each step as a stage with its
+own thread pool, connected by bounded queues of pages and embedding batches:
+
+    extract ──► ocr ──► chunk ──► embed ──► persist
+       └─────────────────►┘  (DOCX/PPTX are extracted whole)
+
+Tesseract runs as a subprocess and embedding waits on the network or on
+torch/onnxruntime, which release the GIL, so threads keep the cores and the
+network busy at the same time. PyMuPDF is not thread-safe, so all its calls
+share one lock. A stage that falls behind fills its queue and blocks the
+stages feeding it, which keeps memory flat; per-stage utilization and queue
+depth show which stage is the bottleneck.
+
+Outputs are the same as process_file()'s: Text_files/<name>.txt, its
+segments and Embeddings/<name>.json.
+"""
+
+import os
+import time
+import queue
+import threading
+from embedding_config import get_embedding_config
+from File_entry import document_metadata
+from document_segments import load_segments, parse_segments, write_segments
+from Embedding_C import auto_chunk
+from Embedding_C.Text_To_Embeddings import EMBED_BATCH_SIZE, create_provider, embed_chunks, save_embeddings
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STAGES = ("extract", "ocr", "chunk", "embed", "persist")
+
+# Threads per stage. OCR is CPU-bound (one Tesseract process per thread);
+# embed workers are concurrent provider calls.
+DEFAULT_WORKERS = {
+    "extract": 2,
+    "ocr": os.cpu_count() or 1,
+    "chunk": 1,
+    "embed": 4,
+    "persist": 1
+}
+
+# Items (documents, pages or batches) waiting per stage before producers block
+DEFAULT_QUEUE_SIZE = 16
+
+# Seconds between progress reports while running
+REPORT_INTERVAL = 10.0
+
+# All PyMuPDF calls, across documents and stages
+_fitz_lock = threading.Lock()
+
+_STOP = object()
+
+class Stage:
+    """A thread pool with a bounded input queue, and its utilization counters"""
+
+    def __init__(self, name, handler, workers, queue_size, on_error):
+        self.name = name
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._handler = handler
+        self._on_error = on_error
+        self._threads = []
+        self._lock = threading.Lock()
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.max_depth = 0
+        self._depth_total = 0
+        self._depth_samples = 0
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def put(self, item):
+        """Queue an item, blocking while the stage is full."""
+        self.queue.put(item)
+        depth = self.queue.qsize()
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+            self._depth_total += depth
+            self._depth_samples += 1
+
+    def stop(self):
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            start = time.perf_counter()
+            try:
+                self._handler(item)
+            except Exception as e:
+                self._on_error(self.name, item, e)
+            finally:
+                with self._lock:
+                    self.items += 1
+                    self.busy_seconds += time.perf_counter() - start
+
+    def stats(self, elapsed):
+        """Items handled, busy fraction of the pool and queue depth."""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "items": self.items,
+                "utilization": self.busy_seconds / (self.workers * elapsed) if elapsed > 0 else 0.0,
+                "queue": self.queue.qsize(),
+                "max_queue": self.max_depth,
+                "mean_queue": self._depth_total / self._depth_samples if self._depth_samples else 0.0
+            }
+
+class _Document:
+    """A document moving through the pipeline"""
+
+    def __init__(self, file_path, output_name):
+        self.file_path = file_path
+        self.output_name = output_name
+        self.start = time.time()
+        self.lock = threading.Lock()
+        self.failed = False
+        self.finished = False
+        self.error = None
+        self.pdf = None
+        self.pages = []
+        self.pending = 0
+        self.text = None
+        self.segments = None
+        self.chunks = None
+        self.embeddings = None
+
+class IngestPipeline:
+    """
+    Extract, OCR, chunk, embed and persist documents in overlapping stages.
+
+    Usage:
+        pipeline = IngestPipeline(workers={"ocr": 8, "embed": 4})
+        for result in pipeline.run([(file_path, output_name), ...]):
+            ...
+    """
+
+    def __init__(self, workers=None, queue_size=DEFAULT_QUEUE_SIZE, text_dir=None, embeddings_dir=None,
+                 report_interval=REPORT_INTERVAL, registry=None):
+        """
+        Args:
+            workers (dict): Threads per stage, overriding DEFAULT_WORKERS.
+            queue_size (int): Bounded queue length of every stage.
+            text_dir (str): Output directory of text files (default: Text_files).
+            embeddings_dir (str): Output directory of embeddings (default: Embeddings).
+            report_interval (float): Seconds between progress reports (None: no reports).
+            registry (DocumentRegistry): Catalog whose upload times are stored
+                with the chunks (default: the files' mtimes).
+        """
+        self.workers = dict(DEFAULT_WORKERS, **(workers or {}))
+        unknown = set(self.workers) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown pipeline stages: {sorted(unknown)}. Available: {list(STAGES)}")
+        self.queue_size = queue_size
+        self.text_dir = text_dir or os.path.join(SCRIPT_DIR, "Text_files")
+        self.embeddings_dir = embeddings_dir or os.path.join(SCRIPT_DIR, "Embeddings")
+        self.report_interval = report_interval
+        self.registry = registry
+
+        config = get_embedding_config()
+        provider_type = config["provider"]
+        self.provider, self.dimension = create_provider(provider_type, config["providers"][provider_type])
+
+        handlers = {
+            "extract": self._extract,
+            "ocr": self._ocr,
+            "chunk": self._chunk,
+            "embed": self._embed,
+            "persist": self._persist
+        }
+        self.stages = {
+            name: Stage(name, handlers[name], max(1, self.workers[name]), queue_size, self._stage_failed)
+            for name in STAGES
+        }
+        self._results = queue.Queue()
+        self._started_at = None
+
+    # Stages
+
+    def _extract(self, doc):
+        ext = os.path.splitext(doc.file_path)[1].lower()
+        print(f"📄 Extracting text from {os.path.basename(doc.file_path)}...")
+        if ext == ".pdf":
+            self._extract_pdf(doc)
+            return
+
+        # DOCX/PPTX extractors write the text file and segments themselves.
+        # Their image OCR shares the OCR stage's thread budget between the
+        # extract workers instead of starting one Tesseract per CPU each.
+        ocr_workers = max(1, self.workers["ocr"] // max(1, self.workers["extract"]))
+        if ext in (".ppt", ".pptx"):
+            import PPT.PPT_To_Text as PPT_To_Text
+            text_path = PPT_To_Text.ppt_to_text(doc.file_path, output_dir=self.text_dir, output_name=doc.output_name,
+                                                ocr_workers=ocr_workers)
+        elif ext in (".doc", ".docx"):
+            import DOCX.DOCX_To_Text as DOCX_To_Text
+            text_path = DOCX_To_Text.docx_to_text(doc.file_path, output_dir=self.text_dir,
+                                                  output_name=doc.output_name, ocr_workers=ocr_workers)
+        else:
+            raise ValueError(f"Unsupported file type: {ext}")
+
+        doc.segments = load_segments(text_path)
+        if doc.segments is None:
+            with open(text_path, "r", encoding="utf-8") as f:
+                doc.segments = parse_segments(f.read())
+        self.stages["chunk"].put(doc)
+
+    def _extract_pdf(self, doc):
+        """Text layer of every page here; each page then goes to the OCR stage."""
+        import fitz  # PyMuPDF
+        from PDF.Unified_PDF_To_Text import classify_page
+        from PDF.PDF_To_Text import extract_text_layer
+
+        with _fitz_lock:
+            doc.pdf = fitz.open(doc.file_path)
+            page_count = len(doc.pdf)
+        doc.pages = [None] * page_count
+        doc.pending = page_count
+        if not page_count:
+            self._pages_done(doc)
+            return
+
+        for index in range(page_count):
+            if doc.failed:
+                self._page_done(doc)
+                continue
+            try:
+                with _fitz_lock:
+                    page = doc.pdf.load_page(index)
+                    page_text = page.get_text("text")
+                    kind = classify_page(page_text)
+                    if kind == "text":
+                        doc.pages[index] = extract_text_layer(page, index + 1, page_text=page_text)
+                self.stages["ocr"].put((doc, index, kind))
+            except Exception as e:
+                self._fail(doc, "extract", e)
+                self._page_done(doc)
+
+    def _ocr(self, item):
+        doc, index, kind = item
+        try:
+            if doc.failed:
+                return
+            from OCR.page_ocr import ocr_page, ocr_image_regions
+            from PDF.PDF_To_Text import format_image_text
+            from PDF.Scanned_PDF_To_Text import format_scanned_page
+
+            with _fitz_lock:
+                page = doc.pdf.load_page(index)
+            if kind == "text":
+                # Only the page's images; their text already in the text layer is dropped
+                result = ocr_image_regions(page, render_lock=_fitz_lock)
+                page_output, segments = doc.pages[index]
+                image_output, image_segments = format_image_text(result["text"], index + 1, segments)
+                doc.pages[index] = (page_output + image_output, segments + image_segments)
+            else:
+                doc.pages[index] = format_scanned_page(ocr_page(page, render_lock=_fitz_lock), index + 1)
+        except Exception as e:
+            # Failed before the page is counted, so the last page of a
+            # failed document never sends it on to chunking
+            self._fail(doc, "ocr", e)
+        finally:
+            self._page_done(doc)
+
+    def _page_done(self, doc):
+        with doc.lock:
+            doc.pending -= 1
+            last = doc.pending == 0
+        if last:
+            self._pages_done(doc)
+
+    def _pages_done(self, doc):
+        """All pages of a PDF are extracted: assemble them like unified_pdf_to_text()."""
+        with _fitz_lock:
+            doc.pdf.close()
+        if doc.failed:
+            return
+        doc.text = "".join(page_output for page_output, _ in doc.pages).strip()
+        doc.segments = [segment for _, segments in doc.pages for segment in segments]
+        doc.pages = []
+        self.stages["chunk"].put(doc)
+
+    def _chunk(self, doc):
+        if doc.failed:
+            return
+        doc.chunks = auto_chunk.auto_chunk_for_provider(doc.segments, self.provider)
+        texts = [chunk for chunk, _ in doc.chunks]
+        batches = [texts[start:start + EMBED_BATCH_SIZE] for start in range(0, len(texts), EMBED_BATCH_SIZE)]
+        doc.embeddings = [None] * len(batches)
+        doc.pending = len(batches)
+        if not batches:
+            self.stages["persist"].put(doc)
+        for index, batch in enumerate(batches):
+            self.stages["embed"].put((doc, index, batch))
+
+    def _embed(self, item):
+        doc, index, batch = item
+        try:
+            if not doc.failed:
+                doc.embeddings[index] = embed_chunks(self.provider, batch, self.dimension)
+        finally:
+            with doc.lock:
+                doc.pending -= 1
+                last = doc.pending == 0
+            if last and not doc.failed:
+                self.stages["persist"].put(doc)
+
+    def _persist(self, doc):
+        if doc.failed:
+            return
+        os.makedirs(self.text_dir, exist_ok=True)
+        os.makedirs(self.embeddings_dir, exist_ok=True)
+        text_path = os.path.join(self.text_dir, f"{doc.output_name}.txt")
+        if doc.text is not None:
+            with open(text_path, "w", encoding="utf-8") as f:
+                f.write(doc.text)
+            write_segments(text_path, doc.segments)
+
+        embeddings = [embedding for batch in doc.embeddings for embedding in batch]
+        uploaded_at = self.registry.upload_time(doc.output_name) if self.registry else None
+        embeddings_path = save_embeddings(
+            os.path.join(self.embeddings_dir, f"{doc.output_name}.json"), doc.output_name, doc.chunks,
+            embeddings, self.provider, document_metadata(doc.file_path, uploaded_at)
+        )
+        self._finish(doc, text_path=text_path, embeddings_path=embeddings_path)
+
+    # Bookkeeping
+
+    def _stage_failed(self, stage, item, error):
+        doc = item[0] if isinstance(item, tuple) else item
+        self._fail(doc, stage, error)
+
+    def _fail(self, doc, stage, error):
+        print(f"❌ {stage} failed for {os.path.basename(doc.file_path)}: {error}")
+        doc.failed = True
+        doc.error = f"{stage}: {error}"
+        self._finish(doc)
+
+    def _finish(self, doc, text_path=None, embeddings_path=None):
+        """Report a document once, whether it succeeded or failed."""
+        with doc.lock:
+            if doc.finished:
+                return
+            doc.finished = True
+        result = {
+            "file_path": doc.file_path,
+            "output_name": doc.output_name,
+            "success": not doc.failed,
+            "seconds": time.time() - doc.start,
+            "text": text_path,
+            "embeddings": embeddings_path
+        }
+        if doc.failed:
+            result["error"] = doc.error
+        self._results.put(result)
+
+    def stats(self):
+        """Per-stage utilization and queue depth since run() started."""
+        elapsed = time.time() - self._started_at if self._started_at else 0.0
+        return {name: stage.stats(elapsed) for name, stage in self.stages.items()}
+
+    def format_stats(self):
+        stats = self.stats()
+        parts = [f"{name} {s['workers']}w {s['utilization']:.0%} q={s['queue']}/{self.queue_size}"
+                 for name, s in stats.items()]
+        return " | ".join(parts)
+
+    def print_report(self):
+        """Per-stage table; the busiest stage is the bottleneck."""
+        stats = self.stats()
+        print(f"{'stage':<9}{'workers':>8}{'items':>8}{'util':>7}{'max q':>7}{'mean q':>8}")
+        for name, s in stats.items():
+            print(f"{name:<9}{s['workers']:>8}{s['items']:>8}{s['utilization']:>7.0%}"
+                  f"{s['max_queue']:>7}{s['mean_queue']:>8.1f}")
+        bottleneck = max(stats, key=lambda name: stats[name]["utilization"])
+        print(f"🐢 Bottleneck stage: {bottleneck} ({stats[bottleneck]['utilization']:.0%} busy)")
+
+    def run(self, documents):
+        """
+        Process documents, yielding one result per document as it completes.
+
+        Args:
+            documents (iterable): (file_path, output_name) pairs.
+
+        Yields:
+            dicts with "file_path", "output_name", "success", "seconds",
+            "text" and "embeddings" paths, and "error" on failure.
+        """
+        self._started_at = time.time()
+        for stage in self.stages.values():
+            stage.start()
+
+        submitted = [0]
+        feeding_done = threading.Event()
+
+        def feed():
+            try:
+                for file_path, output_name in documents:
+                    submitted[0] += 1
+                    self.stages["extract"].put(_Document(file_path, output_name))
+            finally:
+                feeding_done.set()
+
+        feeder = threading.Thread(target=feed, name="ingest-feeder", daemon=True)
+        feeder.start()
+
+        completed = 0
+        last_report = time.time()
+        try:
+            while not feeding_done.is_set() or completed < submitted[0]:
+                try:
+                    result = self._results.get(timeout=0.2)
+                except queue.Empty:
+                    result = None
+                if result is not None:
+                    completed += 1
+                    yield result
+                if self.report_interval and time.time() - last_report >= self.report_interval:
+                    print(f"📈 {completed}/{submitted[0]} done | {self.format_stats()}")
+                    last_report = time.time()
+        finally:
+            for stage in self.stages.values():
+                stage.stop()
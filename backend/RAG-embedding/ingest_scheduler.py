@@ -0,0 +1,197 @@
+"""
+Cost-aware scheduling of ingestion jobs
+
+Jobs used to run in arrival order, so one 1,000-page scanned PDF delayed
+every small upload queued behind it. Now every upload gets a cost estimate
+(page count, share of scanned pages, file size) and large PDFs are split
+into page-range work units of bounded cost. Workers take the next unit by:
+
+1. Fair share: the tenant (uploader) served the least work in the last
+   FAIR_SHARE_WINDOW seconds goes first.
+2. Shortest job first within that tenant, with aging: every second a unit
+   waits lowers its score by AGING_FACTOR, so large jobs keep progressing
+   under a stream of small ones. The credit stops growing after
+   MAX_AGING_SECONDS, otherwise the remaining units of an old job would
+   outrank everything that arrived after it.
+
+A small job therefore waits for at most one unit of a large job. Page-range
+units write their text and embeddings to a parts folder; the worker that
+finishes a job's last unit merges them into the document's usual artifacts.
+
+Costs are estimated seconds of processing on one worker; the per-page and
+per-MB rates are rough and only their ratios matter for ordering.
+"""
+
+import os
+import json
+import shutil
+from document_segments import load_segments, write_segments
+
+# Tenant of uploads that do not name one
+DEFAULT_TENANT = "default"
+
+# Estimated seconds per text page (text layer plus OCR of its images)
+TEXT_PAGE_SECONDS = 1.0
+
+# Estimated seconds per scanned page (full-page OCR, possibly at a higher DPI)
+SCANNED_PAGE_SECONDS = 3.0
+
+# Estimated seconds per MB of DOCX/PPTX (dominated by OCR of embedded images)
+SECONDS_PER_MB = 2.0
+
+# Fixed cost of any job or work unit (opening the file, chunking, writing)
+BASE_SECONDS = 0.5
+
+# Pages sampled to estimate the share of scanned pages
+CLASSIFY_SAMPLE_PAGES = 8
+
+# Maximum estimated cost of one work unit; larger PDFs are split into page ranges
+MAX_UNIT_SECONDS = 60.0
+
+# Score reduction per second waited, in estimated seconds
+AGING_FACTOR = 0.5
+
+# Waiting time after which a unit's aging credit stops growing
+MAX_AGING_SECONDS = 120
+
+# Seconds of claim history used for fair sharing between tenants
+FAIR_SHARE_WINDOW = 600
+
+def estimate_cost(file_path):
+    """
+    Estimate the processing cost of a document before processing it.
+
+    Returns:
+        dict with "pages" and "scanned_fraction" (PDFs only, else None),
+        "size" in bytes, "page_seconds" (PDFs only) and total "seconds".
+    """
+    size = os.path.getsize(file_path)
+    if os.path.splitext(file_path)[1].lower() != ".pdf":
+        return {"pages": None, "scanned_fraction": None, "size": size, "page_seconds": None,
+                "seconds": round(BASE_SECONDS + size / (1024 * 1024) * SECONDS_PER_MB, 2)}
+
+    import fitz  # PyMuPDF
+    from PDF.Unified_PDF_To_Text import classify_page
+
+    with fitz.open(file_path) as doc:
+        pages = len(doc)
+        samples = min(pages, CLASSIFY_SAMPLE_PAGES)
+        sample = sorted({index * pages // samples for index in range(samples)}) if samples else []
+        scanned = sum(classify_page(doc.load_page(index).get_text("text")) == "scanned" for index in sample)
+
+    scanned_fraction = scanned / len(sample) if sample else 0.0
+    page_seconds = TEXT_PAGE_SECONDS * (1 - scanned_fraction) + SCANNED_PAGE_SECONDS * scanned_fraction
+    return {"pages": pages, "scanned_fraction": scanned_fraction, "size": size, "page_seconds": page_seconds,
+            "seconds": round(BASE_SECONDS + pages * page_seconds, 2)}
+
+def plan_work_units(estimate, max_unit_seconds=MAX_UNIT_SECONDS):
+    """
+    Split a job into work units of at most max_unit_seconds estimated cost.
+
+    Returns:
+        List of (first_page, last_page, seconds); pages are None for a unit
+        that processes the whole document.
+    """
+    if not estimate["pages"] or estimate["seconds"] <= max_unit_seconds:
+        return [(None, None, estimate["seconds"])]
+    pages_per_unit = max(1, int((max_unit_seconds - BASE_SECONDS) / estimate["page_seconds"]))
+    units = []
+    for first_page in range(1, estimate["pages"] + 1, pages_per_unit):
+        last_page = min(first_page + pages_per_unit - 1, estimate["pages"])
+        seconds = BASE_SECONDS + (last_page - first_page + 1) * estimate["page_seconds"]
+        units.append((first_page, last_page, round(seconds, 2)))
+    return units
+
+def pick_unit(units, served, now):
+    """
+    Choose the next work unit to run.
+
+    Args:
+        units (list): Queued units as dicts with "tenant", "cost", "created_at"
+            and "page_start".
+        served (dict): Estimated seconds claimed per tenant in the fair-share window.
+        now (float): Current time.
+
+    Returns:
+        The chosen unit, or None if units is empty.
+    """
+    if not units:
+        return None
+    oldest = {}
+    for unit in units:
+        oldest[unit["tenant"]] = min(oldest.get(unit["tenant"], unit["created_at"]), unit["created_at"])
+    tenant = min(oldest, key=lambda name: (served.get(name, 0.0), oldest[name]))
+    return min(
+        (unit for unit in units if unit["tenant"] == tenant),
+        key=lambda unit: (unit["cost"] - AGING_FACTOR * min(now - unit["created_at"], MAX_AGING_SECONDS),
+                          unit["created_at"], unit["page_start"] or 0)
+    )
+
+def parts_dir_for(text_dir, doc_id, job_id):
+    """Folder holding the page-range outputs of one job."""
+    return os.path.join(text_dir, ".parts", f"{doc_id}.{job_id}")
+
+def process_page_range(file_path, doc_id, job_id, first_page, last_page, text_dir, uploaded_at=None):
+    """
+    Extract and embed one page range of a PDF into the job's parts folder.
+
+    uploaded_at is the registry's upload time stored with every chunk.
+
+    Returns:
+        True on success, like process_file().
+    """
+    from embedding_config import get_embedding_config
+    from File_entry import document_metadata
+    from PDF.Unified_PDF_To_Text import unified_pdf_to_text
+    from Embedding_C.Text_To_Embeddings import text_to_embeddings
+
+    parts_dir = parts_dir_for(text_dir, doc_id, job_id)
+    print(f"📄 Extracting pages {first_page}-{last_page} of {os.path.basename(file_path)}...")
+    text_path = unified_pdf_to_text(file_path, output_dir=parts_dir, output_name=f"{first_page:06d}-{last_page:06d}",
+                                    page_range=(first_page, last_page))
+
+    config = get_embedding_config()
+    provider_type = config["provider"]
+    text_to_embeddings(text_path, embeddings_dir=parts_dir, provider_type=provider_type, doc_id=doc_id,
+                       metadata=document_metadata(file_path, uploaded_at), **config["providers"][provider_type])
+    return True
+
+def merge_page_ranges(doc_id, job_id, text_dir, embeddings_dir):
+    """
+    Combine a job's page-range outputs into Text_files/<doc_id>.txt, its
+    segments and Embeddings/<doc_id>.json, then remove the parts folder.
+    """
+    parts_dir = parts_dir_for(text_dir, doc_id, job_id)
+    names = sorted(name[:-len(".txt")] for name in os.listdir(parts_dir) if name.endswith(".txt"))
+
+    texts, segments, records = [], [], []
+    for name in names:
+        text_path = os.path.join(parts_dir, f"{name}.txt")
+        with open(text_path, "r", encoding="utf-8") as f:
+            texts.append(f.read())
+        segments.extend(load_segments(text_path) or [])
+        with open(os.path.join(parts_dir, f"{name}.json"), "r", encoding="utf-8") as f:
+            records.extend(json.load(f))
+    for index, record in enumerate(records):
+        record["chunk_index"] = index
+
+    os.makedirs(text_dir, exist_ok=True)
+    os.makedirs(embeddings_dir, exist_ok=True)
+    text_path = os.path.join(text_dir, f"{doc_id}.txt")
+    with open(text_path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(text for text in texts if text))
+    write_segments(text_path, segments)
+
+    embeddings_path = os.path.join(embeddings_dir, f"{doc_id}.json")
+    tmp_path = embeddings_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, embeddings_path)
+
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    try:
+        os.rmdir(os.path.dirname(parts_dir))
+    except OSError:
+        pass  # other jobs still have parts
+    print(f"🧩 Merged {len(names)} page range(s) of {doc_id}: {len(records)} chunks")
+    return embeddings_path
@@ -0,0 +1,270 @@
+"""
+Ingestion worker: claims work units from the shared work queue and processes them
+
+The API server runs one worker thread per process unless it is started with
+--accept-only; more OCR and embedding capacity comes from starting
+standalone workers on the same host, sharing its RAG-embedding folder
+(documents, artifacts, index and queue):
+
+    python RAG-embedding/ingest_worker.py --threads 4
+
+The default "sqlite" queue and the document catalog are a SQLite database,
+whose WAL locking does not work over network filesystems; workers on other
+machines need a network work queue backend (see work_queue.py).
+
+Each thread leases one work unit at a time and renews the lease while it
+works; if a worker dies, its unit is handed to another worker once the
+lease runs out (see work_queue.py). Paths are relative to the backend
+folder, like the API's, so the catalog holds the same paths whichever
+node processed a document.
+"""
+
+import os
+import sys
+import time
+import shutil
+import signal
+import socket
+import argparse
+import threading
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(SCRIPT_DIR)
+
+# Artifact folders, relative to the backend folder as in the API
+TEXT_DIR = os.path.join("RAG-embedding", "Text_files")
+EMBEDDINGS_DIR = os.path.join("RAG-embedding", "Embeddings")
+
+# Seconds between checks for new work when the queue is empty
+POLL_INTERVAL = 1.0
+
+def default_worker_id():
+    """Identifies this process in the work queue"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class IngestWorker:
+    """
+    Processes claimed work units: extract text, embed, merge page ranges and
+    index the document.
+
+    Args:
+        queue: WorkQueue to claim units from and report status to.
+        registry: DocumentRegistry updated with the document's state.
+        text_dir (str): Folder of the extracted text and segments.
+        embeddings_dir (str): Folder of the embeddings and the vector index.
+        get_index: Function returning the vector store; by default the store
+            of embeddings_dir is opened on first use.
+        worker_id (str): Name of this worker in the queue.
+    """
+
+    def __init__(self, queue, registry, text_dir=TEXT_DIR, embeddings_dir=EMBEDDINGS_DIR, get_index=None,
+                 worker_id=None):
+        self.queue = queue
+        self.registry = registry
+        self.text_dir = str(text_dir)
+        self.embeddings_dir = str(embeddings_dir)
+        self.get_index = get_index or self._open_index
+        self.worker_id = worker_id or default_worker_id()
+        # Renew leases well before they run out
+        self.heartbeat_interval = queue.lease_seconds / 3
+
+    def _open_index(self):
+        from embedding_config import get_embedding_config
+        from Embedding_C.sharded_store import get_index_store
+        config = get_embedding_config()
+        return get_index_store(self.embeddings_dir, config.get("vector_store"), config.get("sharding"))
+
+    def run(self, stop_event, wake_event=None, drain=False):
+        """
+        Claim and process units until stop_event is set.
+
+        Args:
+            wake_event: Set when work was queued by this process, to skip the poll wait.
+            drain (bool): Return once no unit is queued or leased.
+        """
+        wake_event = wake_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                unit = self.queue.claim(self.worker_id)
+            except Exception as e:
+                print(f"⚠️ Could not claim a job: {e}")
+                unit = None
+
+            if unit is None:
+                if drain and self.queue.unfinished_count() == 0:
+                    return
+                wake_event.wait(POLL_INTERVAL)
+                wake_event.clear()
+                continue
+
+            self.process(unit)
+
+    def process(self, unit):
+        """Process one claimed unit while renewing its lease"""
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(unit, done), name="lease-heartbeat", daemon=True)
+        heartbeat.start()
+        try:
+            self._process(unit)
+        finally:
+            done.set()
+            heartbeat.join()
+
+    def _heartbeat(self, unit, done):
+        while not done.wait(self.heartbeat_interval):
+            try:
+                if not self.queue.heartbeat(unit["unit_id"], self.worker_id):
+                    print(f"⚠️ Lost the lease on work unit {unit['unit_id']} of job {unit['job_id']}")
+                    return
+            except Exception as e:
+                print(f"⚠️ Heartbeat failed: {e}")
+
+    def _process(self, unit):
+        """
+        A whole-document unit extracts, embeds and indexes the document; a
+        page-range unit writes its part, and the unit that completes the job
+        merges the parts and indexes the document.
+        """
+        from File_entry import process_file
+        from ingest_scheduler import process_page_range, merge_page_ranges
+
+        job_id = unit["job_id"]
+        file_path = unit["file_path"]
+        # All artifacts are named after the stable document ID
+        doc_id = unit["doc_id"]
+        try:
+            # Chunks carry the upload time from the catalog, not the file's mtime
+            uploaded_at = self.registry.upload_time(doc_id)
+            if unit["page_start"] is None:
+                # Update status
+                self.queue.update(job_id, progress=25, message="Processing file (text extraction + embeddings)...")
+                self.registry.update(doc_id, status="processing")
+
+                # Process file (extract text + generate embeddings); re-ingesting the
+                # same document overwrites its previous artifacts in place
+                success = process_file(file_path, generate_embeddings=True, output_base_name=doc_id,
+                                       uploaded_at=uploaded_at)
+                if not success:
+                    self.queue.fail(job_id, "Failed to process file")
+                    self.registry.update(doc_id, status="error")
+                    return
+                if self.queue.complete_unit(unit["unit_id"], self.worker_id) is None:
+                    print(f"⚠️ Work unit {unit['unit_id']} was taken over by another worker")
+                    return
+                self._finish_document(job_id, doc_id)
+                return
+
+            self.registry.update(doc_id, status="processing")
+            process_page_range(file_path, doc_id, job_id, unit["page_start"], unit["page_end"], self.text_dir,
+                               uploaded_at=uploaded_at)
+            counts = self.queue.complete_unit(unit["unit_id"], self.worker_id)
+            if self.queue.get(job_id)["status"] == "error":
+                # Another unit of this job failed; its parts are discarded
+                self._discard_parts(doc_id, job_id)
+                return
+            if counts is None:
+                print(f"⚠️ Work unit {unit['unit_id']} was taken over by another worker")
+                return
+            done, total = counts
+            if done < total:
+                self.queue.update(job_id, progress=int(90 * done / total),
+                                  message=f"Processed {done} of {total} page ranges "
+                                          f"(pages {unit['page_start']}-{unit['page_end']})")
+                return
+
+            self.queue.update(job_id, progress=90, message="Merging page ranges...")
+            merge_page_ranges(doc_id, job_id, self.text_dir, self.embeddings_dir)
+            self._finish_document(job_id, doc_id)
+
+        except Exception as e:
+            self.queue.fail(job_id, f"Processing failed: {str(e)}")
+            self.registry.update(doc_id, status="error")
+            if unit["page_start"] is not None:
+                self._discard_parts(doc_id, job_id)
+
+    def _discard_parts(self, doc_id, job_id):
+        from ingest_scheduler import parts_dir_for
+        shutil.rmtree(parts_dir_for(self.text_dir, doc_id, job_id), ignore_errors=True)
+
+    def _finish_document(self, job_id, doc_id):
+        """Check a processed document's artifacts and make its chunks searchable"""
+        from document_registry import artifact_paths
+
+        # Verify output files were created under the document ID
+        artifacts = artifact_paths(doc_id, self.text_dir, self.embeddings_dir)
+        text_file_path = artifacts["text_path"]
+        embeddings_path = artifacts["embeddings_path"]
+
+        if not os.path.exists(text_file_path):
+            self.queue.fail(job_id, "Text file not found after processing")
+            self.registry.update(doc_id, status="error")
+            return
+
+        if not os.path.exists(embeddings_path):
+            self.queue.fail(job_id, "Embeddings file not found after processing")
+            self.registry.update(doc_id, status="error", text_path=text_file_path)
+            return
+
+        # Make the new chunks searchable (replaces any earlier version); the API
+        # processes see the new segment on their next index refresh
+        self.get_index().add_embeddings_file(doc_id, embeddings_path)
+
+        # Success
+        self.queue.update(
+            job_id, status="completed", progress=100, message="Processing completed successfully",
+            text_file=text_file_path, embeddings_file=embeddings_path
+        )
+        self.registry.update(
+            doc_id, status="completed",
+            **{key: path for key, path in artifacts.items() if os.path.exists(path)}
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Process queued ingestion work units")
+    parser.add_argument("--threads", type=int, default=1, help="Work units processed at once by this process")
+    parser.add_argument("--worker-id", default=None, help="Name in the work queue (default host:pid)")
+    parser.add_argument("--db", default=None, help="SQLite database of the queue and the document registry")
+    parser.add_argument("--lease-seconds", type=float, default=None,
+                        help="Lease length; other workers take over a unit this long after a worker dies")
+    parser.add_argument("--drain", action="store_true", help="Exit once no work is queued or leased")
+    args = parser.parse_args()
+
+    # Same relative paths as the API server
+    os.chdir(BACKEND_DIR)
+    from embedding_config import get_embedding_config
+    from document_registry import get_document_registry, DEFAULT_DB_PATH
+    from work_queue import get_work_queue
+
+    queue_config = dict(get_embedding_config().get("work_queue", {}))
+    if args.db and queue_config.get("backend", "sqlite") == "sqlite":
+        queue_config["db_path"] = args.db
+    if args.lease_seconds:
+        queue_config["lease_seconds"] = args.lease_seconds
+    queue = get_work_queue(**queue_config)
+    registry = get_document_registry(args.db or DEFAULT_DB_PATH)
+
+    worker_id = args.worker_id or default_worker_id()
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    workers = [IngestWorker(queue, registry, worker_id=f"{worker_id}/{n}" if args.threads > 1 else worker_id)
+               for n in range(args.threads)]
+    threads = [threading.Thread(target=worker.run, args=(stop, None, args.drain), name=f"ingest-{n}")
+               for n, worker in enumerate(workers)]
+    print(f"🏭 Ingestion worker {worker_id}: {args.threads} thread(s), lease {queue.lease_seconds:.0f}s")
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        print("⏹️ Stopping after the current work units...")
+        stop.set()
+        for thread in threads:
+            thread.join()
+    print(f"👋 Worker {worker_id} stopped after {time.time() - start:.0f}s")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+"""
+Processing jobs shared by all API worker processes
+
+Uploads are queued here instead of being processed by the worker that
+received them, and their status lives here instead of in a per-process
+dict. Any worker can pick up a queued job, and any worker can answer a
+status request for it. The table sits in the same SQLite database as the
+document registry (WAL mode, so readers never wait for writers).
+
+Workers claim work units rather than whole jobs: a job is one unit, or
+several page ranges for a large PDF. The next unit is chosen by fair share
+between tenants and estimated cost (see ingest_scheduler.py). Claims are
+leases kept alive by heartbeats (see work_queue.py); this is the "sqlite"
+work queue backend, for the API and workers on one host. SQLite's WAL mode
+needs shared memory between the processes, which a network filesystem
+(NFS, SMB) cannot provide, so a database on one is refused.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from document_registry import DEFAULT_DB_PATH
+from ingest_scheduler import DEFAULT_TENANT, FAIR_SHARE_WINDOW, pick_unit
+from work_queue import WorkQueue, LEASE_SECONDS, MAX_ATTEMPTS
+
+# Columns returned by the status endpoint
+STATUS_FIELDS = ("status", "filename", "safe_filename", "doc_id", "progress", "message",
+                 "text_file", "embeddings_file", "tenant", "estimated_seconds")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id          TEXT PRIMARY KEY,
+    doc_id          TEXT NOT NULL,
+    file_path       TEXT NOT NULL,
+    filename        TEXT NOT NULL,
+    safe_filename   TEXT NOT NULL,
+    status          TEXT NOT NULL DEFAULT 'uploaded',
+    progress        INTEGER NOT NULL DEFAULT 0,
+    message         TEXT,
+    text_file       TEXT,
+    embeddings_file TEXT,
+    claimed_by      TEXT,
+    created_at      REAL NOT NULL,
+    updated_at      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS work_units (
+    unit_id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id          TEXT NOT NULL,
+    tenant          TEXT NOT NULL,
+    page_start      INTEGER,
+    page_end        INTEGER,
+    cost            REAL NOT NULL DEFAULT 0,
+    status          TEXT NOT NULL DEFAULT 'queued',
+    claimed_by      TEXT,
+    claimed_at      REAL,
+    created_at      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_work_units_status ON work_units (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_work_units_job ON work_units (job_id);
+CREATE INDEX IF NOT EXISTS idx_work_units_claimed ON work_units (claimed_at);
+"""
+
+# Columns added after the first release of the schema
+_ADDED_COLUMNS = {
+    "tenant": f"TEXT NOT NULL DEFAULT '{DEFAULT_TENANT}'",
+    "estimated_seconds": "REAL"
+}
+
+# Work unit columns added after the first release of the schema
+_ADDED_UNIT_COLUMNS = {
+    "lease_expires": "REAL",
+    "attempts": "INTEGER NOT NULL DEFAULT 0"
+}
+
+# Oldest queued units considered per claim
+CLAIM_CANDIDATES = 1000
+
+# Mount types (from /proc/mounts) whose locking SQLite cannot rely on
+NETWORK_FILESYSTEMS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "afs", "ceph", "glusterfs", "lustre",
+                       "fuse.sshfs", "fuse.glusterfs", "fuse.cephfs"}
+
+# GetDriveTypeW() result of a mapped network drive
+_DRIVE_REMOTE = 4
+
+def network_filesystem(path, mounts_file="/proc/mounts"):
+    """
+    Type of the network filesystem holding path, or None for a local disk
+    (or when it cannot be told, e.g. on macOS).
+    """
+    path = os.path.realpath(os.path.abspath(path))
+    if os.name == "nt":
+        drive = os.path.splitdrive(path)[0]
+        if drive.startswith("\\\\"):
+            return "smb"
+        import ctypes
+        return "network drive" if ctypes.windll.kernel32.GetDriveTypeW(drive + "\\") == _DRIVE_REMOTE else None
+
+    try:
+        with open(mounts_file, "r", encoding="utf-8") as f:
+            mounts = [line.split()[1:3] for line in f if len(line.split()) >= 3]
+    except OSError:
+        return None
+    # The longest mount point containing the path is the one it lives on
+    best, best_type = "", None
+    for mount_point, fs_type in mounts:
+        mount_point = mount_point.replace("\\040", " ")
+        inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+        if inside and len(mount_point) > len(best):
+            best, best_type = mount_point, fs_type
+    return best_type if best_type in NETWORK_FILESYSTEMS else None
+
+class JobStore(WorkQueue):
+    """SQLite-backed job queue and status store, safe across threads and processes"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, lease_seconds=LEASE_SECONDS):
+        fs_type = network_filesystem(os.path.dirname(os.path.abspath(db_path)))
+        if fs_type:
+            raise RuntimeError(
+                f"The sqlite work queue is for one host, but {db_path} is on a network filesystem ({fs_type}): "
+                f"SQLite's WAL locking does not work there. Keep the database on a local disk and run the "
+                f"workers on that host, or use a network work queue backend (see work_queue.QUEUE_BACKENDS)."
+            )
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in _ADDED_COLUMNS.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(work_units)")}
+            for column, column_type in _ADDED_UNIT_COLUMNS.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE work_units ADD COLUMN {column} {column_type}")
+            # Jobs queued before work units existed become one unit each
+            self._conn.execute(
+                """INSERT INTO work_units (job_id, tenant, created_at)
+                   SELECT job_id, tenant, created_at FROM jobs
+                   WHERE status = 'uploaded' AND job_id NOT IN (SELECT job_id FROM work_units)"""
+            )
+
+    def enqueue(self, job_id, doc_id, file_path, filename, safe_filename, message="Queued for processing",
+                tenant=DEFAULT_TENANT, units=None, estimated_seconds=None):
+        """
+        Add a job in the "uploaded" state with its work units.
+
+        Args:
+            tenant (str): Uploader the job is fair-shared under.
+            units (list): (first_page, last_page, seconds) from
+                ingest_scheduler.plan_work_units(); default one whole-document
+                unit of estimated_seconds.
+            estimated_seconds (float): Estimated cost of the whole job.
+        """
+        now = time.time()
+        units = units or [(None, None, estimated_seconds or 0.0)]
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT INTO jobs
+                   (job_id, doc_id, file_path, filename, safe_filename, message, tenant, estimated_seconds,
+                    created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (job_id, doc_id, file_path, filename, safe_filename, message, tenant, estimated_seconds, now, now)
+            )
+            self._conn.executemany(
+                """INSERT INTO work_units (job_id, tenant, page_start, page_end, cost, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                [(job_id, tenant, first_page, last_page, cost, now) for first_page, last_page, cost in units]
+            )
+
+    def claim(self, worker_id):
+        """
+        Lease the next work unit by fair share and estimated cost, and mark it
+        (and its job) as processing. Units whose lease expired are queued
+        again first.
+
+        Returns:
+            The unit's job as a dict plus "unit_id", "page_start", "page_end",
+            "unit_cost" and "unit_count", or None if nothing is queued. A unit
+            is leased to one worker at a time, even across processes.
+        """
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so two workers
+            # can never select the same unit
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._release_expired_leases(now)
+                units = [dict(row) for row in self._conn.execute(
+                    "SELECT * FROM work_units WHERE status = 'queued' ORDER BY created_at LIMIT ?",
+                    (CLAIM_CANDIDATES,)
+                )]
+                served = dict(self._conn.execute(
+                    "SELECT tenant, SUM(cost) FROM work_units WHERE claimed_at >= ? GROUP BY tenant",
+                    (now - FAIR_SHARE_WINDOW,)
+                ).fetchall())
+                unit = pick_unit(units, served, now)
+                job = None
+                if unit is not None:
+                    self._conn.execute(
+                        """UPDATE work_units SET status = 'processing', claimed_by = ?, claimed_at = ?,
+                           lease_expires = ?, attempts = attempts + 1 WHERE unit_id = ?""",
+                        (worker_id, now, now + self.lease_seconds, unit["unit_id"])
+                    )
+                    self._conn.execute(
+                        """UPDATE jobs SET status = 'processing', claimed_by = ?, updated_at = ?
+                           WHERE job_id = ? AND status IN ('uploaded', 'processing')""",
+                        (worker_id, now, unit["job_id"])
+                    )
+                    job = dict(self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (unit["job_id"],)).fetchone())
+                    job["unit_count"] = self._conn.execute(
+                        "SELECT COUNT(*) FROM work_units WHERE job_id = ?", (unit["job_id"],)
+                    ).fetchone()[0]
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        if unit is None:
+            return None
+        return dict(job, unit_id=unit["unit_id"], page_start=unit["page_start"], page_end=unit["page_end"],
+                    unit_cost=unit["cost"])
+
+    def _release_expired_leases(self, now):
+        """Queue units of workers that stopped sending heartbeats; fail those that keep losing them."""
+        expired = self._conn.execute(
+            "SELECT unit_id, job_id, claimed_by, attempts FROM work_units WHERE status = 'processing' AND lease_expires < ?",
+            (now,)
+        ).fetchall()
+        for unit in expired:
+            if unit["attempts"] >= MAX_ATTEMPTS:
+                print(f"❌ Giving up on work unit {unit['unit_id']} of job {unit['job_id']} after {unit['attempts']} lost leases")
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'error', message = ?, updated_at = ? WHERE job_id = ?",
+                    (f"Worker lost {unit['attempts']} times while processing", now, unit["job_id"])
+                )
+                self._conn.execute(
+                    "UPDATE work_units SET status = 'cancelled' WHERE job_id = ? AND status IN ('queued', 'processing')",
+                    (unit["job_id"],)
+                )
+            else:
+                print(f"♻️ Lease of {unit['claimed_by']} on work unit {unit['unit_id']} expired, queueing it again")
+                self._conn.execute(
+                    "UPDATE work_units SET status = 'queued', claimed_by = NULL, lease_expires = NULL WHERE unit_id = ?",
+                    (unit["unit_id"],)
+                )
+
+    def heartbeat(self, unit_id, worker_id):
+        """
+        Extend a worker's lease on a unit.
+
+        Returns:
+            False if the lease was lost (the unit may be running elsewhere).
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """UPDATE work_units SET lease_expires = ?
+                   WHERE unit_id = ? AND claimed_by = ? AND status = 'processing'""",
+                (time.time() + self.lease_seconds, unit_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def complete_unit(self, unit_id, worker_id=None):
+        """
+        Mark a leased work unit as done.
+
+        Returns:
+            (done, total) units of its job, done == total meaning this was the
+            job's last unit; None if worker_id no longer holds the lease.
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """UPDATE work_units SET status = 'done', lease_expires = NULL
+                   WHERE unit_id = ? AND status = 'processing' AND claimed_by = COALESCE(?, claimed_by)""",
+                (unit_id, worker_id)
+            )
+            if cursor.rowcount == 0:
+                return None
+            done, total = self._conn.execute(
+                """SELECT SUM(status = 'done'), COUNT(*) FROM work_units
+                   WHERE job_id = (SELECT job_id FROM work_units WHERE unit_id = ?)""",
+                (unit_id,)
+            ).fetchone()
+        return done, total
+
+    def fail(self, job_id, message):
+        """Mark a job as failed and cancel its unfinished units; workers still on one see their lease lost."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'error', message = ?, updated_at = ? WHERE job_id = ?",
+                (message, now, job_id)
+            )
+            self._conn.execute(
+                "UPDATE work_units SET status = 'cancelled' WHERE job_id = ? AND status IN ('queued', 'processing')",
+                (job_id,)
+            )
+
+    def update(self, job_id, **fields):
+        """Update status columns of a job, e.g. status, progress or message."""
+        if not fields:
+            return
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE job_id = ?",
+                (*fields.values(), job_id)
+            )
+
+    def get(self, job_id):
+        """Job row as a dict, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def status(self, job_id):
+        """The status fields of a job as reported by the API, or None."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        return {field: job[field] for field in STATUS_FIELDS if job[field] is not None}
+
+    def pending_count(self):
+        """Number of work units waiting for a worker."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM work_units WHERE status = 'queued'").fetchone()[0]
+
+    def unfinished_count(self):
+        """Number of work units queued or leased."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM work_units WHERE status IN ('queued', 'processing')"
+            ).fetchone()[0]
+
+_job_store = None
+
+def get_job_store(db_path=DEFAULT_DB_PATH, lease_seconds=LEASE_SECONDS):
+    """Shared job store instance for this process."""
+    global _job_store
+    if _job_store is None:
+        _job_store = JobStore(db_path, lease_seconds)
+    return _job_store
@@ -0,0 +1,135 @@
+"""
+Serve one shard of the vector index over HTTP
+
+Every shard is a regular VectorStore in Embeddings/shards/<shard>-of-<count>/
+holding the documents with shard_for(doc_id, count) == shard (see
+Embedding_C/sharded_store.py). Start one process per shard, on this host
+or others, and list their URLs in the "sharding" section of
+embedding_config.py, in shard order:
+
+    python RAG-embedding/shard_server.py --shard 0 --shards 2 --port 8101 --sync
+    python RAG-embedding/shard_server.py --shard 1 --shards 2 --port 8102 --sync
+
+--sync indexes the shard's documents from Embeddings/*.json that are not
+in it yet, e.g. when moving an existing corpus to shards.
+"""
+
+import os
+import argparse
+from typing import Optional
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+EMBEDDINGS_DIR = os.path.join(SCRIPT_DIR, "Embeddings")
+
+# Documents per segment written by --sync
+SYNC_BATCH_DOCUMENTS = 256
+
+class SearchRequest(BaseModel):
+    vector: list
+    k: int = 5
+    filters: Optional[dict] = None
+
+class DocumentRequest(BaseModel):
+    records: list
+
+def shard_index_dir(embeddings_dir, shard, num_shards):
+    """Index folder of one shard."""
+    return os.path.join(embeddings_dir, "shards", f"{shard}-of-{num_shards}")
+
+def sync_shard(store, embeddings_dir, shard, num_shards):
+    """Index the shard's documents from Embeddings/*.json that are not in the store yet."""
+    from Embedding_C.projection import iter_embeddings_files
+    from Embedding_C.sharded_store import shard_for
+
+    batch, added = [], 0
+    for doc_id, records, vectors in iter_embeddings_files(embeddings_dir):
+        if shard_for(doc_id, num_shards) != shard or store.contains(doc_id):
+            continue
+        batch.append((doc_id, records, vectors))
+        if len(batch) >= SYNC_BATCH_DOCUMENTS:
+            store.add_documents(batch)
+            added += len(batch)
+            batch = []
+    if batch:
+        store.add_documents(batch)
+        added += len(batch)
+    return added
+
+def create_shard_app(shard, num_shards, embeddings_dir=EMBEDDINGS_DIR, quantization=None):
+    """FastAPI app serving one shard's VectorStore."""
+    from Embedding_C.vector_store import VectorStore
+    from Embedding_C.sharded_store import shard_for
+
+    store = VectorStore(shard_index_dir(embeddings_dir, shard, num_shards), quantization)
+    app = FastAPI(title=f"RAG index shard {shard} of {num_shards}")
+
+    @app.on_event("startup")
+    async def start_maintenance():
+        store.start_background_maintenance()
+
+    @app.on_event("shutdown")
+    async def stop_maintenance():
+        store.stop_background_maintenance()
+
+    # Plain def endpoints run in FastAPI's threadpool, so searches run in parallel
+    @app.post("/search")
+    def search(request: SearchRequest):
+        try:
+            return {"shard": shard, "results": store.search(request.vector, request.k, request.filters)}
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    @app.put("/documents/{doc_id}")
+    def add_document(doc_id: str, request: DocumentRequest):
+        if shard_for(doc_id, num_shards) != shard:
+            raise HTTPException(status_code=409, detail=f"{doc_id} belongs to shard {shard_for(doc_id, num_shards)}")
+        try:
+            store.add_document(doc_id, request.records, [record["embedding"] for record in request.records])
+        except (KeyError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"shard": shard, "doc_id": doc_id, "chunks": len(request.records)}
+
+    @app.delete("/documents/{doc_id}")
+    def delete_document(doc_id: str):
+        store.delete_document(doc_id)
+        return {"shard": shard, "doc_id": doc_id}
+
+    @app.get("/documents/{doc_id}")
+    def contains(doc_id: str):
+        return {"shard": shard, "doc_id": doc_id, "contains": store.contains(doc_id)}
+
+    @app.get("/stats")
+    def stats():
+        return dict(store.stats(), shard=shard, num_shards=num_shards)
+
+    app.state.store = store
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve one shard of the vector index")
+    parser.add_argument("--shard", type=int, required=True, help="Shard number, from 0")
+    parser.add_argument("--shards", type=int, required=True, help="Total number of shards")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--embeddings-dir", default=EMBEDDINGS_DIR)
+    parser.add_argument("--sync", action="store_true", help="Index this shard's documents from Embeddings/*.json first")
+    args = parser.parse_args()
+    if not 0 <= args.shard < args.shards:
+        parser.error("--shard must be between 0 and --shards - 1")
+
+    import uvicorn
+    from embedding_config import get_embedding_config
+
+    quantization = get_embedding_config().get("vector_store", {}).get("quantization")
+    app = create_shard_app(args.shard, args.shards, args.embeddings_dir, quantization)
+    if args.sync:
+        added = sync_shard(app.state.store, args.embeddings_dir, args.shard, args.shards)
+        print(f"📥 Indexed {added} document(s) into shard {args.shard}")
+    print(f"🧩 Shard {args.shard} of {args.shards}: {app.state.store.stats()['vectors']} vectors, "
+          f"serving on port {args.port}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
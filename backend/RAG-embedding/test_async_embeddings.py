@@ -0,0 +1,212 @@
+"""
+Check concurrent remote embedding (aembed_batch) against a local OpenAI-compatible stub server
+"""
+
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from Embedding_C.embedding_providers import get_embedding_provider
+from Embedding_C.Text_To_Embeddings import _aembed_chunks
+
+# Simulated network latency per request, in seconds
+LATENCY = 0.1
+
+def _stub_embedding(text):
+    """[N, len(text)] for "text N"; other texts get their word count as N"""
+    words = text.split()
+    try:
+        number = float(words[-1])
+    except (IndexError, ValueError):
+        number = float(len(words))
+    return [number, float(len(text))]
+
+class StubEmbeddingServer:
+    """
+    OpenAI-style /v1/embeddings endpoint that embeds "text N" as [N, len(text)]
+
+    latency is in seconds, or a function of the request number; requests
+    fail with HTTP 500 while status is set to 500 (or a function of the
+    request body returns 500). Request bodies are kept
+    in bodies, and a "dimensions" field shortens the returned vectors.
+    """
+
+    def __init__(self, latency=LATENCY):
+        self.latency = latency
+        self.status = 200
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+        self.bodies = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub._lock:
+                    number = stub.requests
+                    stub.requests += 1
+                    stub.bodies.append(body)
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                time.sleep(stub.latency(number) if callable(stub.latency) else stub.latency)
+                with stub._lock:
+                    stub.in_flight -= 1
+                status = stub.status(body) if callable(stub.status) else stub.status
+                if status != 200:
+                    self.send_error(status)
+                    return
+                # Items come back out of order; clients must sort by index
+                data = [{"index": i, "embedding": _stub_embedding(text)[:body.get("dimensions")]}
+                        for i, text in enumerate(body["input"])][::-1]
+                payload = json.dumps({"data": data}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/embeddings"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def _provider(url, max_in_flight):
+    return get_embedding_provider("openai", api_key="test", base_url=url,
+                                  max_in_flight=max_in_flight, request_batch_size=4)
+
+def test_aembed_batch_concurrency():
+    """Requests overlap up to max_in_flight and results keep input order"""
+    print("🧪 TESTING CONCURRENT REMOTE EMBEDDING")
+    print("=" * 50)
+    texts = [f"text {i}" for i in range(64)]
+    stub = StubEmbeddingServer()
+    try:
+        sequential = _provider(stub.url, 1)
+        start = time.perf_counter()
+        expected = asyncio.run(sequential.aembed_batch(texts))
+        sequential_seconds = time.perf_counter() - start
+        assert stub.max_in_flight == 1
+
+        concurrent = _provider(stub.url, 4)
+        stub.max_in_flight = 0
+        start = time.perf_counter()
+        embeddings = asyncio.run(concurrent.aembed_batch(texts))
+        concurrent_seconds = time.perf_counter() - start
+    finally:
+        stub.close()
+
+    print(f"1 in flight: {sequential_seconds:.2f}s, 4 in flight: {concurrent_seconds:.2f}s "
+          f"(peak {stub.max_in_flight} concurrent requests)")
+    assert [embedding[0] for embedding in embeddings] == list(range(64))
+    assert embeddings == expected
+    assert stub.max_in_flight == 4
+    assert concurrent_seconds < sequential_seconds / 2
+    print("✅ Requests overlap and chunk order is preserved")
+
+def test_event_loop_not_blocked():
+    """Other coroutines keep running while embedding requests are in flight"""
+    stub = StubEmbeddingServer()
+    provider = _provider(stub.url, 2)
+    ticks = []
+
+    async def ticker(done):
+        while not done.is_set():
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.01)
+
+    async def main():
+        done = asyncio.Event()
+        task = asyncio.create_task(ticker(done))
+        embeddings = await provider.aembed_batch([f"text {i}" for i in range(16)])
+        done.set()
+        await task
+        return embeddings
+
+    try:
+        embeddings = asyncio.run(main())
+    finally:
+        stub.close()
+
+    longest_gap = max(b - a for a, b in zip(ticks, ticks[1:]))
+    print(f"Longest event-loop stall while embedding: {longest_gap * 1000:.0f} ms")
+    assert len(embeddings) == 16
+    assert longest_gap < LATENCY / 2
+    print("✅ Event loop stays responsive")
+
+def test_failed_request_retried_alone():
+    """A failed concurrent request re-embeds only its own chunks"""
+    texts = [f"text {i}" for i in range(64)]
+    failures = []
+
+    def fail_once(body):
+        if "text 5" in body["input"] and not failures:
+            failures.append(body["input"])
+            return 500
+        return 200
+
+    stub = StubEmbeddingServer(latency=0.01)
+    stub.status = fail_once
+    try:
+        embeddings = asyncio.run(_aembed_chunks(_provider(stub.url, 4), texts, 2))
+    finally:
+        stub.close()
+
+    assert [embedding[0] for embedding in embeddings] == list(range(64))
+    # 16 concurrent requests, then one retry of the failed request's 4 chunks
+    assert stub.requests == 17
+    assert stub.bodies[-1]["input"] == failures[0] == texts[4:8]
+    print("✅ Only the failed request is retried")
+
+    # Without return_exceptions the first error is raised
+    stub = StubEmbeddingServer(latency=0)
+    stub.status = 500
+    try:
+        asyncio.run(_provider(stub.url, 4).aembed_batch(texts[:8]))
+        raise AssertionError("failed request not raised")
+    except Exception as e:
+        assert "500" in str(e)
+    finally:
+        stub.close()
+
+def test_openai_dimensions_request():
+    """dimensions is sent with every request of a text-embedding-3 model, and only when set"""
+    stub = StubEmbeddingServer(latency=0)
+    try:
+        shortened = get_embedding_provider("openai", api_key="test", base_url=stub.url,
+                                           model="text-embedding-3-large", dimensions=1, request_batch_size=4)
+        assert shortened.get_dimension() == 1
+        assert shortened.embed_batch(["text 7"]) == [[7.0]]
+        embeddings = asyncio.run(shortened.aembed_batch([f"text {i}" for i in range(10)]))
+        assert embeddings == [[float(i)] for i in range(10)]
+        assert len(stub.bodies) == 4
+        assert all(body["model"] == "text-embedding-3-large" and body["dimensions"] == 1 for body in stub.bodies)
+
+        stub.bodies.clear()
+        full = get_embedding_provider("openai", api_key="test", base_url=stub.url)
+        assert full.get_dimension() == 1536
+        assert full.embed_batch(["text 7"]) == [[7.0, 6.0]]
+        assert stub.bodies == [{"input": ["text 7"], "model": "text-embedding-3-small"}]
+    finally:
+        stub.close()
+
+    try:
+        get_embedding_provider("openai", api_key="test", model="text-embedding-ada-002", dimensions=256)
+        raise AssertionError("ada-002 accepted dimensions")
+    except ValueError:
+        pass
+    print("✅ dimensions is sent to the embeddings endpoint")
+
+if __name__ == "__main__":
+    test_aembed_batch_concurrency()
+    test_event_loop_not_blocked()
+    test_failed_request_retried_alone()
+    test_openai_dimensions_request()
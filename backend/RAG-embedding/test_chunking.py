@@ -0,0 +1,99 @@
+"""
+Check token-budget chunking: max tokens, sentence overlap and page/slide boundaries
+"""
+
+from Embedding_C.auto_chunk import split_long_sentence, token_chunk_text, chunk_segments
+from Embedding_C.embedding_providers import DummyEmbeddingProvider
+
+count_tokens = DummyEmbeddingProvider().count_tokens
+
+def _sentences(count, words=8):
+    return [" ".join(f"s{index}w{word}" for word in range(words)) + "." for index in range(count)]
+
+def test_chunks_respect_max_tokens():
+    """No chunk exceeds the budget and every sentence is kept, in order"""
+    print("🧪 TESTING TOKEN-BUDGET CHUNKING")
+    print("=" * 50)
+    sentences = _sentences(40)
+    chunks = token_chunk_text(" ".join(sentences), count_tokens, max_tokens=50, overlap_ratio=0)
+    print(f"{len(sentences)} sentences -> {len(chunks)} chunks")
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 50 for chunk in chunks)
+    # Without overlap the chunks are the text, split between sentences
+    assert " ".join(chunks) == " ".join(sentences)
+    print("✅ Chunks fit the token budget")
+
+def test_overlap_is_whole_sentences():
+    """Each chunk starts with the last whole sentences of the previous one, within the overlap budget"""
+    sentences = _sentences(30)
+    chunks = token_chunk_text(" ".join(sentences), count_tokens, max_tokens=60, overlap_ratio=0.3)
+    assert all(count_tokens(chunk) <= 60 for chunk in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        carried = [sentence for sentence in sentences if sentence in previous and sentence in chunk]
+        assert carried, "no overlap between consecutive chunks"
+        # Overlap is a suffix of the previous chunk made of whole sentences
+        assert previous.endswith(" ".join(carried)) and chunk.startswith(" ".join(carried))
+        assert count_tokens(" ".join(carried)) <= int(60 * 0.3)
+    covered = set(sentence for chunk in chunks for sentence in sentences if sentence in chunk)
+    assert covered == set(sentences)
+    print("✅ Overlap carries whole trailing sentences")
+
+def test_long_run_split_in_linear_time():
+    """An unpunctuated run is cut on words without re-tokenizing every prefix"""
+    words = [f"cell{index}" for index in range(2000)]
+    calls = []
+
+    def counting(text):
+        calls.append(text)
+        return count_tokens(text)
+
+    text = " ".join(words)
+    pieces = split_long_sentence(text, counting, max_tokens=100)
+    tokenized = sum(len(call) for call in calls)
+    print(f"{len(words)} words -> {len(pieces)} pieces; tokenized {tokenized} chars of a {len(text)}-char run")
+    assert " ".join(pieces).split() == words
+    assert all(count_tokens(piece) <= 100 for piece in pieces)
+    # Each word and each piece once, not every growing prefix
+    assert tokenized <= 3 * len(text)
+
+    # A tokenizer whose joined count exceeds the per-word sum still gets pieces that fit
+    def separator_costs(text):
+        return 2 * len(text.split()) - 1
+
+    pieces = split_long_sentence(" ".join(words[:300]), separator_costs, max_tokens=21)
+    assert " ".join(pieces).split() == words[:300]
+    assert all(separator_costs(piece) <= 21 for piece in pieces)
+    assert all(len(piece.split()) == 11 for piece in pieces[:-1])
+    print("✅ Long runs split without re-counting every prefix")
+
+def test_segments_keep_page_and_slide_boundaries():
+    """Chunks never mix pages or slides and carry the page/slide they came from"""
+    segments = [
+        {"type": "text", "text": "Intro on page one.", "page": 1, "slide": None},
+        {"type": "table", "text": "a\tb\nc\td", "page": 1, "slide": None},
+        {"type": "text", "text": "Page two text.", "page": 2, "slide": None},
+        {"type": "text", "text": "Slide text.", "page": None, "slide": 3},
+        {"type": "table", "text": "\n".join(f"row{index}\tvalue{index}" for index in range(60)), "page": 4, "slide": None}
+    ]
+    chunks = chunk_segments(segments, count_tokens, max_tokens=40)
+    for text, metadata in chunks:
+        print(f"page={metadata['page']} slide={metadata['slide']} types={metadata['segment_types']}: {text[:30]!r}")
+        assert count_tokens(text) <= 40
+
+    assert chunks[0] == ("Intro on page one.\na\tb\nc\td", {"page": 1, "slide": None, "segment_types": ["table", "text"]})
+    assert chunks[1][0] == "Page two text." and chunks[1][1]["page"] == 2
+    assert chunks[2][0] == "Slide text." and chunks[2][1] == {"page": None, "slide": 3, "segment_types": ["text"]}
+
+    # The oversized table is split on row boundaries, all on page 4
+    table_chunks = chunks[3:]
+    assert len(table_chunks) > 1
+    assert all(metadata["page"] == 4 for _, metadata in table_chunks)
+    rows = [row for text, _ in table_chunks for row in text.split("\n")]
+    assert rows == segments[-1]["text"].split("\n")
+    print("✅ Page and slide boundaries are kept")
+
+if __name__ == "__main__":
+    test_chunks_respect_max_tokens()
+    test_overlap_is_whole_sentences()
+    test_long_run_split_in_linear_time()
+    test_segments_keep_page_and_slide_boundaries()
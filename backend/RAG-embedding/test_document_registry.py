@@ -0,0 +1,202 @@
+"""
+Check the SQLite document catalog: listing, filters, deletes, directory sync and stable doc IDs
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+from document_registry import DocumentRegistry, doc_id_for, artifact_paths
+
+def _registry(work_dir):
+    return DocumentRegistry(os.path.join(work_dir, "documents.db"))
+
+def test_list_filter_sort_and_page():
+    """list_documents filters, sorts and pages in SQL and reports the total"""
+    print("🧪 TESTING DOCUMENT CATALOG")
+    print("=" * 50)
+    work_dir = tempfile.mkdtemp()
+    try:
+        registry = _registry(work_dir)
+        for index, name in enumerate(["alpha.pdf", "beta.docx", "gamma.pdf", "delta.pptx", "alpha_notes.pdf"]):
+            stem, ext = os.path.splitext(name)
+            doc_id = f"{stem}_{index:08x}"
+            registry.register(doc_id, name, doc_id + ext, os.path.join(work_dir, doc_id + ext),
+                              size=100 * (index + 1), uploaded_at=1000.0 + index)
+        registry.update("beta_00000001", status="completed", chunk_count=4)
+
+        rows, total = registry.list_documents()
+        assert total == 5
+        assert [row["filename"] for row in rows] == ["alpha_notes.pdf", "delta.pptx", "gamma.pdf", "beta.docx", "alpha.pdf"]
+
+        rows, total = registry.list_documents(offset=1, limit=2, sort_by="size", descending=False)
+        assert total == 5 and [row["size"] for row in rows] == [200, 300]
+
+        rows, total = registry.list_documents(file_type=".PDF")
+        assert total == 3 and {row["file_type"] for row in rows} == {"pdf"}
+
+        rows, total = registry.list_documents(search="alpha")
+        assert total == 2
+
+        rows, total = registry.list_documents(status="completed")
+        assert total == 1 and rows[0]["doc_id"] == "beta_00000001" and rows[0]["chunk_count"] == 4
+
+        try:
+            registry.list_documents(sort_by="source_path; DROP TABLE documents")
+            raise AssertionError("unsorted column accepted")
+        except ValueError:
+            pass
+
+        registry.delete("gamma_00000002")
+        assert registry.get("gamma_00000002") is None
+        assert registry.list_documents()[1] == 4
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Listing, filters and deletes work")
+
+def test_sync_directory_registers_unknown_files():
+    """Files copied into Documents/ are catalogued once, with the upload suffix removed from the name"""
+    work_dir = tempfile.mkdtemp()
+    try:
+        upload_dir = os.path.join(work_dir, "Documents")
+        os.makedirs(upload_dir)
+        for name in ("report_0a1b2c3d.pdf", "manual.docx", "notes.txt"):
+            with open(os.path.join(upload_dir, name), "wb") as f:
+                f.write(b"x" * 10)
+
+        registry = _registry(work_dir)
+        added = registry.sync_directory(upload_dir, {".pdf", ".docx"})
+        assert added == 2
+        report = registry.get("report_0a1b2c3d")
+        assert report["filename"] == "report.pdf" and report["stored_name"] == "report_0a1b2c3d.pdf"
+        assert report["status"] == "unknown" and report["size"] == 10
+        assert registry.get("manual")["filename"] == "manual.docx"
+
+        # Already catalogued files are skipped
+        assert registry.sync_directory(upload_dir, {".pdf", ".docx"}) == 0
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Directory sync registers new files once")
+
+def test_ensure_and_resolve_by_doc_id():
+    """Every artifact is named after the doc ID; ensure() never overwrites, resolve() accepts either name"""
+    assert doc_id_for("/data/Documents/notes_1234abcd.pdf") == "notes_1234abcd"
+    assert artifact_paths("notes_1234abcd", "Text_files", "Embeddings") == {
+        "text_path": os.path.join("Text_files", "notes_1234abcd.txt"),
+        "segments_path": os.path.join("Text_files", "notes_1234abcd.segments.json"),
+        "embeddings_path": os.path.join("Embeddings", "notes_1234abcd.json")
+    }
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        registry = _registry(work_dir)
+        created = registry.ensure("notes_1234abcd", "notes.pdf", "notes_1234abcd.pdf", "/tmp/notes_1234abcd.pdf", size=5)
+        assert created["filename"] == "notes.pdf" and created["status"] == "uploaded"
+        registry.update("notes_1234abcd", status="completed", chunk_count=7)
+
+        # A second ensure (re-ingest) keeps the existing row and its state
+        again = registry.ensure("notes_1234abcd", "other.pdf", "other.pdf", "/tmp/other.pdf", size=99)
+        assert again["filename"] == "notes.pdf" and again["status"] == "completed" and again["chunk_count"] == 7
+
+        # Two uploads with the same original name get distinct IDs
+        registry.ensure("notes_9999ffff", "notes.pdf", "notes_9999ffff.pdf", "/tmp/notes_9999ffff.pdf")
+        assert registry.list_documents(search="notes")[1] == 2
+
+        assert registry.resolve("notes_1234abcd")["stored_name"] == "notes_1234abcd.pdf"
+        assert registry.resolve("notes_9999ffff.pdf")["doc_id"] == "notes_9999ffff"
+        assert registry.resolve("notes.pdf") is None
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Documents resolve by doc ID or stored name")
+
+def test_old_database_is_migrated():
+    """A catalog created before segments_path/chunk_count gains the columns and keeps its rows"""
+    work_dir = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(work_dir, "documents.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("""CREATE TABLE documents (
+            doc_id TEXT PRIMARY KEY, filename TEXT NOT NULL, stored_name TEXT NOT NULL UNIQUE,
+            file_type TEXT NOT NULL, size INTEGER NOT NULL DEFAULT 0, uploaded_at REAL NOT NULL,
+            updated_at REAL NOT NULL, status TEXT NOT NULL DEFAULT 'uploaded', source_path TEXT,
+            text_path TEXT, embeddings_path TEXT)""")
+        conn.execute("INSERT INTO documents VALUES ('old', 'old.pdf', 'old.pdf', 'pdf', 1, 1.0, 1.0, 'completed', "
+                     "NULL, 'Text_files/old.txt', 'Embeddings/old.json')")
+        conn.commit()
+        conn.close()
+
+        registry = DocumentRegistry(db_path)
+        old = registry.get("old")
+        assert old["status"] == "completed" and old["embeddings_path"] == "Embeddings/old.json"
+        assert old["segments_path"] is None and old["chunk_count"] is None
+        registry.update("old", segments_path="Text_files/old.segments.json", chunk_count=3)
+        assert registry.get("old")["chunk_count"] == 3
+
+        # Opening a migrated database again is a no-op
+        assert DocumentRegistry(db_path).get("old")["segments_path"] == "Text_files/old.segments.json"
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Old catalogs are migrated in place")
+
+def test_sync_finds_artifacts_by_doc_id_or_original_name():
+    """Synced files pick up artifacts named after the doc ID, or after the original name for old uploads"""
+    work_dir = tempfile.mkdtemp()
+    try:
+        upload_dir, text_dir, embeddings_dir = (os.path.join(work_dir, name) for name in ("Documents", "Text_files", "Embeddings"))
+        for folder in (upload_dir, text_dir, embeddings_dir):
+            os.makedirs(folder)
+        for name in ("new_0a1b2c3d.pdf", "legacy_11112222.pdf", "pending.pdf"):
+            with open(os.path.join(upload_dir, name), "wb") as f:
+                f.write(b"%PDF")
+        for path in (*artifact_paths("new_0a1b2c3d", text_dir, embeddings_dir).values(),
+                     artifact_paths("legacy", text_dir, embeddings_dir)["text_path"],
+                     artifact_paths("legacy", text_dir, embeddings_dir)["embeddings_path"]):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("{}")
+
+        registry = _registry(work_dir)
+        assert registry.sync_directory(upload_dir, {".pdf"}, text_dir, embeddings_dir) == 3
+
+        new = registry.get("new_0a1b2c3d")
+        assert new["status"] == "completed"
+        assert new["segments_path"] == os.path.join(text_dir, "new_0a1b2c3d.segments.json")
+        legacy = registry.get("legacy_11112222")
+        assert legacy["status"] == "completed" and legacy["embeddings_path"] == os.path.join(embeddings_dir, "legacy.json")
+        assert legacy["segments_path"] is None
+        assert registry.get("pending")["status"] == "unknown"
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Synced documents find their artifacts")
+
+def test_chunks_keep_the_registry_upload_time():
+    """Chunk metadata takes the upload time from the catalog, so touching the file does not move it"""
+    from File_entry import document_metadata
+    work_dir = tempfile.mkdtemp()
+    try:
+        file_path = os.path.join(work_dir, "report_0a1b2c3d.PDF")
+        with open(file_path, "wb") as f:
+            f.write(b"%PDF")
+        registry = _registry(work_dir)
+        assert registry.upload_time("report_0a1b2c3d") is None
+        registry.register("report_0a1b2c3d", "report.pdf", "report_0a1b2c3d.PDF", file_path, uploaded_at=1000.0)
+
+        # Copies, touches and re-syncs change the mtime, not the upload time
+        os.utime(file_path, (5000.0, 5000.0))
+        assert registry.sync_directory(work_dir, {".pdf"}) == 0
+        uploaded_at = registry.upload_time("report_0a1b2c3d")
+        assert uploaded_at == 1000.0
+        assert document_metadata(file_path, uploaded_at) == {"file_type": "pdf", "uploaded_at": 1000.0}
+
+        # Without a catalog row the mtime is the fallback
+        assert document_metadata(file_path)["uploaded_at"] == 5000.0
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Chunks keep the catalog's upload time")
+
+if __name__ == "__main__":
+    test_list_filter_sort_and_page()
+    test_sync_directory_registers_unknown_files()
+    test_ensure_and_resolve_by_doc_id()
+    test_old_database_is_migrated()
+    test_sync_finds_artifacts_by_doc_id_or_original_name()
+    test_chunks_keep_the_registry_upload_time()
@@ -0,0 +1,206 @@
+"""
+Check that the staged ingestion pipeline writes the same outputs as process_file
+"""
+
+import os
+import json
+import time
+import shutil
+import tempfile
+import fitz  # PyMuPDF
+import pytesseract
+from docx import Document
+from pptx import Presentation
+from pptx.util import Inches
+from File_entry import process_file
+from embedding_config import get_embedding_config
+from ingest_pipeline import IngestPipeline
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _make_docx(path, index, paragraphs=40):
+    document = Document()
+    for p in range(paragraphs):
+        document.add_paragraph(f"Document {index} paragraph {p}. Clustering groups similar points; "
+                               f"k-means assigns each point to the nearest of k centroids.")
+    document.save(path)
+
+def _make_pptx(path, index, slides=5):
+    presentation = Presentation()
+    for s in range(slides):
+        slide = presentation.slides.add_slide(presentation.slide_layouts[5])
+        slide.shapes.title.text = f"Deck {index} slide {s}"
+        box = slide.shapes.add_textbox(Inches(1), Inches(2), Inches(6), Inches(2))
+        box.text_frame.text = f"Slide {s} of deck {index}: vector search returns the nearest chunks."
+    presentation.save(path)
+
+def _make_documents(directory, count):
+    documents = []
+    for index in range(count):
+        if index % 2:
+            path = os.path.join(directory, f"pipeline_test_{index}.pptx")
+            _make_pptx(path, index)
+        else:
+            path = os.path.join(directory, f"pipeline_test_{index}.docx")
+            _make_docx(path, index)
+        documents.append((path, f"pipeline_test_{index}"))
+    return documents
+
+def _make_pdf(path, scanned_pages=1, text_pages=0):
+    """Pages with a text layer and a chart image, then image-only (scanned) pages."""
+    doc = fitz.open()
+    pixmap = fitz.Pixmap(fitz.csGRAY, fitz.IRect(0, 0, 64, 64), False)
+    pixmap.clear_with(200)
+    for index in range(text_pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Text page {index}: the chart below shows quarterly revenue.", fontsize=11)
+        page.insert_image(fitz.Rect(72, 100, 272, 250), pixmap=pixmap)
+    for _ in range(scanned_pages):
+        doc.new_page().insert_image(fitz.Rect(72, 72, 500, 700), pixmap=pixmap)
+    doc.save(path)
+    doc.close()
+
+def _ocr_data(words, conf=90):
+    """A pytesseract image_to_data dict of one line of words."""
+    return {
+        "level": [5] * len(words), "text": list(words), "conf": [conf] * len(words),
+        "block_num": [1] * len(words), "par_num": [1] * len(words), "line_num": [1] * len(words),
+        "height": [32] * len(words)
+    }
+
+def _read_outputs(text_dir, embeddings_dir, name):
+    with open(os.path.join(text_dir, f"{name}.txt"), "r", encoding="utf-8") as f:
+        text = f.read()
+    with open(os.path.join(text_dir, f"{name}.segments.json"), "r", encoding="utf-8") as f:
+        segments = json.load(f)
+    with open(os.path.join(embeddings_dir, f"{name}.json"), "r", encoding="utf-8") as f:
+        embeddings = json.load(f)
+    return text, segments, embeddings
+
+def _remove_reference_outputs(name):
+    for path in (os.path.join(SCRIPT_DIR, "Text_files", f"{name}.txt"),
+                 os.path.join(SCRIPT_DIR, "Text_files", f"{name}.segments.json"),
+                 os.path.join(SCRIPT_DIR, "Embeddings", f"{name}.json")):
+        if os.path.exists(path):
+            os.remove(path)
+
+def test_pipeline_matches_process_file():
+    """Pipeline outputs equal the sequential path's, and a broken file fails alone"""
+    print("🧪 TESTING STAGED INGESTION PIPELINE")
+    print("=" * 50)
+    work_dir = tempfile.mkdtemp()
+    try:
+        documents = _make_documents(work_dir, 4)
+        broken = os.path.join(work_dir, "pipeline_test_broken.docx")
+        with open(broken, "wb") as f:
+            f.write(b"not a zip file")
+
+        text_dir = os.path.join(work_dir, "Text_files")
+        embeddings_dir = os.path.join(work_dir, "Embeddings")
+        pipeline = IngestPipeline(text_dir=text_dir, embeddings_dir=embeddings_dir, queue_size=2)
+        results = {result["output_name"]: result
+                   for result in pipeline.run(documents + [(broken, "pipeline_test_broken")])}
+
+        assert not results.pop("pipeline_test_broken")["success"]
+        assert all(result["success"] for result in results.values()), results
+        for file_path, name in documents:
+            assert process_file(file_path, generate_embeddings=True, output_base_name=name)
+            try:
+                expected = _read_outputs(os.path.join(SCRIPT_DIR, "Text_files"), os.path.join(SCRIPT_DIR, "Embeddings"), name)
+            finally:
+                _remove_reference_outputs(name)
+            assert _read_outputs(text_dir, embeddings_dir, name) == expected, f"{name} differs"
+
+        stats = pipeline.stats()
+        pipeline.print_report()
+        assert stats["extract"]["items"] == len(documents) + 1
+        assert stats["persist"]["items"] == len(documents)
+        assert all(0.0 <= s["utilization"] <= 1.0 for s in stats.values())
+        assert all(s["max_queue"] <= 2 for s in stats.values())
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Pipeline outputs match process_file")
+
+def test_pdf_ocr_failure_stops_the_document():
+    """A PDF whose OCR fails is reported failed once and never chunked; other PDFs still get their OCR text"""
+    work_dir = tempfile.mkdtemp()
+    # Tesseract is stubbed: image regions read "Chart legend", the scan of a broken file raises
+    image_to_data = pytesseract.image_to_data
+
+    def fake_image_to_data(img, lang="eng", output_type=None):
+        if img.size[0] > 600:
+            if fake_image_to_data.broken:
+                raise RuntimeError("tesseract crashed")
+            return _ocr_data(["Scanned", "invoice", "total"])
+        return _ocr_data(["Chart", "legend"])
+
+    fake_image_to_data.broken = False
+    pytesseract.image_to_data = fake_image_to_data
+    try:
+        good = os.path.join(work_dir, "pipeline_test_mixed.pdf")
+        _make_pdf(good, scanned_pages=1, text_pages=1)
+        text_dir = os.path.join(work_dir, "Text_files")
+        embeddings_dir = os.path.join(work_dir, "Embeddings")
+        pipeline = IngestPipeline(text_dir=text_dir, embeddings_dir=embeddings_dir, report_interval=None)
+        result, = pipeline.run([(good, "pipeline_test_mixed")])
+        assert result["success"], result
+        with open(result["text"], "r", encoding="utf-8") as f:
+            text = f.read()
+        print(text)
+        assert "--- Page 1 ---" in text and "Chart legend" in text
+        assert "--- Page 2 ---" in text and "Scanned invoice total" in text
+
+        # The only page of the broken scan fails last, after every other page is done
+        fake_image_to_data.broken = True
+        broken = os.path.join(work_dir, "pipeline_test_scan.pdf")
+        _make_pdf(broken, scanned_pages=1)
+        pipeline = IngestPipeline(text_dir=text_dir, embeddings_dir=embeddings_dir, report_interval=None)
+        results = list(pipeline.run([(broken, "pipeline_test_scan")]))
+        assert len(results) == 1 and not results[0]["success"]
+        assert results[0]["error"] == "ocr: tesseract crashed"
+        assert pipeline.stats()["chunk"]["items"] == 0
+        assert not os.path.exists(os.path.join(embeddings_dir, "pipeline_test_scan.json"))
+    finally:
+        pytesseract.image_to_data = image_to_data
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ OCR failures stop their document")
+
+def benchmark(count=12, latency=0.3):
+    """Sequential process_file vs the pipeline with a remote provider of fixed latency"""
+    from test_async_embeddings import StubEmbeddingServer
+
+    config = get_embedding_config()
+    saved = (config["provider"], dict(config["providers"]["openai"]))
+    stub = StubEmbeddingServer(latency=lambda number: latency)
+    config["provider"] = "openai"
+    config["providers"]["openai"].update(api_key="test", base_url=stub.url, dimensions=None)
+    work_dir = tempfile.mkdtemp()
+    try:
+        documents = _make_documents(work_dir, count)
+        start = time.perf_counter()
+        for file_path, name in documents:
+            process_file(file_path, generate_embeddings=True, output_base_name=name)
+        sequential = time.perf_counter() - start
+
+        pipeline = IngestPipeline(text_dir=os.path.join(work_dir, "Text_files"),
+                                  embeddings_dir=os.path.join(work_dir, "Embeddings"))
+        start = time.perf_counter()
+        results = list(pipeline.run(documents))
+        staged = time.perf_counter() - start
+        pipeline.print_report()
+    finally:
+        for _, name in documents:
+            _remove_reference_outputs(name)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        stub.close()
+        config["provider"] = saved[0]
+        config["providers"]["openai"] = saved[1]
+
+    assert all(result["success"] for result in results)
+    print(f"⚡ {count} documents: sequential {sequential:.2f}s, pipeline {staged:.2f}s "
+          f"({sequential / staged:.1f}x)")
+
+if __name__ == "__main__":
+    test_pipeline_matches_process_file()
+    test_pdf_ocr_failure_stops_the_document()
+    benchmark()
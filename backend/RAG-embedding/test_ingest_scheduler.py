@@ -0,0 +1,164 @@
+"""
+Check cost estimates, work-unit claiming and the fair-share scheduling policy
+"""
+
+import os
+import shutil
+import tempfile
+import statistics
+import fitz  # PyMuPDF
+from docx import Document
+from job_store import JobStore
+from ingest_scheduler import (estimate_cost, plan_work_units, pick_unit, SCANNED_PAGE_SECONDS,
+                              MAX_UNIT_SECONDS, FAIR_SHARE_WINDOW)
+
+def _scanned_estimate(pages):
+    seconds = 0.5 + pages * SCANNED_PAGE_SECONDS
+    return {"pages": pages, "scanned_fraction": 1.0, "size": pages * 200_000,
+            "page_seconds": SCANNED_PAGE_SECONDS, "seconds": seconds}
+
+def _simulate(jobs, policy):
+    """
+    Run jobs on one worker and return {job: finish time}.
+
+    jobs: list of (arrival, job, tenant, units); policy "fifo" runs whole jobs
+    in arrival order, "fair" splits them into units chosen by pick_unit.
+    """
+    now, finished, claimed = 0.0, {}, []
+    queued, arrivals = [], sorted(jobs, key=lambda job: job[0])
+    remaining = {job: len(units) for _, job, _, units in jobs}
+    while arrivals or queued:
+        while arrivals and arrivals[0][0] <= now:
+            arrival, job, tenant, units = arrivals.pop(0)
+            if policy == "fifo":
+                units = [(None, None, sum(unit[2] for unit in units))]
+                remaining[job] = 1
+            queued.extend({"job": job, "tenant": tenant, "page_start": first, "cost": cost, "created_at": arrival}
+                          for first, _, cost in units)
+        if not queued:
+            now = arrivals[0][0]
+            continue
+        if policy == "fifo":
+            unit = min(queued, key=lambda unit: unit["created_at"])
+        else:
+            served = {}
+            for claimed_at, tenant, cost in claimed:
+                if claimed_at >= now - FAIR_SHARE_WINDOW:
+                    served[tenant] = served.get(tenant, 0.0) + cost
+            unit = pick_unit(queued, served, now)
+        queued.remove(unit)
+        claimed.append((now, unit["tenant"], unit["cost"]))
+        now += unit["cost"]
+        remaining[unit["job"]] -= 1
+        if not remaining[unit["job"]]:
+            finished[unit["job"]] = now
+    return finished
+
+def test_small_jobs_not_stuck_behind_large_scan():
+    """Small uploads keep a low latency while a 1,000-page scan is processed"""
+    print("🧪 TESTING FAIR-SHARE SCHEDULING")
+    print("=" * 50)
+    big_units = plan_work_units(_scanned_estimate(1000))
+    assert len(big_units) > 1 and all(unit[2] <= MAX_UNIT_SECONDS for unit in big_units)
+    assert (big_units[0][0], big_units[-1][1]) == (1, 1000)
+
+    jobs = [(0.0, "scan", "archive", big_units)]
+    # Small documents from another tenant, one every 20 s, and from the same tenant
+    jobs += [(5.0 + 20 * i, f"small-{i}", "team", [(None, None, 2.0)]) for i in range(100)]
+    jobs += [(10.0 + 200 * i, f"archive-small-{i}", "archive", [(None, None, 2.0)]) for i in range(10)]
+    arrival = {job: at for at, job, _, _ in jobs}
+
+    results = {}
+    for policy in ("fifo", "fair"):
+        finished = _simulate(jobs, policy)
+        small = [finished[job] - arrival[job] for job in finished if job != "scan"]
+        results[policy] = (statistics.median(small), max(small), finished["scan"])
+        print(f"{policy}: small-job median {results[policy][0]:.0f}s, max {results[policy][1]:.0f}s, "
+              f"scan done at {results[policy][2]:.0f}s")
+
+    fifo_median, _, fifo_scan = results["fifo"]
+    fair_median, fair_max, fair_scan = results["fair"]
+    assert fifo_median > 1000
+    # A small job waits for at most one unit of the scan, plus the small jobs ahead of it
+    assert fair_median < MAX_UNIT_SECONDS
+    assert fair_max < 2 * MAX_UNIT_SECONDS
+    # The scan still finishes: the worker never idles while it is queued
+    total_work = sum(cost for _, _, _, units in jobs for _, _, cost in units)
+    assert fifo_scan < fair_scan <= total_work + MAX_UNIT_SECONDS
+    print("✅ Small jobs interleave with the large scan")
+
+def test_claim_interleaves_tenants():
+    """Claims alternate between tenants and the last unit completes the job"""
+    work_dir = tempfile.mkdtemp()
+    try:
+        store = JobStore(os.path.join(work_dir, "jobs.db"))
+        units = plan_work_units(_scanned_estimate(100))
+        store.enqueue("scan", "doc-scan", "scan.pdf", "scan.pdf", "scan.pdf", tenant="archive",
+                      units=units, estimated_seconds=300.5)
+        for i in range(3):
+            store.enqueue(f"small-{i}", f"doc-{i}", f"{i}.docx", f"{i}.docx", f"{i}.docx", tenant="team",
+                          estimated_seconds=1.0)
+        assert store.pending_count() == len(units) + 3
+
+        order = []
+        while True:
+            job = store.claim("worker-1")
+            if job is None:
+                break
+            order.append(job["job_id"])
+            done, total = store.complete_unit(job["unit_id"])
+            assert total == job["unit_count"]
+        print(f"Claim order: {order}")
+        # Each scan unit outweighs a small job, so all small jobs run after the first scan unit
+        assert order[:4] == ["scan", "small-0", "small-1", "small-2"]
+        assert order.count("scan") == len(units)
+        assert (done, total) == (len(units), len(units))
+
+        store.enqueue("broken", "doc-broken", "b.pdf", "b.pdf", "b.pdf", units=units)
+        job = store.claim("worker-1")
+        store.fail(job["job_id"], "Processing failed")
+        assert store.pending_count() == 0
+        assert store.status("broken")["status"] == "error"
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Work units are claimed by fair share")
+
+def test_estimate_cost():
+    """Estimates count pages, detect scanned pages and scale with file size"""
+    work_dir = tempfile.mkdtemp()
+    try:
+        pdf_path = os.path.join(work_dir, "mixed.pdf")
+        with fitz.open() as doc:
+            for i in range(3):
+                page = doc.new_page()
+                page.insert_text((72, 72), f"Page {i}: " + "clustering groups similar points. " * 10)
+            scanned = doc.new_page()
+            pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 200, 200), False)
+            pix.clear_with(200)
+            scanned.insert_image(scanned.rect, pixmap=pix)
+            doc.save(pdf_path)
+
+        docx_path = os.path.join(work_dir, "notes.docx")
+        document = Document()
+        for p in range(20):
+            document.add_paragraph(f"Paragraph {p}: vector search returns the nearest chunks.")
+        document.save(docx_path)
+
+        pdf = estimate_cost(pdf_path)
+        docx = estimate_cost(docx_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"PDF estimate: {pdf}")
+    print(f"DOCX estimate: {docx}")
+    assert pdf["pages"] == 4
+    assert pdf["scanned_fraction"] == 0.25
+    assert pdf["seconds"] > 4.0
+    assert docx["pages"] is None and 0 < docx["seconds"] < 1.0
+    assert plan_work_units(pdf) == [(None, None, pdf["seconds"])]
+    print("✅ Cost estimates look right")
+
+if __name__ == "__main__":
+    test_small_jobs_not_stuck_behind_large_scan()
+    test_claim_interleaves_tenants()
+    test_estimate_cost()
@@ -0,0 +1,166 @@
+"""
+Check work-unit leases and that a standalone worker takes over the work of a dead one
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+from docx import Document
+from job_store import JobStore, network_filesystem
+from document_registry import DocumentRegistry
+from work_queue import MAX_ATTEMPTS, get_work_queue
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def test_expired_lease_is_released():
+    """A unit without heartbeats goes to the next worker; the late completion is ignored"""
+    print("🧪 TESTING WORK-UNIT LEASES")
+    print("=" * 50)
+    work_dir = tempfile.mkdtemp()
+    try:
+        store = JobStore(os.path.join(work_dir, "jobs.db"), lease_seconds=0.3)
+        store.enqueue("job-1", "doc-1", "a.docx", "a.docx", "a.docx")
+        unit = store.claim("worker-a")
+        assert store.claim("worker-b") is None
+        assert store.heartbeat(unit["unit_id"], "worker-a")
+
+        time.sleep(0.2)
+        assert store.heartbeat(unit["unit_id"], "worker-a")
+        time.sleep(0.2)
+        # The heartbeat kept the lease alive past its first expiry
+        assert store.claim("worker-b") is None
+
+        time.sleep(0.4)
+        taken_over = store.claim("worker-b")
+        assert taken_over["unit_id"] == unit["unit_id"]
+        assert not store.heartbeat(unit["unit_id"], "worker-a")
+        assert store.complete_unit(unit["unit_id"], "worker-a") is None
+        assert store.complete_unit(unit["unit_id"], "worker-b") == (1, 1)
+        assert store.unfinished_count() == 0
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Expired leases are handed to another worker")
+
+def test_unit_given_up_after_lost_leases():
+    """A unit that keeps losing its worker fails its job instead of looping forever"""
+    work_dir = tempfile.mkdtemp()
+    try:
+        store = JobStore(os.path.join(work_dir, "jobs.db"), lease_seconds=0.05)
+        store.enqueue("job-1", "doc-1", "crash.pdf", "crash.pdf", "crash.pdf")
+        for attempt in range(MAX_ATTEMPTS):
+            assert store.claim(f"worker-{attempt}") is not None
+            time.sleep(0.1)
+        assert store.claim("worker-last") is None
+        status = store.status("job-1")
+        print(f"Status after {MAX_ATTEMPTS} lost leases: {status['message']}")
+        assert status["status"] == "error"
+        assert store.unfinished_count() == 0
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Repeatedly lost units fail their job")
+
+def _index_state():
+    index_dir = os.path.join(SCRIPT_DIR, "Embeddings", "index")
+    return index_dir, os.path.exists(index_dir)
+
+def _remove_outputs(doc_ids, index_existed):
+    for doc_id in doc_ids:
+        for path in (os.path.join(SCRIPT_DIR, "Text_files", f"{doc_id}.txt"),
+                     os.path.join(SCRIPT_DIR, "Text_files", f"{doc_id}.segments.json"),
+                     os.path.join(SCRIPT_DIR, "Embeddings", f"{doc_id}.json")):
+            if os.path.exists(path):
+                os.remove(path)
+    index_dir, _ = _index_state()
+    if not index_existed:
+        shutil.rmtree(index_dir, ignore_errors=True)
+    elif os.path.exists(index_dir):
+        from embedding_config import get_embedding_config
+        from Embedding_C.vector_store import get_vector_store
+        index = get_vector_store(os.path.join(SCRIPT_DIR, "Embeddings"), **get_embedding_config().get("vector_store", {}))
+        for doc_id in doc_ids:
+            index.delete_document(doc_id)
+
+def test_standalone_worker_takes_over():
+    """Worker processes drain the queue, including a unit leased by a worker that died"""
+    print("🧪 TESTING STANDALONE INGESTION WORKER")
+    print("=" * 50)
+    work_dir = tempfile.mkdtemp()
+    _, index_existed = _index_state()
+    doc_ids = [f"worker_test_{index}" for index in range(3)]
+    try:
+        db_path = os.path.join(work_dir, "documents.db")
+        store = JobStore(db_path, lease_seconds=1)
+        registry = DocumentRegistry(db_path)
+        for index, doc_id in enumerate(doc_ids):
+            path = os.path.join(work_dir, f"{doc_id}.docx")
+            document = Document()
+            for p in range(10):
+                document.add_paragraph(f"Document {index} paragraph {p}: workers lease units from the queue.")
+            document.save(path)
+            registry.register(doc_id, f"{doc_id}.docx", f"{doc_id}.docx", path, size=os.path.getsize(path))
+            store.enqueue(f"job-{index}", doc_id, path, f"{doc_id}.docx", f"{doc_id}.docx")
+
+        # A worker that claimed a unit and then died without a heartbeat
+        orphan = store.claim("dead-worker")
+
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, os.path.join(SCRIPT_DIR, "ingest_worker.py"), "--db", db_path, "--threads", "2",
+             "--lease-seconds", "1", "--drain", "--worker-id", "test-worker"],
+            capture_output=True, text=True, timeout=300
+        )
+        elapsed = time.perf_counter() - start
+        print(result.stdout[-1500:])
+        assert result.returncode == 0, result.stderr[-2000:]
+
+        for index, doc_id in enumerate(doc_ids):
+            job = store.get(f"job-{index}")
+            assert job["status"] == "completed", job
+            assert job["claimed_by"].startswith("test-worker")
+            assert registry.get(doc_id)["status"] == "completed"
+        assert store.unfinished_count() == 0
+        assert f"on work unit {orphan['unit_id']} expired" in result.stdout
+        print(f"Worker finished 3 jobs, one taken over from a dead worker, in {elapsed:.1f}s")
+        assert elapsed < 30
+    finally:
+        _remove_outputs(doc_ids, index_existed)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Standalone worker processed every job")
+
+def test_sqlite_queue_is_single_host():
+    """Network filesystems are recognized from the mount table, and unknown backends are rejected"""
+    work_dir = tempfile.mkdtemp()
+    try:
+        mounts_file = os.path.join(work_dir, "mounts")
+        with open(mounts_file, "w", encoding="utf-8") as f:
+            f.write("/dev/sda1 / ext4 rw 0 0\n"
+                    "server:/export /mnt/shared nfs4 rw 0 0\n"
+                    "/dev/sdb1 /mnt/shared/local ext4 rw 0 0\n"
+                    "//nas/rag /mnt/my\\040share cifs rw 0 0\n")
+        if os.name != "nt":
+            assert network_filesystem("/mnt/shared/rag/documents.db", mounts_file) == "nfs4"
+            assert network_filesystem("/mnt/shared", mounts_file) == "nfs4"
+            assert network_filesystem("/mnt/shared/local/documents.db", mounts_file) is None
+            assert network_filesystem("/mnt/sharedother/documents.db", mounts_file) is None
+            assert network_filesystem("/mnt/my share/documents.db", mounts_file) == "cifs"
+            assert network_filesystem("/home/rag/documents.db", os.path.join(work_dir, "missing")) is None
+        # The test database is on a local disk
+        assert network_filesystem(work_dir) is None
+
+        try:
+            get_work_queue("redis")
+            raise AssertionError("unknown backend accepted")
+        except ValueError as e:
+            assert "one host" in str(e)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ The SQLite queue stays on one host")
+
+if __name__ == "__main__":
+    test_expired_lease_is_released()
+    test_unit_given_up_after_lost_leases()
+    test_standalone_worker_takes_over()
+    test_sqlite_queue_is_single_host()
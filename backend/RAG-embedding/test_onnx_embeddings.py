@@ -0,0 +1,86 @@
+"""
+Check that the ONNX Runtime provider matches the PyTorch (sentence-transformers) path
+"""
+
+import time
+import numpy as np
+import pytest
+from Embedding_C.embedding_providers import get_embedding_provider
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Minimum cosine similarity between PyTorch and ONNX vectors of the same text
+FP32_MIN_COSINE = 0.9999
+INT8_MIN_COSINE = 0.98
+
+TEXTS = [
+    "clustering algorithm for data analysis",
+    "machine learning and artificial intelligence",
+    "pizza recipe with tomatoes and cheese",
+    "k-means clustering method",
+    "The quarterly report shows revenue growth of 12% compared to last year.",
+    "Table: Region | Sales | Growth\nNorth | 120 | 5%\nSouth | 98 | -2%",
+    "a",
+    " ".join(["long input that exceeds the maximum sequence length"] * 80)
+]
+
+def _load_providers():
+    torch_provider = get_embedding_provider("huggingface", model_name=MODEL_NAME)
+    onnx_provider = get_embedding_provider("onnx", model_name=MODEL_NAME, quantize=False)
+    int8_provider = get_embedding_provider("onnx", model_name=MODEL_NAME, quantize=True)
+    return torch_provider, onnx_provider, int8_provider
+
+def _cosines(a, b):
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    return (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+def test_onnx_matches_pytorch():
+    """ONNX vectors (fp32 and int8) stay within tolerance of the PyTorch vectors"""
+    # A missing backend is reported as skipped, not as a passing comparison
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("optimum.onnxruntime")
+    try:
+        torch_provider, onnx_provider, int8_provider = _load_providers()
+    except ImportError as e:
+        pytest.skip(f"ONNX comparison needs: {e}")
+
+    print("🧪 COMPARING ONNX RUNTIME WITH PYTORCH")
+    print("=" * 50)
+
+    reference = torch_provider.embed_batch(TEXTS)
+    for name, provider, min_cosine in (("fp32", onnx_provider, FP32_MIN_COSINE),
+                                       ("int8", int8_provider, INT8_MIN_COSINE)):
+        batch = provider.embed_batch(TEXTS)
+        single = [provider.embed_text(text) for text in TEXTS]
+        cosines = _cosines(reference, batch)
+
+        print(f"{name}: min cosine {cosines.min():.5f} (required {min_cosine})")
+        assert provider.get_dimension() == len(reference[0])
+        assert cosines.min() >= min_cosine, f"{name} vectors differ from PyTorch: {cosines.round(5).tolist()}"
+        # Padding in a batch must not change a text's vector
+        assert _cosines(batch, single).min() >= 0.99999
+
+    assert onnx_provider.count_tokens(TEXTS[4]) == torch_provider.count_tokens(TEXTS[4])
+    assert onnx_provider.get_max_tokens() == torch_provider.get_max_tokens()
+    print("✅ ONNX vectors match the PyTorch path")
+
+def benchmark(rounds=5):
+    """Texts per second of each backend"""
+    try:
+        providers = _load_providers()
+    except ImportError as e:
+        print(f"⏭️ Skipping ONNX benchmark: {e}")
+        return
+    texts = TEXTS[:6] * 32
+    for name, provider in zip(("pytorch", "onnx fp32", "onnx int8"), providers):
+        provider.embed_batch(texts[:8])
+        start = time.perf_counter()
+        for _ in range(rounds):
+            provider.embed_batch(texts)
+        elapsed = time.perf_counter() - start
+        print(f"⚡ {name:<10} {len(texts) * rounds / elapsed:8.1f} texts/s")
+
+if __name__ == "__main__":
+    test_onnx_matches_pytorch()
+    benchmark()
@@ -0,0 +1,130 @@
+"""
+Check that PDF tables are extracted once, as rows, and that no text is emitted twice
+"""
+
+import fitz  # PyMuPDF
+from PDF.PDF_To_Text import extract_text_layer, format_image_text
+from PDF.Scanned_PDF_To_Text import format_scanned_page
+from OCR.page_ocr import image_regions, ocr_image_regions, data_to_text
+
+ROWS = [
+    ["Region", "Revenue", "Growth"],
+    ["North", "1200", "4%"],
+    ["South", "950", "7%"],
+    ["West", "1430", "2%"]
+]
+
+PARAGRAPH = "Quarterly results are summarized below for every sales region."
+
+def _table_page(doc):
+    """A page with a paragraph above a ruled 4x3 table."""
+    page = doc.new_page()
+    page.insert_text((72, 72), PARAGRAPH, fontsize=11)
+    x0, y0, cell_width, cell_height = 72, 100, 120, 24
+    for row_index, row in enumerate(ROWS):
+        for col_index, cell in enumerate(row):
+            rect = fitz.Rect(x0 + col_index * cell_width, y0 + row_index * cell_height,
+                             x0 + (col_index + 1) * cell_width, y0 + (row_index + 1) * cell_height)
+            page.draw_rect(rect, color=(0, 0, 0), width=0.8)
+            page.insert_text((rect.x0 + 6, rect.y1 - 8), cell, fontsize=10)
+    return page
+
+def _image_page(doc):
+    """A text page with one chart-sized image and one icon."""
+    page = doc.new_page()
+    page.insert_text((72, 72), "Figure 1 shows the trend.", fontsize=11)
+    pixmap = fitz.Pixmap(fitz.csGRAY, fitz.IRect(0, 0, 64, 64), False)
+    pixmap.clear_with(200)
+    page.insert_image(fitz.Rect(72, 100, 272, 250), pixmap=pixmap)
+    page.insert_image(fitz.Rect(300, 100, 316, 116), pixmap=pixmap)
+    return page
+
+def test_table_emitted_once():
+    """The table is one [Table 1] of rows and its cells are not repeated as text"""
+    print("🧪 TESTING PDF TABLE EXTRACTION")
+    print("=" * 50)
+    doc = fitz.open()
+    page = _table_page(doc)
+    page_output, segments = extract_text_layer(page, 1)
+    doc.close()
+    print(page_output)
+
+    assert "[Table Detected]" not in page_output
+    assert page_output.count("[Table 1]:") == 1
+    assert "[Table 2]:" not in page_output
+    for row in ROWS:
+        assert "\t".join(row) in page_output
+    for cell in ("Revenue", "North", "1430"):
+        assert page_output.count(cell) == 1, cell
+    assert page_output.count(PARAGRAPH) == 1
+
+    kinds = [segment["type"] for segment in segments]
+    assert kinds == ["text", "table"], kinds
+    assert "North" not in segments[0]["text"]
+    assert segments[1]["table"] == 1
+    print("✅ Table rows emitted once, paragraph kept as text")
+
+def test_image_text_deduplicated():
+    """OCR lines that repeat the text layer are dropped, new ones kept"""
+    segments = [{"type": "text", "text": PARAGRAPH}, {"type": "table", "text": "North\t1200\t4%"}]
+    ocr_text = "Quarterly results are summarized\n\nNorth 1200 4%\nForecast 2025\n--"
+    page_output, image_segments = format_image_text(ocr_text, 1, segments)
+    print(page_output)
+    assert "Forecast 2025" in page_output
+    assert "Quarterly" not in page_output and "North" not in page_output
+    assert [segment["type"] for segment in image_segments] == ["ocr"]
+
+    # Nothing new in the images: no OCR section at all
+    assert format_image_text("north 1200  4 %", 1, segments) == ("", [])
+    print("✅ Text already on the page is not repeated from OCR")
+
+def test_scanned_page_emitted_once():
+    """A scanned page's OCR text appears once, as one ocr segment"""
+    lines = [["Invoice", "2024-17"], ["Item", "Qty", "Price"], ["Paper", "4", "12.00"]]
+    data = {key: [] for key in ("level", "block_num", "par_num", "line_num", "text", "conf", "height")}
+    for line_num, words in enumerate(lines, start=1):
+        # Tesseract reports an empty, conf -1 box before each line's words
+        for word, conf in [("", -1)] + [(word, 91) for word in words]:
+            data["level"].append(5 if word else 4)
+            data["block_num"].append(1)
+            data["par_num"].append(1)
+            data["line_num"].append(line_num)
+            data["text"].append(word)
+            data["conf"].append(conf)
+            data["height"].append(30)
+    result = {"text": data_to_text(data), "data": data, "dpi": 150, "confidence": 91.0}
+
+    page_output, segments = format_scanned_page(result, 3)
+    print(page_output)
+    assert page_output == "\n\n--- Page 3 ---\nInvoice 2024-17\nItem Qty Price\nPaper 4 12.00"
+    for word in ("Invoice", "Qty", "12.00"):
+        assert page_output.count(word) == 1, word
+    assert segments == [{"type": "ocr", "text": "Invoice 2024-17\nItem Qty Price\nPaper 4 12.00", "page": 3, "slide": None}]
+
+    # A blank scan has no content at all
+    assert format_scanned_page({"text": "", "data": {}, "dpi": 150, "confidence": 0.0}, 4) == ("\n\n--- Page 4 ---\n", [])
+    print("✅ Scanned page text emitted once")
+
+def test_only_images_are_ocr_candidates():
+    """Only chart-sized images are OCR'd; pages without images are not rendered"""
+    doc = fitz.open()
+    _table_page(doc)
+    _image_page(doc)
+    # Adding a page invalidates earlier page objects, so load them again
+    table_page, image_page = doc[0], doc[1]
+
+    assert image_regions(table_page) == []
+    # No image regions means no Tesseract call at all
+    assert ocr_image_regions(table_page) == {"text": "", "regions": 0}
+
+    regions = image_regions(image_page)
+    assert len(regions) == 1, regions
+    assert abs(regions[0].width - 200) < 1 and abs(regions[0].height - 150) < 1
+    doc.close()
+    print("✅ Only image regions are sent to OCR")
+
+if __name__ == "__main__":
+    test_table_emitted_once()
+    test_image_text_deduplicated()
+    test_scanned_page_emitted_once()
+    test_only_images_are_ocr_candidates()
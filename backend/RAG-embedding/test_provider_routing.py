@@ -0,0 +1,102 @@
+"""
+Check hedged requests and failover of the routing embedding provider against local stub servers
+"""
+
+import time
+from Embedding_C.embedding_providers import get_embedding_provider
+from test_async_embeddings import StubEmbeddingServer
+
+# Latency of a normal request and of an injected tail request, in seconds
+FAST = 0.02
+SLOW = 1.0
+
+# Every TAIL_EVERY-th request to the primary is slow (below the 95th percentile)
+TAIL_EVERY = 25
+
+def _openai(url):
+    return {"type": "openai", "api_key": "test", "base_url": url, "timeout": 10}
+
+def _timed_calls(provider, calls):
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        embeddings = provider.embed_batch([f"text {i}", f"text {i + 1}"])
+        latencies.append(time.perf_counter() - start)
+        assert [embedding[0] for embedding in embeddings] == [i, i + 1]
+    return latencies
+
+def test_hedging_cuts_tail_latency():
+    """A slow primary response is overtaken by the hedged duplicate"""
+    print("🧪 TESTING HEDGED EMBEDDING REQUESTS")
+    print("=" * 50)
+    slow_tail = lambda number: SLOW if number % TAIL_EVERY == TAIL_EVERY - 1 else FAST
+    primary = StubEmbeddingServer(slow_tail)
+    direct_primary = StubEmbeddingServer(slow_tail)
+    secondary = StubEmbeddingServer(FAST)
+    try:
+        direct = get_embedding_provider("openai", api_key="test", base_url=direct_primary.url)
+        router = get_embedding_provider("routing", providers=[_openai(primary.url), _openai(secondary.url)],
+                                        initial_hedge_delay=0.2)
+        direct_latencies = _timed_calls(direct, 100)
+        routed_latencies = _timed_calls(router, 100)
+    finally:
+        for server in (primary, direct_primary, secondary):
+            server.close()
+
+    stats = router.stats()
+    print(f"Direct: max {max(direct_latencies):.2f}s, routed: max {max(routed_latencies):.2f}s "
+          f"({stats['hedges']} hedges)")
+    print(f"Stats: {stats}")
+    assert max(direct_latencies) >= SLOW
+    assert max(routed_latencies) < SLOW / 2
+    # Only the tail is hedged, not every request
+    assert 0 < stats["hedges"] <= 100 // TAIL_EVERY + 2
+    primary_stats = next(iter(stats["providers"].values()))
+    assert 0 < primary_stats["p50"] <= primary_stats["p95"]
+    print("✅ Tail requests are hedged and the first response wins")
+
+def test_circuit_breaker_failover():
+    """Calls fail over from an erroring provider, which is skipped until it recovers"""
+    print("🧪 TESTING PROVIDER FAILOVER")
+    print("=" * 50)
+    primary = StubEmbeddingServer(FAST)
+    secondary = StubEmbeddingServer(FAST)
+    primary.status = 500
+    try:
+        router = get_embedding_provider("routing", providers=[_openai(primary.url), _openai(secondary.url)],
+                                        min_requests=5, cooldown=0.5)
+        _timed_calls(router, 20)
+        primary_requests = primary.requests
+        breaker = router.routes[0].breaker.state
+        print(f"Primary received {primary_requests} of 20 calls while failing; breaker {breaker}")
+        assert primary_requests == 5
+        assert breaker == "open"
+
+        # After the cooldown, one trial call closes the breaker again
+        primary.status = 200
+        time.sleep(0.6)
+        _timed_calls(router, 5)
+        print(f"Breaker after recovery: {router.routes[0].breaker.state}")
+        assert router.routes[0].breaker.state == "closed"
+        assert primary.requests == primary_requests + 5
+    finally:
+        primary.close()
+        secondary.close()
+    print("✅ Failing provider is skipped and re-admitted after recovery")
+
+def test_dimension_mismatch_rejected():
+    """Providers of different dimensions cannot be routed together"""
+    try:
+        get_embedding_provider("routing", providers=[
+            {"type": "openai", "api_key": "test", "model": "text-embedding-3-small"},
+            {"type": "openai", "api_key": "test", "model": "text-embedding-3-small", "dimensions": 256}
+        ])
+    except ValueError as e:
+        print(f"✅ Rejected: {e}")
+        return
+    raise AssertionError("Mixed dimensions were accepted")
+
+if __name__ == "__main__":
+    test_hedging_cuts_tail_latency()
+    test_circuit_breaker_failover()
+    test_dimension_mismatch_rejected()
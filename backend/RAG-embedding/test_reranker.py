@@ -0,0 +1,68 @@
+"""
+Check cross-encoder reranking: candidate count, cache and time budget, with a word-overlap scorer
+instead of the model
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from Embedding_C.reranker import CrossEncoderReranker
+
+class OverlapReranker(CrossEncoderReranker):
+    """Scores pairs by shared words, so the reranking logic runs without sentence-transformers"""
+
+    def __init__(self, candidates=20, batch_size=32, time_budget=10.0, delay=0.0):
+        self.model_name = "word-overlap"
+        self.candidates = candidates
+        self.batch_size = batch_size
+        self.time_budget = time_budget
+        self.delay = delay
+        self.scored = []
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "over_budget": 0}
+
+    def _score_pairs(self, pairs):
+        time.sleep(self.delay)
+        self.scored.extend(text for _, text in pairs)
+        return [float(len(set(query.split()) & set(text.split()))) for query, text in pairs]
+
+def _results(count):
+    # Vector-search order puts the most relevant chunks last: doc_i shares i words with the query
+    return [{"doc_id": f"doc_{index}", "text": " ".join(f"w{n}" for n in range(index))} for index in range(count)]
+
+def test_reranks_at_least_k():
+    """Asking for more than `candidates` results reranks all of them"""
+    print("🧪 TESTING CROSS-ENCODER RERANKING")
+    print("=" * 50)
+    query = " ".join(f"w{n}" for n in range(100))
+    reranker = OverlapReranker(candidates=20)
+    results = _results(50)
+
+    reranked = reranker.rerank(query, results, k=40)
+    assert len(reranked) == 40
+    assert [record["doc_id"] for record in reranked] == [f"doc_{index}" for index in range(39, -1, -1)]
+    assert all(record["rerank_score"] is not None for record in reranked)
+    assert len(reranker.scored) == 40
+
+    # Small k still reranks the configured candidate count
+    reranked = reranker.rerank(query, results, k=5)
+    assert [record["doc_id"] for record in reranked] == [f"doc_{index}" for index in range(19, 14, -1)]
+    assert reranker.stats()["hits"] == 20 and len(reranker.scored) == 40
+    print("✅ At least k candidates are reranked")
+
+def test_time_budget_keeps_search_order():
+    """Candidates not scored in time follow the reranked ones in vector-search order"""
+    query = " ".join(f"w{n}" for n in range(100))
+    reranker = OverlapReranker(candidates=10, batch_size=4, time_budget=0.05, delay=0.04)
+    reranked = reranker.rerank(query, _results(10))
+    scores = [record["rerank_score"] for record in reranked]
+    print(scores)
+    assert scores[:4] == [3.0, 2.0, 1.0, 0.0] and scores[4:] == [None] * 6
+    assert [record["doc_id"] for record in reranked[4:]] == [f"doc_{index}" for index in range(4, 10)]
+    assert reranker.stats()["over_budget"] == 1
+    print("✅ Time budget bounds the scoring")
+
+if __name__ == "__main__":
+    test_reranks_at_least_k()
+    test_time_budget_keeps_search_order()
@@ -0,0 +1,129 @@
+"""
+Check the segments sidecar round trip and the page/slide metadata of embedding records
+"""
+
+import os
+import json
+import shutil
+import tempfile
+from docx import Document
+from document_segments import make_segment, write_segments, load_segments, segments_path_for, parse_segments
+from DOCX.DOCX_To_Text import docx_to_text
+from Embedding_C.Text_To_Embeddings import text_to_embeddings
+
+def test_sidecar_round_trip():
+    """Segments written next to a text file load back unchanged; empty ones are dropped"""
+    print("🧪 TESTING DOCUMENT SEGMENTS")
+    print("=" * 50)
+    work_dir = tempfile.mkdtemp()
+    try:
+        text_path = os.path.join(work_dir, "report.txt")
+        assert load_segments(text_path) is None
+
+        segments = [
+            make_segment("text", "  First page.  ", page=1),
+            make_segment("table", "a\tb\nc\td", page=1, table=1),
+            make_segment("ocr", "   ", page=2),
+            make_segment("text", "Slide body", slide=3)
+        ]
+        assert segments[2] is None
+        path = write_segments(text_path, segments)
+        assert path == segments_path_for(text_path) == os.path.join(work_dir, "report.segments.json")
+
+        loaded = load_segments(text_path)
+        assert loaded == [segment for segment in segments if segment]
+        assert loaded[0] == {"type": "text", "text": "First page.", "page": 1, "slide": None}
+        assert loaded[1]["table"] == 1
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Segments sidecar round-trips")
+
+def test_parse_segments_from_markers():
+    """Text files without a sidecar are split on their page/slide markers and labels"""
+    text = "\n".join([
+        "--- Page 1 ---",
+        "[Text]:",
+        "Intro text",
+        "[Table 1]:",
+        "a\tb",
+        "--- Page 2 ---",
+        "[Text in Images (Charts/Diagrams)]:",
+        "Chart label"
+    ])
+    parsed = [(segment["type"], segment["text"], segment["page"], segment["slide"]) for segment in parse_segments(text)]
+    print(parsed)
+    assert parsed == [
+        ("text", "Intro text", 1, None),
+        ("table", "a\tb", 1, None),
+        ("ocr", "Chart label", 2, None)
+    ]
+
+    slides = "--- Slide 3 ---\n[Paragraph 1]: Slide paragraph\n--- Slide 4 ---\n[Chart 1]: Sales\nQ1 10"
+    parsed = [(segment["type"], segment["text"], segment["page"], segment["slide"]) for segment in parse_segments(slides)]
+    assert parsed == [("paragraph", "Slide paragraph", None, 3), ("chart", "Sales\nQ1 10", None, 4)]
+    print("✅ Markers parse into typed segments")
+
+def test_docx_extractor_writes_segments():
+    """docx_to_text writes one segment per paragraph and per table"""
+    work_dir = tempfile.mkdtemp()
+    try:
+        docx_path = os.path.join(work_dir, "notes.docx")
+        document = Document()
+        document.add_paragraph("First paragraph.")
+        document.add_paragraph("")
+        document.add_paragraph("Second paragraph.")
+        table = document.add_table(rows=2, cols=2)
+        for row_index, row in enumerate(table.rows):
+            for col_index, cell in enumerate(row.cells):
+                cell.text = f"r{row_index}c{col_index}"
+        document.save(docx_path)
+
+        text_path = docx_to_text(docx_path, output_dir=work_dir, output_name="notes")
+        segments = load_segments(text_path)
+        print(segments)
+        assert [segment["type"] for segment in segments] == ["paragraph", "paragraph", "table"]
+        assert segments[0]["text"] == "First paragraph."
+        assert segments[2]["text"] == "r0c0\tr0c1\nr1c0\tr1c1"
+        assert segments[2]["table"] == 1
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ DOCX extractor writes segments")
+
+def test_embedding_records_carry_page_and_slide():
+    """Every record has the page/slide and segment types of its chunk; chunks never mix pages"""
+    work_dir = tempfile.mkdtemp()
+    try:
+        text_path = os.path.join(work_dir, "deck.txt")
+        with open(text_path, "w", encoding="utf-8") as f:
+            f.write("unused: the sidecar takes precedence")
+        write_segments(text_path, [
+            make_segment("text", "Page one text.", page=1),
+            make_segment("table", "x\ty", page=1),
+            make_segment("text", "Page two text.", page=2),
+            make_segment("chart", "Revenue by year", slide=5)
+        ])
+
+        output_path = text_to_embeddings(text_path, os.path.join(work_dir, "Embeddings"), "dummy",
+                                         doc_id="deck-1", metadata={"file_type": "pptx"})
+        with open(output_path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+
+        summary = [(record["chunk_index"], record["page"], record["slide"], record["segment_types"], record["text"])
+                   for record in records]
+        print(summary)
+        assert summary == [
+            (0, 1, None, ["table", "text"], "Page one text.\nx\ty"),
+            (1, 2, None, ["text"], "Page two text."),
+            (2, None, 5, ["chart"], "Revenue by year")
+        ]
+        assert all(record["doc_id"] == "deck-1" and record["file_type"] == "pptx" for record in records)
+        assert all(record["embedding_dimension"] == len(record["embedding"]) for record in records)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Embedding records carry page and slide")
+
+if __name__ == "__main__":
+    test_sidecar_round_trip()
+    test_parse_segments_from_markers()
+    test_docx_extractor_writes_segments()
+    test_embedding_records_carry_page_and_slide()
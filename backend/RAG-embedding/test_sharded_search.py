@@ -0,0 +1,135 @@
+"""
+Check scatter-gather search over shard server processes against a single local index
+"""
+
+import os
+import sys
+import time
+import socket
+import signal
+import shutil
+import tempfile
+import subprocess
+import numpy as np
+from Embedding_C.vector_store import VectorStore
+from Embedding_C.sharded_store import ShardedVectorStore, shard_for
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SHARDS = 3
+DOCUMENTS = 60
+CHUNKS_PER_DOCUMENT = 5
+DIMENSION = 32
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _start_shards(embeddings_dir):
+    processes, urls = [], []
+    for shard in range(SHARDS):
+        port = _free_port()
+        processes.append(subprocess.Popen(
+            [sys.executable, os.path.join(SCRIPT_DIR, "shard_server.py"), "--shard", str(shard),
+             "--shards", str(SHARDS), "--host", "127.0.0.1", "--port", str(port), "--embeddings-dir", embeddings_dir],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ))
+        urls.append(f"http://127.0.0.1:{port}")
+    return processes, urls
+
+def _wait_until_ready(store, timeout=60):
+    start = time.time()
+    while time.time() - start < timeout:
+        if store.stats()["available"] == SHARDS:
+            return
+        time.sleep(0.2)
+    raise AssertionError("Shard servers did not start")
+
+def _documents(rng):
+    for index in range(DOCUMENTS):
+        doc_id = f"shard_test_{index}"
+        records = [{"doc_id": doc_id, "chunk_index": chunk, "text": f"Document {index} chunk {chunk}",
+                    "page": chunk + 1, "file_type": "pdf" if index % 2 else "docx", "uploaded_at": 1000.0 + index}
+                   for chunk in range(CHUNKS_PER_DOCUMENT)]
+        yield doc_id, records, rng.normal(size=(CHUNKS_PER_DOCUMENT, DIMENSION)).astype(np.float32)
+
+def _keys(results):
+    return [(result["doc_id"], result["chunk_index"]) for result in results]
+
+def test_scatter_gather_matches_single_index():
+    """Sharded results equal a single index's, and slow or dead shards are left out"""
+    print("🧪 TESTING SHARDED SCATTER-GATHER SEARCH")
+    print("=" * 50)
+    work_dir = tempfile.mkdtemp()
+    processes, urls = _start_shards(os.path.join(work_dir, "Embeddings"))
+    try:
+        rng = np.random.default_rng(0)
+        reference = VectorStore(os.path.join(work_dir, "reference"))
+        sharded = ShardedVectorStore(urls, deadline=2.0)
+        _wait_until_ready(sharded)
+
+        documents = list(_documents(rng))
+        reference.add_documents(documents)
+        for doc_id, records, vectors in documents:
+            sharded.add_document(doc_id, records, vectors)
+
+        per_shard = [shard["vectors"] for shard in sharded.stats()["shards"]]
+        print(f"Vectors per shard: {per_shard}")
+        assert sum(per_shard) == DOCUMENTS * CHUNKS_PER_DOCUMENT
+        assert all(count > 0 for count in per_shard)
+        assert all(sharded.contains(doc_id) for doc_id, _, _ in documents[:5])
+
+        queries = rng.normal(size=(20, DIMENSION)).astype(np.float32)
+        for query in queries:
+            expected = reference.search(query, 10)
+            results = sharded.search(query, 10)
+            assert _keys(results) == _keys(expected)
+            assert np.allclose([r["score"] for r in results], [r["score"] for r in expected], atol=1e-5)
+
+        # Filters are applied on every shard; a doc_ids filter only reaches the owning shards
+        filters = {"doc_ids": ["shard_test_1", "shard_test_2"], "page_from": 2}
+        gathered = sharded.scatter_gather(queries[0], 5, filters)
+        assert _keys(gathered["results"]) == _keys(reference.search(queries[0], 5, filters))
+        assert gathered["shards"] == len({shard_for(doc_id, SHARDS) for doc_id in filters["doc_ids"]})
+
+        sharded.delete_document("shard_test_1")
+        reference.delete_document("shard_test_1")
+        assert _keys(sharded.search(queries[1], 10)) == _keys(reference.search(queries[1], 10))
+
+        if hasattr(signal, "SIGSTOP"):
+            # A paused shard is dropped at the deadline instead of stalling the query
+            sharded.deadline = 0.3
+            processes[1].send_signal(signal.SIGSTOP)
+            try:
+                start = time.perf_counter()
+                gathered = sharded.scatter_gather(queries[2], 10)
+                elapsed = time.perf_counter() - start
+            finally:
+                processes[1].send_signal(signal.SIGCONT)
+            print(f"Slow shard: answered {gathered['answered']}/{gathered['shards']} in {elapsed * 1000:.0f} ms")
+            assert list(gathered["missing"]) == [1]
+            assert elapsed < 0.3 + 0.2
+            expected = [result for result in reference.search(queries[2], 100)
+                        if shard_for(result["doc_id"], SHARDS) != 1][:10]
+            assert _keys(gathered["results"]) == _keys(expected)
+
+        # A dead shard fails fast and the others still answer
+        sharded.deadline = 2.0
+        processes[2].kill()
+        processes[2].wait()
+        gathered = sharded.scatter_gather(queries[3], 10)
+        print(f"Dead shard: answered {gathered['answered']}/{gathered['shards']}, missing {gathered['missing']}")
+        assert list(gathered["missing"]) == [2]
+        expected = [result for result in reference.search(queries[3], 100)
+                    if shard_for(result["doc_id"], SHARDS) != 2][:10]
+        assert _keys(gathered["results"]) == _keys(expected)
+    finally:
+        for process in processes:
+            process.kill()
+            process.wait()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Scatter-gather search matches a single index")
+
+if __name__ == "__main__":
+    test_scatter_gather_matches_single_index()
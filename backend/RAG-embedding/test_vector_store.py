@@ -0,0 +1,458 @@
+"""
+Check the segmented vector store: tombstone deletes, compaction, merging, the manifest lock
+and manifest refresh across instances
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+import numpy as np
+from Embedding_C import vector_store
+from Embedding_C.vector_store import VectorStore, Segment, _ManifestLock, normalize_rows, LOCK_NAME
+from Embedding_C.quantization import QUANTIZATION_MODES, encode, score
+from Embedding_C.projection import PCAProjection, iter_embeddings_files, sample_vectors
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DIMENSION = 16
+CHUNKS_PER_DOCUMENT = 4
+
+def _document(rng, index, chunks=CHUNKS_PER_DOCUMENT):
+    doc_id = f"doc_{index}"
+    records = [{"doc_id": doc_id, "chunk_index": chunk, "text": f"Document {index} chunk {chunk}", "page": chunk + 1}
+               for chunk in range(chunks)]
+    return doc_id, records, rng.normal(size=(chunks, DIMENSION)).astype(np.float32)
+
+def _brute_force(documents, query, k):
+    """(doc_id, chunk_index) of the exact top k over the live documents."""
+    scored = []
+    query = normalize_rows(query.reshape(1, -1))[0]
+    for doc_id, (records, vectors) in documents.items():
+        for record, score in zip(records, normalize_rows(vectors) @ query):
+            scored.append((float(score), doc_id, record["chunk_index"]))
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [(doc_id, chunk_index) for _, doc_id, chunk_index in scored[:k]]
+
+def _keys(results):
+    return [(result["doc_id"], result["chunk_index"]) for result in results]
+
+def test_add_delete_search():
+    """Deleted and re-ingested documents never surface stale vectors"""
+    print("🧪 TESTING SEGMENTED VECTOR STORE")
+    print("=" * 50)
+    work_dir = tempfile.mkdtemp()
+    try:
+        rng = np.random.default_rng(1)
+        store = VectorStore(os.path.join(work_dir, "index"))
+        live = {}
+        for index in range(10):
+            doc_id, records, vectors = _document(rng, index)
+            store.add_document(doc_id, records, vectors)
+            live[doc_id] = (records, vectors)
+        assert store.stats()["segments"] == 10 and store.stats()["vectors"] == 40
+
+        queries = rng.normal(size=(5, DIMENSION)).astype(np.float32)
+        for query in queries:
+            assert _keys(store.search(query, 8)) == _brute_force(live, query, 8)
+
+        store.delete_document("doc_3")
+        del live["doc_3"]
+        assert not store.contains("doc_3") and store.contains("doc_4")
+        for query in queries:
+            results = store.search(query, 40)
+            assert "doc_3" not in {result["doc_id"] for result in results}
+            assert _keys(results) == _brute_force(live, query, 40)
+
+        # Re-ingesting replaces the earlier version of a document
+        doc_id, records, vectors = _document(rng, 5, chunks=2)
+        store.add_document(doc_id, records, vectors)
+        live[doc_id] = (records, vectors)
+        for query in queries:
+            assert _keys(store.search(query, 40)) == _brute_force(live, query, 40)
+        assert sum(result["doc_id"] == "doc_5" for result in store.search(queries[0], 40)) == 2
+
+        # A deleted document can come back
+        doc_id, records, vectors = _document(rng, 3)
+        store.add_document(doc_id, records, vectors)
+        live[doc_id] = (records, vectors)
+        assert store.contains("doc_3")
+        assert _keys(store.search(queries[1], 40)) == _brute_force(live, queries[1], 40)
+
+        stats = store.stats()
+        print(f"Stats after deletes and re-ingests: {stats}")
+        assert stats["dead_vectors"] == 8
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Tombstones hide deleted and replaced vectors")
+
+def test_compaction_keeps_live_rows():
+    """Compaction rewrites mostly-dead segments and keeps every live row searchable"""
+    work_dir = tempfile.mkdtemp()
+    try:
+        rng = np.random.default_rng(2)
+        store = VectorStore(os.path.join(work_dir, "index"))
+        documents = [_document(rng, index) for index in range(6)]
+        store.add_documents(documents[:3])
+        store.add_documents(documents[3:])
+        live = {doc_id: (records, vectors) for doc_id, records, vectors in documents}
+
+        # Two of three documents of the first segment are deleted, one of the second
+        for doc_id in ("doc_0", "doc_1", "doc_4"):
+            store.delete_document(doc_id)
+            del live[doc_id]
+        before = store.stats()
+        assert before["dead_vectors"] == 12 and before["tombstones"] == 3
+
+        assert store.compact(threshold=0.5) == 1
+        after = store.stats()
+        print(f"Before compaction: {before}")
+        print(f"After compaction:  {after}")
+        assert after["vectors"] == 16 and after["dead_vectors"] == 4
+        # doc_0 and doc_1 are gone from disk; doc_4's tombstone is still needed
+        assert after["tombstones"] == 1
+
+        for query in rng.normal(size=(5, DIMENSION)).astype(np.float32):
+            assert _keys(store.search(query, 16)) == _brute_force(live, query, 16)
+
+        # The old segment is removed from disk once retired
+        store._remove_garbage()
+        segment_dirs = [name for name in os.listdir(store.index_dir) if name.startswith("seg_")]
+        assert len(segment_dirs) == after["segments"] == 2
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Compaction keeps live rows")
+
+def test_second_instance_sees_new_manifest():
+    """Another store on the same index (e.g. another API worker) picks up published writes"""
+    work_dir = tempfile.mkdtemp()
+    try:
+        rng = np.random.default_rng(3)
+        index_dir = os.path.join(work_dir, "index")
+        writer = VectorStore(index_dir)
+        doc_id, records, vectors = _document(rng, 0)
+        writer.add_document(doc_id, records, vectors)
+
+        reader = VectorStore(index_dir)
+        assert reader.stats()["vectors"] == 4
+
+        for index in (1, 2):
+            doc_id, records, vectors = _document(rng, index)
+            writer.add_document(doc_id, records, vectors)
+        writer.delete_document("doc_0")
+
+        time.sleep(vector_store.REFRESH_INTERVAL + 0.1)
+        stats = reader.stats()
+        print(f"Reader after the writer published: {stats}")
+        assert stats["version"] == writer.stats()["version"]
+        assert not reader.contains("doc_0") and reader.contains("doc_2")
+        query = rng.normal(size=DIMENSION).astype(np.float32)
+        assert _keys(reader.search(query, 12)) == _keys(writer.search(query, 12))
+
+        # Writes from the second instance go on top of the first one's
+        doc_id, records, vectors = _document(rng, 3)
+        reader.add_document(doc_id, records, vectors)
+        time.sleep(vector_store.REFRESH_INTERVAL + 0.1)
+        assert writer.contains("doc_3") and writer.contains("doc_1")
+        assert writer.stats()["vectors"] == reader.stats()["vectors"] == 16
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ A second instance sees the new manifest")
+
+def test_merge_and_obsolete_tombstones():
+    """Merged segments keep per-row sequence numbers; tombstones are dropped once nothing needs them"""
+    work_dir = tempfile.mkdtemp()
+    try:
+        rng = np.random.default_rng(4)
+        store = VectorStore(os.path.join(work_dir, "index"))
+        live = {}
+        for index in range(5):
+            doc_id, records, vectors = _document(rng, index)
+            store.add_document(doc_id, records, vectors)
+            live[doc_id] = (records, vectors)
+        store.delete_document("doc_1")
+        del live["doc_1"]
+
+        assert store.merge_small_segments(min_rows=100) == 5
+        stats = store.stats()
+        assert stats["segments"] == 1 and stats["vectors"] == 16 and stats["dead_vectors"] == 0
+
+        # Rows merged from older segments are still older than a new tombstone
+        doc_id, records, vectors = _document(rng, 2, chunks=1)
+        store.add_document(doc_id, records, vectors)
+        live[doc_id] = (records, vectors)
+        query = rng.normal(size=DIMENSION).astype(np.float32)
+        assert _keys(store.search(query, 20)) == _brute_force(live, query, 20)
+
+        # doc_1's tombstone refers to nothing anymore; doc_2's still hides merged rows
+        store.compact(threshold=1.0)
+        assert store.snapshot().tombstones.keys() == {"doc_2"}
+        assert _keys(store.search(query, 20)) == _brute_force(live, query, 20)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Merging and tombstone cleanup keep results exact")
+
+def test_lock_held_by_slow_holder_is_not_stolen():
+    """A live holder keeps its lock past stale_after; release never removes another holder's lock"""
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(work_dir, LOCK_NAME)
+        slow = _ManifestLock(path, stale_after=0.3)
+        other = _ManifestLock(path, stale_after=0.3)
+        assert slow.try_acquire()
+        # Longer than stale_after: the holder's refresh keeps the lock alive
+        time.sleep(1.0)
+        assert not other.try_acquire()
+        slow.release()
+        assert not os.path.exists(path)
+
+        # A holder that died leaves a lock that goes stale and is broken
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("999999-dead")
+        os.utime(path, (time.time() - 10, time.time() - 10))
+        assert not other.try_acquire()
+        assert other.try_acquire()
+
+        # A holder whose lock was broken (e.g. it hung) must not delete the new holder's lock
+        hung = _ManifestLock(path, stale_after=0.3)
+        hung._token, hung._stop_refresh = "12345-hung", threading.Event()
+        hung.release()
+        with open(path, "r", encoding="utf-8") as f:
+            assert f.read() == other._token
+        other.release()
+        assert not os.path.exists(path)
+        assert not [name for name in os.listdir(work_dir) if name != LOCK_NAME]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Index locks are only released by their holder")
+
+def test_segments_written_outside_manifest_lock():
+    """Segments are staged before the manifest lock is taken; concurrent writers lose no documents"""
+    work_dir = tempfile.mkdtemp()
+    stage = Segment.stage
+    try:
+        index_dir = os.path.join(work_dir, "index")
+        store = VectorStore(index_dir)
+        lock_held_while_staging = []
+
+        def recording_stage(*args, **kwargs):
+            lock_held_while_staging.append(store._file_lock._token is not None)
+            return stage(*args, **kwargs)
+
+        Segment.stage = recording_stage
+        rng = np.random.default_rng(5)
+        for index in range(3):
+            store.add_document(*_document(rng, index))
+        Segment.stage = stage
+        assert lock_held_while_staging == [False, False, False]
+
+        # Two stores, two threads each, writing the same index
+        stores = [store, VectorStore(index_dir)]
+        documents = [_document(rng, index) for index in range(3, 23)]
+
+        def add(writer, batch):
+            for doc_id, records, vectors in batch:
+                writer.add_document(doc_id, records, vectors)
+
+        threads = [threading.Thread(target=add, args=(stores[index % 2], documents[index::4])) for index in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        reader = VectorStore(index_dir)
+        assert reader.stats()["vectors"] == 23 * CHUNKS_PER_DOCUMENT
+        assert all(reader.contains(doc_id) for doc_id, _, _ in documents)
+        assert not os.path.exists(os.path.join(index_dir, LOCK_NAME))
+        assert not [name for name in os.listdir(index_dir) if name.endswith(".tmp")]
+    finally:
+        Segment.stage = stage
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Concurrent writers publish every segment")
+
+def test_search_under_each_quantization_mode():
+    """Every code format finds the exact top k once candidates are rescored; binary scores are Hamming distances"""
+    rng = np.random.default_rng(6)
+    vectors = normalize_rows(rng.normal(size=(50, 20)))
+    query = normalize_rows(rng.normal(size=(1, 20)))[0]
+    codes, _ = encode(vectors, "binary")
+    assert codes.shape == (50, 3)
+    hamming = ((vectors > 0) != (query > 0)).sum(axis=1)
+    assert np.array_equal(score(codes, query, "binary"), -hamming.astype(np.float32))
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        documents = [_document(rng, index) for index in range(12)]
+        live = {doc_id: (records, vectors) for doc_id, records, vectors in documents}
+        queries = rng.normal(size=(5, DIMENSION)).astype(np.float32)
+        for mode in QUANTIZATION_MODES:
+            # Rescoring every row makes each mode exact, whatever its code quality
+            store = VectorStore(os.path.join(work_dir, mode), quantization=mode, rescore_factor=100)
+            store.add_documents(documents[:6])
+            store.add_documents(documents[6:])
+            stats = store.stats()
+            print(f"{mode}: {stats['resident_mb']} MB resident")
+            assert stats["quantization"] == mode
+            for query in queries:
+                results = store.search(query, 5)
+                assert _keys(results) == _brute_force(live, query, 5), mode
+                # Scores are exact cosine similarities in every mode
+                best = results[0]
+                best_vector = normalize_rows(live[best["doc_id"]][1])[best["chunk_index"]]
+                assert abs(best["score"] - best_vector @ normalize_rows(query.reshape(1, -1))[0]) < 1e-5
+
+        # Reopening an index under another mode builds the new codes
+        store = VectorStore(os.path.join(work_dir, "float32"), quantization="binary", rescore_factor=100)
+        assert store.stats()["quantization"] == "binary"
+        assert _keys(store.search(queries[0], 5)) == _brute_force(live, queries[0], 5)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Every quantization mode searches correctly")
+
+def test_search_with_filters():
+    """Filtered searches return the exact top k among matching live rows, on both the sparse and dense paths"""
+    rng = np.random.default_rng(7)
+    documents = []
+    for index in range(12):
+        doc_id, records, vectors = _document(rng, index)
+        for record in records:
+            record["file_type"] = "pdf" if index % 4 else "docx"
+            record["uploaded_at"] = 1000.0 + index
+        documents.append((doc_id, records, vectors))
+    live = {doc_id: (records, vectors) for doc_id, records, vectors in documents}
+
+    def matching(predicate):
+        return {doc_id: ([record for record in records if predicate(record)],
+                         np.array([vector for record, vector in zip(records, vectors) if predicate(record)]))
+                for doc_id, (records, vectors) in live.items()
+                if any(predicate(record) for record in records)}
+
+    cases = [
+        # A few documents of a large segment: only their rows are scored
+        ({"doc_ids": ["doc_2", "doc_9"]}, lambda record: record["doc_id"] in ("doc_2", "doc_9")),
+        # Most rows of every segment: scored densely and masked
+        ({"file_types": ".PDF"}, lambda record: record["file_type"] == "pdf"),
+        ({"uploaded_after": 1003, "uploaded_before": 1008}, lambda record: 1003 <= record["uploaded_at"] <= 1008),
+        ({"page_from": 2, "page_to": 3}, lambda record: 2 <= record["page"] <= 3),
+        ({"file_types": "docx", "page_to": 1}, lambda record: record["file_type"] == "docx" and record["page"] == 1)
+    ]
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        store = VectorStore(os.path.join(work_dir, "index"))
+        store.add_documents(documents[:8])
+        store.add_documents(documents[8:])
+        store.delete_document("doc_9")
+        store.delete_document("doc_5")
+        del live["doc_9"], live["doc_5"]
+
+        queries = rng.normal(size=(4, DIMENSION)).astype(np.float32)
+        for filters, predicate in cases:
+            expected_rows = matching(predicate)
+            for query in queries:
+                results = store.search(query, 6, filters=filters)
+                assert all(predicate(result) for result in results), filters
+                assert _keys(results) == _brute_force(expected_rows, query, 6), filters
+
+        assert store.search(queries[0], 5, filters={"doc_ids": "doc_9"}) == []
+        assert store.search(queries[0], 5, filters={"file_types": "pptx"}) == []
+        try:
+            store.search(queries[0], 5, filters={"author": "me"})
+            raise AssertionError("unknown filter accepted")
+        except ValueError:
+            pass
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ Filtered searches match a filtered brute force")
+
+def _write_embeddings_file(embeddings_dir, doc_id, records, vectors):
+    """Embeddings/<doc_id>.json as written by save_embeddings(), with the full vectors."""
+    with open(os.path.join(embeddings_dir, f"{doc_id}.json"), "w", encoding="utf-8") as f:
+        json.dump([dict(record, embedding=vector.tolist()) for record, vector in zip(records, vectors)], f)
+
+def test_projection_rebuild_and_remove():
+    """A PCA rebuild projects stored, added and query vectors; --remove restores full vectors"""
+    rng = np.random.default_rng(11)
+    work_dir = tempfile.mkdtemp()
+    try:
+        embeddings_dir = os.path.join(work_dir, "Embeddings")
+        index_dir = os.path.join(embeddings_dir, vector_store.INDEX_DIR_NAME)
+        os.makedirs(embeddings_dir)
+        store = VectorStore(index_dir)
+        live = {}
+        for index in range(10):
+            doc_id, records, vectors = _document(rng, index)
+            _write_embeddings_file(embeddings_dir, doc_id, records, vectors)
+            store.add_document(doc_id, records, vectors)
+            live[doc_id] = (records, vectors)
+
+        projection = PCAProjection.fit(sample_vectors(iter_embeddings_files(embeddings_dir)), 8)
+        assert (projection.input_dimension, projection.output_dimension) == (DIMENSION, 8)
+        store.rebuild(iter_embeddings_files(embeddings_dir), projection)
+
+        with open(os.path.join(index_dir, vector_store.MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        assert manifest["projection"].startswith("projection_")
+        assert os.path.exists(os.path.join(index_dir, manifest["projection"]))
+        stats = store.stats()
+        assert stats["projection"] == f"{DIMENSION}->8" and stats["dimension"] == 8 and stats["vectors"] == 40
+
+        def projected(documents):
+            return {doc_id: (records, projection.transform(vectors)) for doc_id, (records, vectors) in documents.items()}
+
+        # Full-dimension queries are projected like the stored vectors
+        queries = rng.normal(size=(4, DIMENSION)).astype(np.float32)
+        for query in queries:
+            expected = _brute_force(projected(live), projection.transform(query.reshape(1, -1))[0], 10)
+            assert _keys(store.search(query, 10)) == expected
+
+        # Documents added later are projected too
+        doc_id, records, vectors = _document(rng, 10)
+        _write_embeddings_file(embeddings_dir, doc_id, records, vectors)
+        store.add_document(doc_id, records, vectors)
+        live[doc_id] = (records, vectors)
+        assert store.stats()["dimension"] == 8
+        assert all(segment.vectors.shape[1] == 8 for segment in store.snapshot().segments)
+        best = store.search(vectors[2], 1)[0]
+        assert (best["doc_id"], best["chunk_index"]) == (doc_id, 2)
+
+        # Deletes still work under the projection
+        store.delete_document("doc_4")
+        del live["doc_4"]
+        for query in queries:
+            expected = _brute_force(projected(live), projection.transform(query.reshape(1, -1))[0], 44)
+            assert _keys(store.search(query, 44)) == expected
+
+        # A second instance loads the projection from the manifest
+        other = VectorStore(index_dir)
+        assert other.stats()["projection"] == f"{DIMENSION}->8"
+        for query in queries:
+            assert _keys(other.search(query, 10)) == _keys(store.search(query, 10))
+
+        # --remove re-indexes the live documents' full vectors from Embeddings/*.json
+        subprocess.run([sys.executable, "-m", "Embedding_C.projection", "--embeddings-dir", embeddings_dir, "--remove"],
+                       cwd=SCRIPT_DIR, check=True, capture_output=True)
+        restored = VectorStore(index_dir)
+        stats = restored.stats()
+        assert stats["projection"] is None and stats["dimension"] == DIMENSION and stats["vectors"] == 40
+        assert not restored.contains("doc_4")
+        for query in queries:
+            assert _keys(restored.search(query, 40)) == _brute_force(live, query, 40)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("✅ PCA projection rebuilds and removal keep search exact")
+
+if __name__ == "__main__":
+    test_add_delete_search()
+    test_compaction_keeps_live_rows()
+    test_second_instance_sees_new_manifest()
+    test_merge_and_obsolete_tombstones()
+    test_lock_held_by_slow_holder_is_not_stolen()
+    test_segments_written_outside_manifest_lock()
+    test_search_under_each_quantization_mode()
+    test_search_with_filters()
+    test_projection_rebuild_and_remove()
@@ -0,0 +1,115 @@
+"""
+Work queue shared by the API and the ingestion workers
+
+The API only enqueues jobs and answers status requests; workers - threads
+of the API process or standalone ingest_worker.py processes - claim work
+units, write the artifacts to the RAG-embedding folder and index them.
+Backends implement WorkQueue and are looked up by name. The SQLite queue
+(job_store.py) serves the API and workers of one host only: its WAL mode
+does not work over network filesystems, so it refuses a database on one.
+Workers on other machines need a backend they reach over the network,
+registered in QUEUE_BACKENDS, without changes to the API or the workers.
+
+Claims are leases. A worker renews its lease with heartbeat() while it
+works on a unit; when a lease runs out (the worker died, hung or lost its
+connection) the next claim hands the unit to another worker. A unit is
+given up after MAX_ATTEMPTS lost leases, so a file that crashes every
+worker cannot take them all down in turn. Processing a unit overwrites its
+outputs in place, so a unit that ends up processed twice is harmless; only
+the first completion counts.
+"""
+
+import importlib
+
+# Seconds a claimed unit stays leased without a heartbeat
+LEASE_SECONDS = 60.0
+
+# Leases a unit may lose before its job is marked as failed
+MAX_ATTEMPTS = 3
+
+class WorkQueue:
+    """Interface of a work queue backend"""
+
+    lease_seconds = LEASE_SECONDS
+
+    def enqueue(self, job_id, doc_id, file_path, filename, safe_filename, message="Queued for processing",
+                tenant=None, units=None, estimated_seconds=None):
+        """Add a job and its work units."""
+        raise NotImplementedError
+
+    def claim(self, worker_id):
+        """
+        Lease the next work unit to a worker.
+
+        Returns:
+            The unit's job as a dict plus "unit_id", "page_start", "page_end",
+            "unit_cost" and "unit_count", or None if nothing is queued.
+        """
+        raise NotImplementedError
+
+    def heartbeat(self, unit_id, worker_id):
+        """
+        Extend a worker's lease on a unit.
+
+        Returns:
+            False if the lease was lost (the unit may be running elsewhere).
+        """
+        raise NotImplementedError
+
+    def complete_unit(self, unit_id, worker_id=None):
+        """
+        Mark a leased unit as done.
+
+        Returns:
+            (done, total) units of its job, or None if worker_id no longer
+            holds the lease.
+        """
+        raise NotImplementedError
+
+    def fail(self, job_id, message):
+        """Mark a job as failed and cancel its queued units."""
+        raise NotImplementedError
+
+    def update(self, job_id, **fields):
+        """Update status fields of a job."""
+        raise NotImplementedError
+
+    def get(self, job_id):
+        """Job as a dict, or None."""
+        raise NotImplementedError
+
+    def status(self, job_id):
+        """The status fields of a job as reported by the API, or None."""
+        raise NotImplementedError
+
+    def pending_count(self):
+        """Number of work units waiting for a worker."""
+        raise NotImplementedError
+
+    def unfinished_count(self):
+        """Number of work units queued or leased."""
+        raise NotImplementedError
+
+# Backend name -> "module:factory"; factories take the backend's options
+QUEUE_BACKENDS = {
+    "sqlite": "job_store:get_job_store"
+}
+
+def get_work_queue(backend="sqlite", **options):
+    """
+    Work queue of the given backend.
+
+    Args:
+        backend (str): Name in QUEUE_BACKENDS.
+        **options: Backend options, e.g. db_path and lease_seconds for "sqlite".
+
+    Raises:
+        ValueError: Unknown backend.
+        RuntimeError: "sqlite" with its database on a network filesystem;
+            that backend is for a single host.
+    """
+    if backend not in QUEUE_BACKENDS:
+        raise ValueError(f"Unknown work queue backend: {backend}. Available: {', '.join(QUEUE_BACKENDS)} "
+                         f"(\"sqlite\" is for workers on one host)")
+    module_name, factory_name = QUEUE_BACKENDS[backend].split(":")
+    return getattr(importlib.import_module(module_name), factory_name)(**options)
@@ -6,9 +6,13 @@ FastAPI server for RAG Backend - File Upload and Processing API
 import os
 import shutil
 import json
+import socket
+import argparse
+import threading
 from pathlib import Path
 from typing import List, Optional
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Header
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import uvicorn
@@ -19,9 +23,12 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'RAG-embedding'))
 
 try:
-    from File_entry import process_file
     from embedding_config import get_embedding_config
-    import Embedding_C.Text_To_Embeddings as Text_To_Embeddings
+    from document_registry import get_document_registry, doc_id_for
+    from work_queue import get_work_queue
+    from ingest_scheduler import DEFAULT_TENANT, estimate_cost, plan_work_units
+    from ingest_worker import IngestWorker
+    from Embedding_C.embedding_providers import get_embedding_provider
 except ImportError as e:
     print(f"❌ Import error: {e}")
     print("💡 Make sure you're running from the backend directory")
@@ -56,8 +63,93 @@ EMBEDDINGS_DIR.mkdir(parents=True, exist_ok=True)
 # Supported file types
 SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".doc", ".pptx", ".ppt"}
 
-# Store processing status
-processing_status = {}
+# Processing jobs and their status, shared by all worker processes and
+# standalone ingestion workers
+jobs = get_work_queue(**get_embedding_config().get("work_queue", {}))
+
+# Identifies this process in the job table
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Accept uploads and serve queries only; standalone ingest_worker.py
+# processes do the processing (set by --accept-only, inherited by workers)
+ACCEPT_ONLY = os.environ.get("RAG_ACCEPT_ONLY") == "1"
+
+_job_available = threading.Event()
+_stop_jobs = threading.Event()
+
+# Catalog of uploaded documents and their artifacts
+registry = get_document_registry()
+
+# Searchable index over all chunk embeddings (local, or a coordinator over
+# shard servers), opened on first use so numpy and the segments stay out of
+# the server's cold start
+_vector_store = None
+
+def get_index():
+    """The shared vector store of this process"""
+    global _vector_store
+    if _vector_store is None:
+        from Embedding_C.sharded_store import get_index_store
+        config = get_embedding_config()
+        _vector_store = get_index_store(str(EMBEDDINGS_DIR), config.get("vector_store"), config.get("sharding"))
+    return _vector_store
+
+# Processes the jobs claimed by this server process
+ingest_worker = IngestWorker(jobs, registry, TEXT_DIR, EMBEDDINGS_DIR, get_index=get_index, worker_id=WORKER_ID)
+
+def _open_index_in_background():
+    """Load the index off the startup path and keep it maintained"""
+    try:
+        # Deletes only write tombstones; dead vectors are dropped and small
+        # segments merged in the background. The same thread loads segments
+        # published by other processes, so searches pick them up without a restart.
+        get_index().start_background_maintenance()
+    except Exception as e:
+        print(f"⚠️ Could not open the vector index: {e}")
+
+# Embedding provider for queries, created on first search
+_query_provider = None
+
+def get_reranker(**reranker_config):
+    """Cross-encoder reranker, loaded on first reranked search"""
+    from Embedding_C.reranker import get_reranker as load_reranker
+    return load_reranker(**reranker_config)
+
+def get_query_provider():
+    """Embedding provider for search queries, created on first use"""
+    global _query_provider
+    if _query_provider is None:
+        config = get_embedding_config()
+        provider_type = config["provider"]
+        _query_provider = get_embedding_provider(provider_type, **config["providers"][provider_type])
+    return _query_provider
+
+async def embed_query(query: str):
+    """Embed a search query with the configured embedding provider without blocking the event loop"""
+    provider = await run_in_threadpool(get_query_provider)
+    return (await provider.aembed_batch([query]))[0]
+
+@app.on_event("startup")
+async def sync_registry():
+    """Register documents that are in Documents/ but not in the catalog yet"""
+    added = await run_in_threadpool(
+        registry.sync_directory, str(UPLOAD_DIR), SUPPORTED_EXTENSIONS, str(TEXT_DIR), str(EMBEDDINGS_DIR)
+    )
+    if added:
+        print(f"📇 Registered {added} existing document(s)")
+    
+    threading.Thread(target=_open_index_in_background, name="index-loader", daemon=True).start()
+    if not ACCEPT_ONLY:
+        threading.Thread(target=ingest_worker.run, args=(_stop_jobs, _job_available),
+                         name="job-worker", daemon=True).start()
+
+@app.on_event("shutdown")
+async def stop_background_work():
+    """Let the job worker finish its current job and stop index maintenance"""
+    _stop_jobs.set()
+    _job_available.set()
+    if _vector_store is not None:
+        _vector_store.stop_background_maintenance()
 
 @app.get("/")
 async def root():
@@ -76,12 +168,24 @@ async def get_config():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get config: {str(e)}")
 
+def plan_job(file_path):
+    """
+    Estimate a document's processing cost and split it into work units.
+
+    Returns:
+        (estimated_seconds, units); a file that cannot be inspected becomes one
+        unit of unknown cost and fails later in processing.
+    """
+    try:
+        estimate = estimate_cost(file_path)
+    except Exception as e:
+        print(f"⚠️ Could not estimate {os.path.basename(file_path)}: {e}")
+        return None, None
+    return estimate["seconds"], plan_work_units(estimate)
+
 @app.post("/api/upload")
-async def upload_file(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...)
-):
-    """Upload and process a file"""
+async def upload_file(file: UploadFile = File(...), x_tenant_id: Optional[str] = Header(None)):
+    """Upload and process a file; the X-Tenant-ID header names the uploader for fair scheduling"""
     
     # Validate file type
     file_ext = Path(file.filename).suffix.lower()
@@ -102,23 +206,29 @@ async def upload_file(
         with open(file_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
         
-        # Initialize processing status
-        processing_status[unique_id] = {
-            "status": "uploaded",
-            "filename": file.filename,
-            "safe_filename": safe_filename,
-            "progress": 0,
-            "message": "File uploaded successfully"
-        }
+        doc_id = doc_id_for(safe_filename)
+        await run_in_threadpool(
+            registry.register, doc_id, file.filename, safe_filename, str(file_path),
+            size=file_path.stat().st_size
+        )
         
-        # Start background processing with original filename
-        background_tasks.add_task(process_uploaded_file, unique_id, str(file_path), file.filename)
+        # Queue processing; any worker process may pick it up
+        estimated_seconds, units = await run_in_threadpool(plan_job, str(file_path))
+        await run_in_threadpool(
+            jobs.enqueue, unique_id, doc_id, str(file_path), file.filename, safe_filename,
+            message="File uploaded successfully", tenant=x_tenant_id or DEFAULT_TENANT,
+            units=units, estimated_seconds=estimated_seconds
+        )
+        _job_available.set()
         
         return {
             "status": "success",
             "message": "File uploaded and processing started",
             "file_id": unique_id,
-            "filename": file.filename
+            "doc_id": doc_id,
+            "filename": file.filename,
+            "estimated_seconds": estimated_seconds,
+            "work_units": len(units or [None])
         }
         
     except Exception as e:
@@ -127,110 +237,95 @@ async def upload_file(
             file_path.unlink()
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
-async def process_uploaded_file(file_id: str, file_path: str, original_filename: str):
-    """Background task to process uploaded file"""
-    try:
-        # Update status
-        processing_status[file_id]["status"] = "processing"
-        processing_status[file_id]["progress"] = 25
-        processing_status[file_id]["message"] = "Processing file (text extraction + embeddings)..."
-        
-        # Use original filename for output files (without extension)
-        original_base_name = Path(original_filename).stem
-        
-        # Process file (extract text + generate embeddings) with custom output name
-        success = process_file(file_path, generate_embeddings=True, output_base_name=original_base_name)
-        if not success:
-            processing_status[file_id]["status"] = "error"
-            processing_status[file_id]["message"] = "Failed to process file"
-            return
-        
-        # Verify output files were created with original names
-        text_file_path = TEXT_DIR / f"{original_base_name}.txt"
-        embeddings_file_path = EMBEDDINGS_DIR / f"{original_base_name}.json"
-        
-        if not text_file_path.exists():
-            processing_status[file_id]["status"] = "error"
-            processing_status[file_id]["message"] = "Text file not found after processing"
-            return
-            
-        if not embeddings_file_path.exists():
-            processing_status[file_id]["status"] = "error"
-            processing_status[file_id]["message"] = "Embeddings file not found after processing"
-            return
-        
-        embeddings_path = str(embeddings_file_path)
-        
-        # Success
-        processing_status[file_id]["status"] = "completed"
-        processing_status[file_id]["progress"] = 100
-        processing_status[file_id]["message"] = "Processing completed successfully"
-        processing_status[file_id]["text_file"] = str(text_file_path)
-        processing_status[file_id]["embeddings_file"] = embeddings_path
-        
-    except Exception as e:
-        processing_status[file_id]["status"] = "error"
-        processing_status[file_id]["message"] = f"Processing failed: {str(e)}"
-
 @app.get("/api/status/{file_id}")
 async def get_processing_status(file_id: str):
     """Get processing status for a file"""
-    if file_id not in processing_status:
+    status = await run_in_threadpool(jobs.status, file_id)
+    if status is None:
         raise HTTPException(status_code=404, detail="File ID not found")
     
     return {
         "status": "success",
-        "data": processing_status[file_id]
+        "data": status
     }
 
 @app.get("/api/files")
-async def list_files():
-    """List all processed files"""
+async def list_files(
+    offset: int = 0,
+    limit: int = 100,
+    file_type: Optional[str] = None,
+    status: Optional[str] = None,
+    search: Optional[str] = None,
+    sort_by: str = "uploaded_at",
+    order: str = "desc"
+):
+    """List uploaded files from the document catalog, with paging, filters and sorting"""
+    if limit < 1 or limit > 1000 or offset < 0:
+        raise HTTPException(status_code=400, detail="limit must be 1-1000 and offset >= 0")
+    
     try:
-        files = []
-        
-        # List documents
-        for doc_file in UPLOAD_DIR.glob("*"):
-            if doc_file.suffix.lower() in SUPPORTED_EXTENSIONS:
-                base_name = doc_file.stem
-                text_file = TEXT_DIR / f"{base_name}.txt"
-                embeddings_file = EMBEDDINGS_DIR / f"{base_name}.json"
-                
-                files.append({
-                    "filename": doc_file.name,
-                    "original_path": str(doc_file),
-                    "text_exists": text_file.exists(),
-                    "embeddings_exist": embeddings_file.exists(),
-                    "size": doc_file.stat().st_size if doc_file.exists() else 0,
-                    "modified": doc_file.stat().st_mtime if doc_file.exists() else 0
-                })
-        
-        return {
-            "status": "success",
-            "files": files
-        }
-        
+        documents, total = await run_in_threadpool(
+            registry.list_documents,
+            offset=offset, limit=limit, file_type=file_type, status=status, search=search,
+            sort_by=sort_by, descending=(order.lower() != "asc")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list files: {str(e)}")
+    
+    files = [{
+        "doc_id": doc["doc_id"],
+        "filename": doc["stored_name"],
+        "original_filename": doc["filename"],
+        "original_path": doc["source_path"],
+        "file_type": doc["file_type"],
+        "status": doc["status"],
+        "text_exists": doc["text_path"] is not None,
+        "embeddings_exist": doc["embeddings_path"] is not None,
+        "size": doc["size"],
+        "modified": doc["uploaded_at"]
+    } for doc in documents]
+    
+    return {
+        "status": "success",
+        "files": files,
+        "total": total,
+        "offset": offset,
+        "limit": limit
+    }
+
+def _delete_document_files(filename: str):
+    """Remove a document and its artifacts from disk and the catalog"""
+    doc = registry.resolve(filename)
+    
+    if doc:
+        paths = [doc["source_path"], doc["text_path"], doc["segments_path"], doc["embeddings_path"]]
+    else:
+        # Not in the catalog: fall back to the names derived from the file name
+        base_name = Path(filename).stem
+        paths = [
+            str(UPLOAD_DIR / filename),
+            str(TEXT_DIR / f"{base_name}.txt"),
+            str(TEXT_DIR / f"{base_name}.segments.json"),
+            str(EMBEDDINGS_DIR / f"{base_name}.json")
+        ]
+    
+    # Tombstone the vectors first so the document vanishes from searches at once
+    get_index().delete_document(doc["doc_id"] if doc else Path(filename).stem)
+    
+    for path in paths:
+        if path and os.path.exists(path):
+            os.remove(path)
+    
+    if doc:
+        registry.delete(doc["doc_id"])
 
 @app.delete("/api/files/{filename}")
 async def delete_file(filename: str):
-    """Delete a file and its associated text/embeddings"""
+    """Delete a file (by stored file name or doc ID) and its associated text/embeddings"""
     try:
-        # Find and delete original file
-        doc_file = UPLOAD_DIR / filename
-        if doc_file.exists():
-            doc_file.unlink()
-        
-        # Delete associated files
-        base_name = Path(filename).stem
-        text_file = TEXT_DIR / f"{base_name}.txt"
-        embeddings_file = EMBEDDINGS_DIR / f"{base_name}.json"
-        
-        if text_file.exists():
-            text_file.unlink()
-        if embeddings_file.exists():
-            embeddings_file.unlink()
+        await run_in_threadpool(_delete_document_files, filename)
         
         return {
             "status": "success",
@@ -240,8 +335,86 @@ async def delete_file(filename: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete file: {str(e)}")
 
+@app.get("/api/search")
+async def search(
+    q: str,
+    k: int = 5,
+    doc_id: Optional[List[str]] = Query(None),
+    file_type: Optional[List[str]] = Query(None),
+    uploaded_after: Optional[float] = None,
+    uploaded_before: Optional[float] = None,
+    page_from: Optional[int] = None,
+    page_to: Optional[int] = None,
+    rerank: Optional[bool] = None
+):
+    """
+    Semantic search over the chunks of all processed documents.
+    
+    doc_id and file_type may be repeated; uploaded_after/uploaded_before are
+    epoch seconds and page_from/page_to an inclusive page (or slide) range.
+    rerank overrides the configured cross-encoder reranking.
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    if k < 1 or k > 100:
+        raise HTTPException(status_code=400, detail="k must be between 1 and 100")
+    
+    try:
+        filters = {
+            "doc_ids": doc_id,
+            "file_types": file_type,
+            "uploaded_after": uploaded_after,
+            "uploaded_before": uploaded_before,
+            "page_from": page_from,
+            "page_to": page_to
+        }
+        reranker_config = dict(get_embedding_config().get("reranker", {}))
+        rerank_by_default = reranker_config.pop("enabled", False)
+        use_reranker = rerank_by_default if rerank is None else rerank
+        
+        # The reranker picks the best k out of a larger candidate set
+        candidates = max(k, reranker_config.get("candidates", k)) if use_reranker else k
+        query_vector = await embed_query(q)
+        index = get_index()
+        missing_shards = None
+        if hasattr(index, "scatter_gather"):
+            # Shards that miss the deadline are left out of the results
+            gathered = await run_in_threadpool(lambda: index.scatter_gather(query_vector, candidates, filters))
+            results, missing_shards = gathered["results"], gathered["missing"]
+        else:
+            results = await run_in_threadpool(lambda: index.search(query_vector, candidates, filters))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+    
+    if use_reranker:
+        # Only a missing sentence-transformers makes reranking unavailable
+        try:
+            reranker = await run_in_threadpool(lambda: get_reranker(**reranker_config))
+        except ImportError as e:
+            raise HTTPException(status_code=503, detail=f"Reranker unavailable: {str(e)}")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+        try:
+            results = await run_in_threadpool(lambda: reranker.rerank(q, results, k))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+    
+    response = {
+        "status": "success",
+        "query": q,
+        "filters": {key: value for key, value in filters.items() if value is not None},
+        "reranked": use_reranker,
+        "results": results
+    }
+    if missing_shards:
+        response["partial"] = True
+        response["missing_shards"] = missing_shards
+    return response
+
 @app.post("/api/process-local/{filename}")
-async def process_local_file(filename: str, background_tasks: BackgroundTasks):
+async def process_local_file(filename: str, x_tenant_id: Optional[str] = Header(None)):
     """Process a file that's already in the Documents folder"""
     file_path = UPLOAD_DIR / filename
     
@@ -252,35 +425,54 @@ async def process_local_file(filename: str, background_tasks: BackgroundTasks):
     import uuid
     file_id = str(uuid.uuid4())[:8]
     
-    # Initialize processing status
-    processing_status[file_id] = {
-        "status": "processing",
-        "filename": filename,
-        "safe_filename": filename,
-        "progress": 0,
-        "message": "Starting local file processing..."
-    }
+    # Re-ingest under the document's existing ID so its artifacts are replaced
+    doc = await run_in_threadpool(
+        registry.ensure, doc_id_for(filename), filename, filename, str(file_path),
+        size=file_path.stat().st_size
+    )
+    original_filename = doc["filename"]
     
-    # Start background processing
-    background_tasks.add_task(process_uploaded_file, file_id, str(file_path))
+    # Queue processing; any worker process may pick it up
+    estimated_seconds, units = await run_in_threadpool(plan_job, str(file_path))
+    await run_in_threadpool(
+        jobs.enqueue, file_id, doc["doc_id"], str(file_path), original_filename, filename,
+        message="Starting local file processing...", tenant=x_tenant_id or DEFAULT_TENANT,
+        units=units, estimated_seconds=estimated_seconds
+    )
+    _job_available.set()
     
     return {
         "status": "success",
         "message": "Local file processing started",
         "file_id": file_id,
-        "filename": filename
+        "filename": filename,
+        "estimated_seconds": estimated_seconds,
+        "work_units": len(units or [None])
     }
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RAG Backend API server")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes; more than 1 starts production mode without auto-reload")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--accept-only", action="store_true",
+                        help="Only accept uploads and serve queries; run ingest_worker.py to process them")
+    args = parser.parse_args()
+    if args.accept_only:
+        os.environ["RAG_ACCEPT_ONLY"] = "1"
+    
     print("🚀 Starting RAG Backend API Server...")
-    print("📡 API will be available at: http://localhost:8000")
-    print("📚 API Documentation: http://localhost:8000/docs")
+    print(f"📡 API will be available at: http://localhost:{args.port}")
+    print(f"📚 API Documentation: http://localhost:{args.port}/docs")
     print("🔄 CORS enabled for: http://localhost:3000")
+    if args.accept_only:
+        print("📥 Accept-only mode: uploads are processed by ingest_worker.py processes")
     
-    uvicorn.run(
-        "api_server:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
\ No newline at end of file
+    if args.workers > 1:
+        # Workers share the job queue and status store (SQLite) and the
+        # memory-mapped index segments, so vectors are held once by the OS
+        print(f"🏭 Production mode: {args.workers} worker processes")
+        uvicorn.run("api_server:app", host=args.host, port=args.port, workers=args.workers, log_level="info")
+    else:
+        uvicorn.run("api_server:app", host=args.host, port=args.port, reload=True, log_level="info")
\ No newline at end of file
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Import-time budget for the API server and the ingestion entry points
+
+Extractors and ML libraries are imported on first use, so starting the API
+(or a worker) should cost little more than importing FastAPI itself. Each
+measurement runs in a fresh interpreter.
+"""
+
+import os
+import sys
+import json
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+RAG_DIR = os.path.join(BACKEND_DIR, "RAG-embedding")
+
+# Allowed import time on top of the web framework, in seconds
+IMPORT_BUDGET_SECONDS = 0.3
+
+# Measurements per module; the fastest one is used
+RUNS = 3
+
+# Libraries only document processing or embedding should load
+HEAVY_MODULES = ["fitz", "pymupdf", "pytesseract", "PIL", "docx", "pptx", "numpy",
+                 "torch", "sentence_transformers", "requests"]
+
+_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+for name in sys.argv[1].split(","):
+    __import__(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in sys.argv[2].split(",") if m in sys.modules]}))
+"""
+
+def measure(modules):
+    """Fastest import time of modules in a fresh interpreter, and heavy modules it loaded"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([BACKEND_DIR, RAG_DIR]))
+    best = None
+    for _ in range(RUNS):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE, ",".join(modules), ",".join(HEAVY_MODULES)],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    return best
+
+def test_api_server_import_time():
+    """api_server must not load extractors or ML libraries and must stay within budget"""
+    print("🧪 Measuring api_server import time...")
+    baseline = measure(["fastapi", "fastapi.middleware.cors", "uvicorn"])
+    server = measure(["api_server"])
+    overhead = server["seconds"] - baseline["seconds"]
+
+    print(f"  FastAPI + uvicorn: {baseline['seconds'] * 1000:.0f} ms")
+    print(f"  api_server:        {server['seconds'] * 1000:.0f} ms (+{overhead * 1000:.0f} ms)")
+
+    assert not server["loaded"], f"api_server imported heavy modules: {server['loaded']}"
+    assert overhead < IMPORT_BUDGET_SECONDS, \
+        f"api_server import takes {overhead * 1000:.0f} ms over FastAPI (budget {IMPORT_BUDGET_SECONDS * 1000:.0f} ms)"
+    print("  ✅ Within budget")
+
+def test_file_entry_import_time():
+    """File_entry loads an extractor only when a file of its type is processed"""
+    print("🧪 Measuring File_entry import time...")
+    result = measure(["File_entry"])
+    print(f"  File_entry: {result['seconds'] * 1000:.0f} ms")
+
+    assert not result["loaded"], f"File_entry imported heavy modules: {result['loaded']}"
+    assert result["seconds"] < IMPORT_BUDGET_SECONDS, \
+        f"File_entry import takes {result['seconds'] * 1000:.0f} ms (budget {IMPORT_BUDGET_SECONDS * 1000:.0f} ms)"
+    print("  ✅ Within budget")
+
+def test_ingest_worker_import_time():
+    """ingest_worker starts without loading extractors or ML libraries"""
+    print("🧪 Measuring ingest_worker import time...")
+    result = measure(["ingest_worker"])
+    print(f"  ingest_worker: {result['seconds'] * 1000:.0f} ms")
+
+    assert not result["loaded"], f"ingest_worker imported heavy modules: {result['loaded']}"
+    assert result["seconds"] < IMPORT_BUDGET_SECONDS, \
+        f"ingest_worker import takes {result['seconds'] * 1000:.0f} ms (budget {IMPORT_BUDGET_SECONDS * 1000:.0f} ms)"
+    print("  ✅ Within budget")
+
+if __name__ == "__main__":
+    test_api_server_import_time()
+    test_file_entry_import_time()
+    test_ingest_worker_import_time()
+    print("\n🎉 Import-time budget met")